@@ -169,6 +169,24 @@ resource "aws_s3_object" "health_check_server" {
   )
 }
 
+resource "aws_s3_object" "health_check_package" {
+  for_each = fileset("${path.module}/scripts/health_check", "*.py")
+
+  bucket = aws_s3_bucket.sms_seller_connect_bucket.id
+  key    = "scripts/health_check/${each.value}"
+  source = "${path.module}/scripts/health_check/${each.value}"
+  etag   = filemd5("${path.module}/scripts/health_check/${each.value}")
+
+  tags = merge(
+    var.tags,
+    {
+      Name        = "sms-seller-connect-health-check-package"
+      Environment = var.environment
+      Purpose     = "ALB Health Check Server Modules"
+    }
+  )
+}
+
 resource "aws_s3_object" "user_data_script" {
   bucket = aws_s3_bucket.sms_seller_connect_bucket.id
   key    = "scripts/user_data.sh"
@@ -2,22 +2,135 @@
 
 """
 Simple HTTP server for ALB health checks
-Runs the health-check.sh script and returns appropriate HTTP responses
+Runs the health-check.sh script in a background probe loop and answers
+health requests from the latest snapshot. On startup the socket is bound
+first and the snapshot saved by the previous process is served as
+"warming" until the first live probe completes
 """
 
-import http.server
-import socketserver
-import subprocess
-import json
+import gzip
 import logging
+import math
 import os
+import shutil
 import signal
 import sys
+import threading
+import time
 from datetime import datetime
+from functools import partial
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from health_check import config
+from health_check.breaker import BreakerRegistry, CircuitOpenError
+from health_check.collector import build_sources, parse_time_bound, write_archive
+from health_check.docker_api import DockerClient
+from health_check.fleet import FleetAggregator, parse_peers, run_fleet_probe
+from health_check.follow import FollowHub
+from health_check.heartbeat import HeartbeatListener, HeartbeatRegistry
+from health_check.history import HealthHistory, HistorySaver
+from health_check.log_index import IndexRefresher, LogIndexRegistry, parse_time_param
+from health_check.log_stats import LogStatsRegistry, LogStatsUpdater
+from health_check.logs import (
+    ChunkedWriter, RangeNotSatisfiable, accepts_gzip, find_tail_offset, iter_file_chunks,
+    parse_byte_range, parse_line_count, resolve_log_path
+)
+from health_check.metrics import REGISTRY, CallbackGauge, Gauge, Histogram
+from health_check.probes import BackgroundServicesProbe, DockerContainersProbe, HttpProbe, ProbeEngine
+from health_check.responses import Fragment, ObjectTemplate, dumps, etag, etag_matches, pretty
+from health_check.server import PooledRequestHandler, ThreadPoolHTTPServer
+from health_check.services import (
+    BACKGROUND_SERVICES, CONTAINERS, REQUIRED_CONTAINERS, collect_background_status, collect_heartbeat_status
+)
+from health_check.singleflight import SingleFlight
+from health_check.snapshot import ProbeLoop, SnapshotStore, load_snapshot, run_health_check_script, run_probe_engine
+from health_check.startup import StartupTimer
+
+# Startup milestones are measured from process start, so take the timer first
+STARTUP = StartupTimer()
 
 # Configuration
-PORT = 8888
-HEALTH_CHECK_SCRIPT = "/app/sms-seller-connect/health-check.sh"
+PORT = config.PORT
+HEALTH_CHECK_SCRIPT = config.HEALTH_CHECK_SCRIPT
+
+# Shared health snapshot, refreshed by the background probe loop
+SNAPSHOT_STORE = SnapshotStore(stale_after=config.STALE_AFTER)
+
+# One shared tailer per followed log file
+FOLLOW_HUB = FollowHub(
+    config.FOLLOW_POLL_INTERVAL,
+    config.FOLLOW_HEARTBEAT,
+    config.FOLLOW_IDLE_TIMEOUT,
+    config.FOLLOW_MAX_SUBSCRIBERS
+)
+
+# Sparse timestamp indexes for /logs time-range queries
+# Queries only re-sample an index the refresher has not updated within its interval
+LOG_INDEXES = LogIndexRegistry(config.LOGS_DIR, config.LOG_INDEX_DIR, config.LOG_INDEX_STRIDE, max_age=config.LOG_INDEX_REFRESH)
+
+# Throughput counters parsed incrementally from the background service logs
+LOG_STATS = LogStatsRegistry(
+    config.LOGS_DIR,
+    BACKGROUND_SERVICES,
+    config.LOG_STATS_FILE,
+    config.LOG_STATS_BACKFILL,
+    config.LOG_STATS_MAX_READ,
+    config.LOG_STATS_WINDOW
+)
+
+# Docker Engine API over the mounted socket (replaces the docker CLI)
+DOCKER_CLIENT = DockerClient(config.DOCKER_SOCKET, timeout=config.DOCKER_TIMEOUT)
+
+# One /logs-archive at a time; its readers are bounded by COLLECT_CONCURRENCY
+ARCHIVE_SLOT = threading.Semaphore(1)
+
+# Per-probe status and latency for /history, in fixed-size rings
+HISTORY = HealthHistory(config.HISTORY_RESOLUTION, config.HISTORY_RETENTION)
+
+# Fan-out to the other instances' health servers for /fleet; built in main() when peers are configured
+FLEET = None
+
+# Latest heartbeat from each background service runner
+HEARTBEATS = HeartbeatRegistry(BACKGROUND_SERVICES, config.HEARTBEAT_INTERVAL, config.HEARTBEAT_GRACE)
+
+# Identical Docker calls from concurrent requests and the probe loop share one execution
+DOCKER_CALLS = SingleFlight(ttl=config.COALESCE_TTL)
+
+# One circuit breaker per dependency: HTTP probes, the Docker daemon and each exec-checked service
+BREAKERS = BreakerRegistry(
+    failure_threshold=config.BREAKER_FAILURE_THRESHOLD,
+    base_backoff=config.BREAKER_BASE_BACKOFF,
+    max_backoff=config.BREAKER_MAX_BACKOFF,
+    jitter=config.BREAKER_JITTER,
+    recovery_successes=config.BREAKER_RECOVERY_SUCCESSES,
+    recovery_interval=config.BREAKER_RECOVERY_INTERVAL
+)
+DOCKER_BREAKER = BREAKERS.get("docker_daemon")
+# Last exec-reported status per service, served while that service's breaker is open
+LAST_EXEC_STATUS = {}
+
+# Static payload serialized once at startup; handlers splice in the live parts
+HEALTH_CHECK_CONTAINERS = Fragment(REQUIRED_CONTAINERS)
+HEALTH_CHECK_BACKGROUND_SERVICES = Fragment([
+    {"name": name, "display_name": info["display_name"], "description": info["description"]}
+    for name, info in BACKGROUND_SERVICES.items()
+])
+CONTAINER_TEMPLATES = {name: ObjectTemplate(info) for name, info in CONTAINERS.items()}
+SERVICE_TEMPLATES = {name: ObjectTemplate(info) for name, info in BACKGROUND_SERVICES.items()}
+
+# Request metrics; endpoints are bucketed so the label set stays bounded
+REQUEST_LATENCY = Histogram(
+    "health_server_request_duration_seconds",
+    "Time spent handling each request",
+    ["endpoint"]
+)
+REQUESTS_IN_FLIGHT = Gauge("health_server_requests_in_flight", "Requests currently being handled")
+CallbackGauge(
+    "health_snapshot_age_seconds",
+    "Age of the latest health snapshot",
+    lambda: SNAPSHOT_STORE.current().age()
+)
+CallbackGauge("health_log_followers", "Clients following a log", lambda: FOLLOW_HUB.subscriber_count)
 
 # Setup logging
 logging.basicConfig(
@@ -26,7 +139,14 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-class HealthCheckHandler(http.server.BaseHTTPRequestHandler):
+class HealthCheckHandler(PooledRequestHandler):
+    
+    # Persistent connections so nginx can keep upstream sockets open
+    protocol_version = "HTTP/1.1"
+    # Socket timeout while a request is being read or written (idle sockets are parked, see server.py)
+    timeout = config.KEEPALIVE_TIMEOUT
+    # Headers and body go out as separate writes; don't let Nagle delay the body
+    disable_nagle_algorithm = True
     
     def log_message(self, format, *args):
         """Override to use our logger"""
@@ -34,116 +154,150 @@ class HealthCheckHandler(http.server.BaseHTTPRequestHandler):
     
     def do_GET(self):
         """Handle GET requests"""
-        if self.path == '/health-check':
+        url = urlsplit(self.path)
+        self.route = url.path
+        self.query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        
+        started = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            self.dispatch()
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            REQUEST_LATENCY.labels(self.endpoint_label()).observe(time.perf_counter() - started)
+    
+    def endpoint_label(self):
+        """Route template for metrics, e.g. /logs/{service}"""
+        if self.route in ('/health-check', '/status', '/services', '/metrics', '/history', '/logs-archive', '/activity', '/fleet'):
+            return self.route
+        if self.route.startswith('/fleet/'):
+            return '/fleet/{instance}'
+        if self.route.startswith('/logs/'):
+            return '/logs/{service}/follow' if self.route.endswith('/follow') else '/logs/{service}'
+        return 'other'
+    
+    def dispatch(self):
+        """Route the request to its endpoint handler"""
+        if self.route == '/health-check':
             self.handle_health_check()
-        elif self.path == '/status':
+        elif self.route == '/status':
             self.handle_status()
-        elif self.path == '/services':
-            self.handle_services_detail()
-        elif self.path.startswith('/logs/'):
-            self.handle_logs()
+        elif self.route == '/metrics':
+            self.send_body(200, 'text/plain; version=0.0.4; charset=utf-8', REGISTRY.render())
+        elif self.route == '/services':
+            self.run_heavy(self.handle_services_detail)
+        elif self.route == '/activity':
+            self.handle_activity()
+        elif self.route == '/history':
+            self.run_heavy(self.handle_history)
+        elif self.route == '/fleet' or self.route.startswith('/fleet/'):
+            self.run_heavy(self.handle_fleet)
+        elif self.route == '/logs-archive':
+            self.run_heavy(self.handle_logs_archive)
+        elif self.route.startswith('/logs/') and self.route.endswith('/follow'):
+            self.handle_logs_follow()
+        elif self.route.startswith('/logs/'):
+            self.run_heavy(self.handle_logs)
         else:
             self.send_error(404, "Not Found")
     
-    def handle_health_check(self):
-        """Run the comprehensive health check"""
-        try:
-            # Run the health check script
-            result = subprocess.run(
-                ['/bin/bash', HEALTH_CHECK_SCRIPT],
-                capture_output=True,
-                text=True,
-                timeout=15
-            )
-            
-            timestamp = datetime.utcnow().isoformat() + 'Z'
-            
-            if result.returncode == 0:
-                # All services healthy
-                response_data = {
-                    "status": "healthy",
-                    "timestamp": timestamp,
-                    "containers": ["sms_backend", "sms_frontend", "nginx_proxy"],
-                    "background_services": [
-                        {
-                            "name": "scheduled-messages",
-                            "display_name": "📨 Scheduled Messages Service",
-                            "description": "Sends scheduled SMS messages every 60 seconds"
-                        },
-                        {
-                            "name": "ai-processor", 
-                            "display_name": "🤖 AI Response Processor",
-                            "description": "Processes inbound messages for auto-responses"
-                        }
-                    ],
-                    "details": result.stdout.strip()
-                }
-                
-                self.send_response(200)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps(response_data, indent=2).encode())
-                
-                logger.info("✅ Health check passed - all services healthy")
-                
-            else:
-                # One or more services unhealthy
-                response_data = {
-                    "status": "unhealthy",
-                    "timestamp": timestamp,
-                    "containers": ["sms_backend", "sms_frontend", "nginx_proxy"],
-                    "background_services": [
-                        {
-                            "name": "scheduled-messages",
-                            "display_name": "📨 Scheduled Messages Service",
-                            "description": "Sends scheduled SMS messages every 60 seconds"
-                        },
-                        {
-                            "name": "ai-processor", 
-                            "display_name": "🤖 AI Response Processor",
-                            "description": "Processes inbound messages for auto-responses"
-                        }
-                    ],
-                    "error": result.stderr.strip() if result.stderr else "Health check failed",
-                    "details": result.stdout.strip()
-                }
-                
-                self.send_response(503)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps(response_data, indent=2).encode())
-                
-                logger.warning("⚠️ Health check failed - one or more services unhealthy")
-                
-        except subprocess.TimeoutExpired:
-            # Health check script timed out
-            response_data = {
-                "status": "unhealthy",
-                "timestamp": datetime.utcnow().isoformat() + 'Z',
-                "error": "Health check timed out after 15 seconds"
+    def run_heavy(self, handler):
+        """Run a diagnostic endpoint without letting it starve health checks"""
+        limiter = self.server.heavy_limiter
+        if not limiter.acquire():
+            error_response = {
+                "error": f"Too many diagnostic requests in flight (limit {limiter.slots})",
+                "timestamp": datetime.utcnow().isoformat() + 'Z'
             }
-            
-            self.send_response(503)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(response_data, indent=2).encode())
-            
-            logger.error("❌ Health check timed out")
-            
-        except Exception as e:
-            # Unexpected error
+            self.send_json(503, error_response, {'Retry-After': '1'})
+            return
+        try:
+            handler()
+        finally:
+            limiter.release()
+    
+    def handle_health_check(self):
+        """Answer from the latest background health snapshot"""
+        snapshot = SNAPSHOT_STORE.current()
+        timestamp = datetime.utcnow().isoformat() + 'Z'
+        
+        STARTUP.mark("first_response")
+        if snapshot is None:
+            # Probe loop has not finished its first run yet
             response_data = {
                 "status": "unhealthy",
-                "timestamp": datetime.utcnow().isoformat() + 'Z',
-                "error": f"Health check server error: {str(e)}"
+                "timestamp": timestamp,
+                "error": "No health snapshot available yet"
             }
-            
-            self.send_response(500)
-            self.send_header('Content-Type', 'application/json')
+            self.send_json(503, response_data)
+            return
+        
+        age = snapshot.age()
+        response_data = {
+            "status": snapshot.status,
+            "timestamp": timestamp,
+            "checked_at": snapshot.timestamp,
+            "snapshot_age_seconds": round(age + (snapshot.restored_age or 0.0), 3),
+            "probe_duration_ms": round(snapshot.duration_ms, 1),
+            "probes": snapshot.probes,
+            "breakers": BREAKERS.describe(),
+            "containers": HEALTH_CHECK_CONTAINERS,
+            "background_services": HEALTH_CHECK_BACKGROUND_SERVICES,
+            "details": snapshot.details
+        }
+        if snapshot.restored:
+            # Saved by the previous process; the HTTP status follows what it recorded until a live probe lands
+            response_data["status"] = "warming"
+            response_data["last_status"] = snapshot.status
+        else:
+            STARTUP.mark("first_live_response")
+        
+        if SNAPSHOT_STORE.is_stale(snapshot):
+            # The probe loop is stuck or dead - never report a stale "healthy"
+            response_data["status"] = "unhealthy"
+            response_data["error"] = f"Health snapshot is stale ({age:.0f}s old, limit {SNAPSHOT_STORE.stale_after:g}s)"
+            self.send_json(503, response_data)
+        elif snapshot.healthy:
+            self.send_json(200, response_data)
+        else:
+            response_data["error"] = snapshot.error
+            self.send_json(503, response_data)
+    
+    def send_json(self, status_code, data, headers=None):
+        """Send a JSON response: compact (or ?pretty=1), ETag-validated and gzipped when large"""
+        body = dumps(data)
+        tag = etag(body)
+        headers = {**(headers or {}), 'ETag': tag, 'Vary': 'Accept-Encoding'}
+        if status_code == 200 and etag_matches(self.headers.get('If-None-Match'), tag):
+            self.send_response(304)
+            for name, value in headers.items():
+                self.send_header(name, value)
             self.end_headers()
-            self.wfile.write(json.dumps(response_data, indent=2).encode())
-            
-            logger.error(f"❌ Health check server error: {str(e)}")
+            return
+        
+        if self.query.get('pretty', '') not in ('', '0', 'false'):
+            body = pretty(body)
+        if len(body) >= config.RESPONSE_GZIP_MIN_BYTES and accepts_gzip(self.headers.get('Accept-Encoding')):
+            body = gzip.compress(body, compresslevel=6)
+            headers['Content-Encoding'] = 'gzip'
+        self.send_body(status_code, 'application/json; charset=utf-8', body, headers)
+    
+    def send_body(self, status_code, content_type, body, headers=None):
+        """Send a complete response with a Content-Length so the connection can be reused"""
+        self.start_response(status_code, content_type, {**(headers or {}), 'Content-Length': str(len(body))})
+        self.wfile.write(body)
+    
+    def start_response(self, status_code, content_type, headers):
+        """Send the status line and headers; the caller writes the body"""
+        self.send_response(status_code)
+        self.send_header('Content-Type', content_type)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if self.server.should_release_connection():
+            # Clients are waiting for a worker - don't park this one on an idle socket
+            self.send_header('Connection', 'close')
+            self.close_connection = True
+        self.end_headers()
     
     def handle_status(self):
         """Simple status endpoint for the health check server itself"""
@@ -152,13 +306,23 @@ class HealthCheckHandler(http.server.BaseHTTPRequestHandler):
             "status": "running",
             "timestamp": datetime.utcnow().isoformat() + 'Z',
             "port": PORT,
-            "script": HEALTH_CHECK_SCRIPT
+            "probe_mode": config.PROBE_MODE,
+            "script": HEALTH_CHECK_SCRIPT,
+            "probe_interval_seconds": config.PROBE_INTERVAL,
+            "stale_after_seconds": config.STALE_AFTER,
+            "startup": STARTUP.to_dict(),
+            "workers": {
+                "total": self.server.workers,
+                "busy": self.server.busy_workers,
+                "queued_connections": self.server.queued_connections,
+                "idle_connections": self.server.idle_connections,
+                "heavy_slots": self.server.heavy_limiter.slots
+            },
+            "log_followers": FOLLOW_HUB.subscriber_count,
+            "fleet_peers": len(FLEET.peers()) if FLEET is not None else 0
         }
         
-        self.send_response(200)
-        self.send_header('Content-Type', 'application/json')
-        self.end_headers()
-        self.wfile.write(json.dumps(response_data, indent=2).encode())
+        self.send_json(200, response_data)
     
     def handle_services_detail(self):
         """Detailed services status endpoint with live log activity"""
@@ -166,27 +330,21 @@ class HealthCheckHandler(http.server.BaseHTTPRequestHandler):
             # Get detailed service information
             services_info = {
                 "timestamp": datetime.utcnow().isoformat() + 'Z',
-                "containers": {
-                    "sms_backend": {
-                        "name": "SMS Backend API",
-                        "port": 8900,
-                        "health_endpoint": "/health",
-                        "description": "FastAPI backend with authentication and SMS processing"
-                    },
-                    "sms_frontend": {
-                        "name": "SMS Frontend",
-                        "port": 8082,
-                        "description": "React frontend application"
-                    },
-                    "nginx_proxy": {
-                        "name": "Nginx Reverse Proxy",
-                        "port": 80,
-                        "description": "Routes requests between frontend and backend"
-                    }
-                },
+                "containers": {},
                 "background_services": {}
             }
             
+            # Live container states from a single Docker API call
+            try:
+                states = coalesced_container_states(DOCKER_CLIENT, timeout=config.COALESCE_WAIT)
+                services_info["containers"] = {
+                    name: template.fill({"state": states.get(name, "missing")})
+                    for name, template in CONTAINER_TEMPLATES.items()
+                }
+            except Exception as e:
+                logger.warning(f"Failed to get container states: {str(e)}")
+                services_info["containers"] = {name: template.fill() for name, template in CONTAINER_TEMPLATES.items()}
+            
             # Get live background service status with log activity
             try:
                 background_services = self.get_live_background_services_status()
@@ -195,49 +353,32 @@ class HealthCheckHandler(http.server.BaseHTTPRequestHandler):
                 logger.warning(f"Failed to get live background services status: {str(e)}")
                 # Fallback to static info
                 services_info["background_services"] = {
-                    "scheduled-messages": {
-                        "display_name": "📨 Scheduled Messages Service",
-                        "description": "Sends scheduled SMS messages every 60 seconds",
-                        "script": "scripts/scheduler_runner.py",
-                        "log_file": "logs/scheduled_messages.log",
-                        "status": "unknown",
-                        "error": "Failed to get live status"
-                    },
-                    "ai-processor": {
-                        "display_name": "🤖 AI Response Processor", 
-                        "description": "Processes inbound messages for auto-responses using OpenAI",
-                        "script": "scripts/ai_processor_runner.py",
-                        "log_file": "logs/ai_processor.log",
-                        "status": "unknown",
-                        "error": "Failed to get live status"
-                    }
+                    name: template.fill({"status": "unknown", "error": "Failed to get live status"})
+                    for name, template in SERVICE_TEMPLATES.items()
                 }
             
-            # Try to get overall health status
-            try:
-                result = subprocess.run(
-                    ['/bin/bash', HEALTH_CHECK_SCRIPT],
-                    capture_output=True,
-                    text=True,
-                    timeout=15
-                )
+            # Overall health comes from the shared background snapshot
+            snapshot = SNAPSHOT_STORE.current()
+            if snapshot is None:
                 services_info["overall_health"] = {
-                    "status": "healthy" if result.returncode == 0 else "unhealthy",
-                    "last_check": datetime.utcnow().isoformat() + 'Z',
-                    "details": result.stdout.strip(),
-                    "errors": result.stderr.strip() if result.stderr else None
+                    "status": "unknown",
+                    "last_check": None,
+                    "error": "No health snapshot available yet"
                 }
-            except Exception as e:
+            else:
                 services_info["overall_health"] = {
-                    "status": "unknown",
-                    "last_check": datetime.utcnow().isoformat() + 'Z',
-                    "error": f"Failed to get overall health: {str(e)}"
+                    "status": "unhealthy" if SNAPSHOT_STORE.is_stale(snapshot) else snapshot.status,
+                    "last_check": snapshot.timestamp,
+                    "snapshot_age_seconds": round(snapshot.age() + (snapshot.restored_age or 0.0), 3),
+                    "details": snapshot.details,
+                    "errors": snapshot.error
                 }
+                if snapshot.restored and not SNAPSHOT_STORE.is_stale(snapshot):
+                    services_info["overall_health"]["status"] = "warming"
+                    services_info["overall_health"]["last_status"] = snapshot.status
+            services_info["breakers"] = BREAKERS.describe()
             
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(services_info, indent=2).encode())
+            self.send_json(200, services_info)
             
         except Exception as e:
             error_response = {
@@ -245,225 +386,593 @@ class HealthCheckHandler(http.server.BaseHTTPRequestHandler):
                 "timestamp": datetime.utcnow().isoformat() + 'Z'
             }
             
-            self.send_response(500)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(error_response, indent=2).encode())
+            self.send_json(500, error_response)
+    
+    def handle_activity(self):
+        """Message throughput, error rates and AI latency parsed from the service logs"""
+        service_name = self.query.get('service')
+        if service_name and service_name not in LOG_STATS.trackers:
+            self.send_json(404, {"error": f"Unknown service: {service_name}", "services": list(LOG_STATS.trackers)})
+            return
+        
+        response_data = {
+            "timestamp": datetime.utcnow().isoformat() + 'Z',
+            "services": {service_name: LOG_STATS.describe(service_name)} if service_name else LOG_STATS.describe()
+        }
+        self.send_json(200, response_data)
+    
+    def handle_history(self):
+        """Downsampled probe status and latency over a time window"""
+        try:
+            until = parse_time_param(self.query['to']) if 'to' in self.query else time.time()
+            since = parse_time_param(self.query['from']) if 'from' in self.query else until - 3600
+            step = float(self.query['step']) if 'step' in self.query else None
+        except ValueError:
+            self.send_json(400, {"error": "from/to must be epoch seconds or ISO-8601, step a number of seconds"})
+            return
+        if since >= until or (step is not None and not 0 < step < math.inf):
+            self.send_json(400, {"error": "from must be before to, and step a positive finite number"})
+            return
+        now = time.time()
+        if until <= now - config.HISTORY_RETENTION or since > now:
+            self.send_json(400, {"error": f"from/to must overlap the retained history (the last {config.HISTORY_RETENTION:g}s)"})
+            return
+        # Only the retained range is ever summarized, so a huge window costs no more than the full history
+        since = max(since, now - config.HISTORY_RETENTION)
+        until = min(until, now + config.HISTORY_RESOLUTION)
+        
+        known = HISTORY.probes()
+        names = [name for name in self.query['probe'].split(',') if name] if self.query.get('probe') else known
+        unknown = [name for name in names if name not in known]
+        if unknown:
+            self.send_json(404, {"error": f"No history for probe(s): {', '.join(unknown)}", "probes": known})
+            return
+        
+        response_data = HISTORY.query(names, since, until, step, config.HISTORY_MAX_POINTS)
+        response_data["timestamp"] = datetime.utcnow().isoformat() + 'Z'
+        self.send_json(200, response_data)
+    
+    def handle_fleet(self):
+        """Merged health of every peer instance, or one instance's last answers at /fleet/<instance>"""
+        if FLEET is None:
+            self.send_json(404, {"error": "No fleet peers configured (HEALTH_CHECK_FLEET_PEERS or HEALTH_CHECK_FLEET_PEERS_FILE)"})
+            return
+        
+        # ?instance= is the older spelling of /fleet/<instance>
+        if self.route.startswith('/fleet/'):
+            instance = unquote(self.route[len('/fleet/'):])
+        else:
+            instance = self.query.get('instance')
+        try:
+            # Concurrent pollers share one fan-out, and its result for FLEET_CACHE_TTL seconds
+            if instance:
+                response_data = FLEET.instance(instance, timeout=config.FLEET_DEADLINE + 1)
+            else:
+                response_data = FLEET.view(timeout=config.FLEET_DEADLINE + 1)
+        except Exception as e:
+            error_response = {
+                "error": f"Failed to collect fleet health: {str(e)}",
+                "timestamp": datetime.utcnow().isoformat() + 'Z'
+            }
+            self.send_json(503, error_response, {'Retry-After': '1'})
+            return
+        
+        if response_data is None:
+            self.send_json(404, {"error": f"Unknown instance: {instance}", "instances": [peer.name for peer in FLEET.peers()]})
+            return
+        response_data["timestamp"] = datetime.utcnow().isoformat() + 'Z'
+        self.send_json(200, response_data)
+    
+    def handle_logs_archive(self):
+        """Stream every container's Docker log and the service logs as one .tar.gz"""
+        try:
+            since = parse_time_bound(self.query['since']) if 'since' in self.query else None
+            until = parse_time_bound(self.query['until']) if 'until' in self.query else None
+        except ValueError:
+            self.send_json(400, {"error": "since/until must be a duration like 4h or 2h30m, epoch seconds or ISO-8601"})
+            return
+        try:
+            tail = parse_line_count(self.query['tail']) if 'tail' in self.query else None
+        except ValueError:
+            self.send_json(400, {"error": "tail must be a non-negative integer"})
+            return
+        if not ARCHIVE_SLOT.acquire(blocking=False):
+            self.send_json(503, {"error": "A log archive is already being collected"}, {'Retry-After': '5'})
+            return
+        
+        try:
+            containers = set(self.query['containers'].split(',')) if self.query.get('containers') else None
+            files = self.query.get('files', '1') not in ('0', 'false')
+            sources, listing = build_sources(
+                DOCKER_CLIENT, config.LOGS_DIR, since, until, containers, files, LOG_INDEXES, config.DOCKER_TIMEOUT,
+                tail
+            )
+            prefix = "logs-" + time.strftime("%Y%m%d_%H%M%S", time.gmtime())
+            self.start_response(200, 'application/gzip', {
+                'Transfer-Encoding': 'chunked',
+                'Content-Disposition': f'attachment; filename="{prefix}.tar.gz"'
+            })
+            # The archive is gzipped by the collector; the chunked writer only frames it
+            writer = ChunkedWriter(self.wfile)
+            manifest = write_archive(
+                writer, sources, {"containers.json": pretty(dumps(listing))},
+                concurrency=config.COLLECT_CONCURRENCY, spool_bytes=config.COLLECT_SPOOL_BYTES,
+                spool_dir=config.COLLECT_SPOOL_DIR or None, prefix=prefix, compresslevel=config.COLLECT_GZIP_LEVEL
+            )
+            writer.close()
+            logger.info(f"📦 Log archive: {len(sources)} logs in {manifest['seconds']:.1f}s")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+        finally:
+            ARCHIVE_SLOT.release()
     
     def handle_logs(self):
-        """Handle requests for live logs from background services"""
+        """Stream a background service log with constant memory use"""
         # Extract service name from the path
-        service_name = self.path.split('/logs/')[1]
+        service_name = self.route[len('/logs/'):]
+        log_file = resolve_log_path(config.LOGS_DIR, service_name)
+        if log_file is None or not os.path.isfile(log_file):
+            self.send_error(404, "Log file not found")
+            return
         
         try:
-            # Get live log for the specified service
-            log_file = f"/app/logs/{service_name}.log"
-            if not os.path.exists(log_file):
-                self.send_error(404, "Log file not found")
-                return
-            
-            with open(log_file, 'r') as f:
-                log_content = f.read()
-            
-            self.send_response(200)
-            self.send_header('Content-Type', 'text/plain')
-            self.end_headers()
-            self.wfile.write(log_content.encode())
-            
-        except Exception as e:
+            f = open(log_file, 'rb')
+        except OSError as e:
             error_response = {
                 "error": f"Failed to get log: {str(e)}",
                 "timestamp": datetime.utcnow().isoformat() + 'Z'
             }
             
-            self.send_response(500)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(error_response, indent=2).encode())
+            self.send_json(500, error_response)
+            return
+        
+        with f:
+            # Serve the file as it was when the request arrived, even if it keeps growing
+            size = os.fstat(f.fileno()).st_size
+            
+            if 'since' in self.query or 'until' in self.query or 'grep' in self.query:
+                self.handle_logs_query(log_file, f, size)
+                return
+            start, end = 0, size
+            status_code = 200
+            headers = {'Accept-Ranges': 'bytes', 'Vary': 'Accept-Encoding'}
+            
+            if 'tail' in self.query:
+                try:
+                    lines = parse_line_count(self.query['tail'])
+                except ValueError:
+                    self.send_json(400, {"error": "tail must be a non-negative integer"})
+                    return
+                start = find_tail_offset(f, size, lines)
+            elif self.headers.get('Range'):
+                try:
+                    byte_range = parse_byte_range(self.headers['Range'], size)
+                except RangeNotSatisfiable:
+                    self.send_body(416, 'text/plain', b'', {'Content-Range': f'bytes */{size}'})
+                    return
+                if byte_range is not None:
+                    start, end = byte_range[0], byte_range[1] + 1
+                    status_code = 206
+                    headers['Content-Range'] = f'bytes {start}-{end - 1}/{size}'
+            
+            # Ranges address the uncompressed bytes, so only whole bodies are gzipped
+            compress = (
+                status_code == 200
+                and end - start >= config.LOG_GZIP_MIN_BYTES
+                and accepts_gzip(self.headers.get('Accept-Encoding'))
+            )
+            
+            try:
+                if compress:
+                    headers['Content-Encoding'] = 'gzip'
+                    headers['Transfer-Encoding'] = 'chunked'
+                    self.start_response(status_code, 'text/plain; charset=utf-8', headers)
+                    writer = ChunkedWriter(self.wfile, compress=True)
+                    for chunk in iter_file_chunks(f, start, end):
+                        writer.write(chunk)
+                    writer.close()
+                else:
+                    headers['Content-Length'] = str(end - start)
+                    self.start_response(status_code, 'text/plain; charset=utf-8', headers)
+                    sent = 0
+                    for chunk in iter_file_chunks(f, start, end):
+                        self.wfile.write(chunk)
+                        sent += len(chunk)
+                    if sent < end - start:
+                        # File was truncated mid-response; the body is short so the socket can't be reused
+                        self.close_connection = True
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True
+    
+    def handle_logs_query(self, log_file, f, size):
+        """Return the lines in a time window, scanning only the byte range the index points at"""
+        try:
+            since = parse_time_param(self.query['since']) if 'since' in self.query else None
+            until = parse_time_param(self.query['until']) if 'until' in self.query else None
+            limit = int(self.query.get('limit', config.LOG_QUERY_MAX_LINES))
+        except ValueError:
+            self.send_json(400, {"error": "since/until must be epoch seconds or ISO-8601, limit an integer"})
+            return
+        limit = max(0, min(limit, config.LOG_QUERY_MAX_LINES))
+        
+        index = LOG_INDEXES.get(log_file)
+        start, end = index.byte_range(since, until, size)
+        headers = {
+            'Transfer-Encoding': 'chunked',
+            'Vary': 'Accept-Encoding',
+            'X-Log-Scan-Range': f'bytes {start}-{end}/{size}'
+        }
+        compress = accepts_gzip(self.headers.get('Accept-Encoding'))
+        if compress:
+            headers['Content-Encoding'] = 'gzip'
+        
+        try:
+            self.start_response(200, 'text/plain; charset=utf-8', headers)
+            writer = ChunkedWriter(self.wfile, compress=compress)
+            batch = bytearray()
+            for line in index.query(f, size, since, until, self.query.get('grep'), limit):
+                batch += line
+                if len(batch) >= 64 * 1024:
+                    writer.write(bytes(batch))
+                    batch.clear()
+            writer.write(bytes(batch))
+            writer.close()
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+    
+    def handle_logs_follow(self):
+        """Stream newly appended log lines as server-sent events or a chunked text stream"""
+        service_name = self.route[len('/logs/'):-len('/follow')]
+        log_file = resolve_log_path(config.LOGS_DIR, service_name)
+        if log_file is None or not os.path.isfile(log_file):
+            self.send_error(404, "Log file not found")
+            return
+        
+        fmt = self.query.get('format', 'sse')
+        if fmt not in ('sse', 'raw'):
+            self.send_json(400, {"error": "format must be 'sse' or 'raw'"})
+            return
+        
+        # Resume point: explicit offset, SSE reconnect id, or the last N lines
+        offset = None
+        try:
+            # Validated like /logs?tail= even when an offset takes precedence
+            lines = parse_line_count(self.query['tail']) if 'tail' in self.query else None
+            if 'offset' in self.query:
+                offset = int(self.query['offset'])
+            elif self.headers.get('Last-Event-ID'):
+                offset = int(self.headers['Last-Event-ID'])
+            elif lines is not None:
+                with open(log_file, 'rb') as f:
+                    offset = find_tail_offset(f, os.fstat(f.fileno()).st_size, lines)
+            if offset is not None and offset < 0:
+                raise ValueError(offset)
+        except ValueError:
+            self.send_json(400, {"error": "offset and tail must be non-negative integers"})
+            return
+        
+        if FOLLOW_HUB.subscriber_count >= FOLLOW_HUB.max_subscribers:
+            self.send_json(503, {"error": f"Too many log followers (limit {FOLLOW_HUB.max_subscribers})"}, {'Retry-After': '5'})
+            return
+        
+        self.send_response(200)
+        if fmt == 'sse':
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            # Stop nginx from buffering the stream
+            self.send_header('X-Accel-Buffering', 'no')
+        else:
+            self.send_header('Content-Type', 'text/plain; charset=utf-8')
+            self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.flush()
+        
+        # The shared tailer owns the socket from here; this worker goes back to the pool
+        self.close_connection = True
+        if FOLLOW_HUB.subscribe(log_file, self.connection, fmt, offset):
+            self.server.detach(self.connection)
     
     def get_live_background_services_status(self):
-        """Get live status of background services with log activity"""
+        """Live status of background services with log activity, as pre-serialized fragments"""
         services_status = {}
         
-        # Define services to check
-        services = {
-            "scheduled-messages": {
-                "display_name": "📨 Scheduled Messages Service",
-                "description": "Sends scheduled SMS messages every 60 seconds",
-                "script": "scripts/scheduler_runner.py",
-                "log_file": "logs/scheduled_messages.log"
-            },
-            "ai-processor": {
-                "display_name": "🤖 AI Response Processor",
-                "description": "Processes inbound messages for auto-responses using OpenAI",
-                "script": "scripts/ai_processor_runner.py", 
-                "log_file": "logs/ai_processor.log"
-            }
-        }
+        try:
+            statuses = background_status(DOCKER_CLIENT, timeout=config.COALESCE_WAIT)
+            collect_error = None
+        except Exception as e:
+            statuses = {}
+            collect_error = str(e)
         
-        for service_name, service_info in services.items():
-            try:
-                # Get service status via docker exec
-                status_cmd = f"""
-                    pid_file="/app/logs/{service_name}.pid"
-                    log_file="/app/{service_info['log_file']}"
-                    
-                    # Check process status
-                    if [ -f "$pid_file" ]; then
-                        pid=$(cat "$pid_file" 2>/dev/null)
-                        if [ ! -z "$pid" ] && kill -0 "$pid" 2>/dev/null; then
-                            process_status="running"
-                            process_pid="$pid"
-                        else
-                            process_status="stopped"
-                            process_pid="$pid"
-                        fi
-                    else
-                        process_status="not_started"
-                        process_pid=""
-                    fi
-                    
-                    # Check log status
-                    if [ -f "$log_file" ]; then
-                        log_size=$(stat -c%s "$log_file" 2>/dev/null || echo "0")
-                        log_modified=$(stat -c "%y" "$log_file" 2>/dev/null | cut -d'.' -f1 || echo "unknown")
-                        recent_logs=$(tail -n 3 "$log_file" 2>/dev/null | tr '\\n' '|' | sed 's/|$//' || echo "")
-                        log_exists="true"
-                    else
-                        log_size="0"
-                        log_modified="unknown"
-                        recent_logs=""
-                        log_exists="false"
-                    fi
-                    
-                    echo "PROCESS:$process_status|PID:$process_pid|LOG_EXISTS:$log_exists|LOG_SIZE:$log_size|LOG_MODIFIED:$log_modified|RECENT:$recent_logs"
-                """
+        for service_name, template in SERVICE_TEMPLATES.items():
+            parts = statuses.get(service_name)
+            if parts is not None:
+                # Build service status
+                service_status = {
+                    "status": parts.get("PROCESS", "unknown"),
+                    "pid": parts.get("PID", ""),
+                    "log_info": {
+                        "exists": parts.get("LOG_EXISTS", "false") == "true",
+                        "size_bytes": int(parts.get("LOG_SIZE", "0") or 0),
+                        "last_modified": parts.get("LOG_MODIFIED", "unknown"),
+                        "recent_activity": []
+                    }
+                }
                 
-                result = subprocess.run(
-                    ["docker", "exec", "sms_backend", "sh", "-c", status_cmd],
-                    capture_output=True,
-                    text=True,
-                    timeout=10
-                )
+                # Heartbeat-reporting services are inspected locally; the rest through docker exec
+                if "HEARTBEAT" in parts:
+                    service_status["source"] = "heartbeat"
+                    service_status["heartbeat"] = parts["HEARTBEAT"]
+                else:
+                    # Open breaker: last exec result, reported without running the exec again
+                    service_status["source"] = "circuit_open" if "CIRCUIT_OPEN" in parts else "exec"
+                    service_status["breaker"] = BREAKERS.get(f"service:{service_name}").to_dict()
                 
-                if result.returncode == 0:
-                    # Parse the output
-                    output = result.stdout.strip()
-                    parts = {}
-                    for part in output.split('|'):
-                        if ':' in part:
-                            key, value = part.split(':', 1)
-                            parts[key] = value
-                    
-                    # Build service status
-                    service_status = {
-                        **service_info,
-                        "status": parts.get("PROCESS", "unknown"),
-                        "pid": parts.get("PID", ""),
-                        "log_info": {
-                            "exists": parts.get("LOG_EXISTS", "false") == "true",
-                            "size_bytes": int(parts.get("LOG_SIZE", "0")),
-                            "last_modified": parts.get("LOG_MODIFIED", "unknown"),
-                            "recent_activity": []
-                        }
-                    }
-                    
-                    # Parse recent logs
-                    recent_logs = parts.get("RECENT", "")
-                    if recent_logs:
-                        log_lines = [line.strip() for line in recent_logs.split('|') if line.strip()]
-                        service_status["log_info"]["recent_activity"] = log_lines[-3:]  # Last 3 lines
-                    
-                    # Add human-readable status
-                    if service_status["status"] == "running":
-                        service_status["status_message"] = f"✅ Running (PID: {service_status['pid']})"
-                        service_status["health"] = "healthy"
-                    elif service_status["status"] == "stopped":
-                        service_status["status_message"] = f"❌ Stopped (last PID: {service_status['pid']})"
-                        service_status["health"] = "unhealthy"
-                    else:
-                        service_status["status_message"] = "⚠️ Not Started"
-                        service_status["health"] = "unknown"
-                    
-                    # Add log summary
-                    if service_status["log_info"]["exists"]:
-                        log_size = service_status["log_info"]["size_bytes"]
-                        if log_size > 0:
-                            service_status["log_info"]["summary"] = f"📝 {log_size} bytes, modified: {service_status['log_info']['last_modified']}"
-                        else:
-                            service_status["log_info"]["summary"] = "📝 Empty log file"
+                # Parse recent logs
+                recent_logs = parts.get("RECENT", "")
+                if recent_logs:
+                    log_lines = [line.strip() for line in recent_logs.split('|') if line.strip()]
+                    service_status["log_info"]["recent_activity"] = log_lines[-3:]  # Last 3 lines
+                
+                # Add human-readable status
+                if service_status["status"] == "running":
+                    service_status["status_message"] = f"✅ Running (PID: {service_status['pid']})"
+                    service_status["health"] = "healthy"
+                elif service_status["status"] == "stalled":
+                    service_status["status_message"] = f"⏸️ Stalled: no heartbeat for {parts['HEARTBEAT']['age_seconds']:.0f}s (PID: {service_status['pid']})"
+                    service_status["health"] = "unhealthy"
+                elif service_status["status"] == "stopped":
+                    service_status["status_message"] = f"❌ Stopped (last PID: {service_status['pid']})"
+                    service_status["health"] = "unhealthy"
+                else:
+                    service_status["status_message"] = "⚠️ Not Started"
+                    service_status["health"] = "unknown"
+                if "CIRCUIT_OPEN" in parts:
+                    service_status["status_message"] = f"🔌 Circuit open, last seen: {service_status['status_message']}"
+                
+                # Add log summary
+                if service_status["log_info"]["exists"]:
+                    log_size = service_status["log_info"]["size_bytes"]
+                    if log_size > 0:
+                        service_status["log_info"]["summary"] = f"📝 {log_size} bytes, modified: {service_status['log_info']['last_modified']}"
                     else:
-                        service_status["log_info"]["summary"] = "📝 No log file found"
-                    
+                        service_status["log_info"]["summary"] = "📝 Empty log file"
                 else:
-                    # Failed to get status
-                    service_status = {
-                        **service_info,
-                        "status": "unknown",
-                        "status_message": "❓ Status check failed",
-                        "health": "unknown",
-                        "error": result.stderr.strip() if result.stderr else "Failed to check service status",
-                        "log_info": {
-                            "exists": False,
-                            "summary": "📝 Unable to check log file"
-                        }
-                    }
-                    
-            except Exception as e:
-                # Exception occurred
+                    service_status["log_info"]["summary"] = "📝 No log file found"
+                
+            else:
+                # Failed to get status
                 service_status = {
-                    **service_info,
-                    "status": "error",
-                    "status_message": f"❌ Error: {str(e)}",
+                    "status": "unknown",
+                    "status_message": "❓ Status check failed",
                     "health": "unknown",
-                    "error": str(e),
+                    "error": collect_error or "Failed to check service status",
                     "log_info": {
                         "exists": False,
                         "summary": "📝 Unable to check log file"
                     }
                 }
             
-            services_status[service_name] = service_status
+            # Parsed from the log on the shared volume, so available even when the status check failed;
+            # the read cursor moves every stats update, so it stays on /activity and out of this ETag
+            service_status["activity"] = LOG_STATS.describe(service_name, cursor=False)
+            
+            # Static metadata was serialized once; only the live fields are encoded here
+            services_status[service_name] = template.fill(service_status)
         
         return services_status
 
+def coalesced_container_states(client, timeout=None):
+    """container_states() shared between concurrent callers, behind the Docker daemon breaker"""
+    return DOCKER_CALLS.do("container_states", partial(DOCKER_BREAKER.call, client.container_states), timeout)
+
+def coalesced_background_status(client, timeout=None):
+    """collect_background_status() shared between concurrent callers"""
+    if DOCKER_BREAKER.is_open():
+        raise CircuitOpenError(DOCKER_BREAKER)
+    # The shared exec always gets the full Docker timeout; callers only bound their own wait
+    return DOCKER_CALLS.do("background_services", partial(collect_background_status, client), timeout)
+
+def background_status(client, timeout=None):
+    """Heartbeat-based status where runners report it, one coalesced exec for the rest"""
+    statuses = collect_heartbeat_status(HEARTBEATS, config.LOGS_DIR)
+    missing = [name for name in BACKGROUND_SERVICES if name not in statuses]
+    if not missing:
+        return statuses
+    
+    # Exec-checked services whose breaker is open keep their last result and skip the exec
+    breakers = {name: BREAKERS.get(f"service:{name}") for name in missing}
+    trials = [name for name in missing if breakers[name].allow()]
+    error = None
+    if trials:
+        try:
+            collected = coalesced_background_status(client, timeout)
+        except Exception as e:
+            collected = {}
+            error = e
+        for name in trials:
+            parts = collected.get(name)
+            if parts is None:
+                breakers[name].record(False, str(error) if error else "No status reported")
+                continue
+            running = parts.get("PROCESS") == "running"
+            breakers[name].record(running, None if running else f"Process {parts.get('PROCESS', 'unknown')}")
+            LAST_EXEC_STATUS[name] = parts
+            statuses[name] = parts
+    for name in missing:
+        if name not in trials:
+            statuses[name] = {**LAST_EXEC_STATUS.get(name, {"PROCESS": "unknown"}), "CIRCUIT_OPEN": True}
+    if error is not None and not statuses:
+        raise error
+    return statuses
+
 def signal_handler(signum, frame):
     """Handle shutdown signals gracefully"""
     logger.info(f"Received signal {signum}, shutting down health check server...")
+    if config.HISTORY_FILE:
+        try:
+            HISTORY.save(config.HISTORY_FILE)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not save health history: {str(e)}")
+    try:
+        LOG_STATS.save()
+    except OSError as e:
+        logger.warning(f"⚠️ Could not save log stats: {str(e)}")
     sys.exit(0)
 
+def build_fleet():
+    """Fleet aggregator over the configured peers, or None when there are none"""
+    if not config.FLEET_PEERS and not config.FLEET_PEERS_FILE:
+        return None
+    try:
+        peers = parse_peers(config.FLEET_PEERS)
+    except ValueError as e:
+        logger.error(f"❌ Invalid HEALTH_CHECK_FLEET_PEERS: {str(e)}")
+        sys.exit(1)
+    fleet = FleetAggregator(
+        peers,
+        config.FLEET_PEERS_FILE or None,
+        timeout=config.FLEET_TIMEOUT,
+        deadline=config.FLEET_DEADLINE,
+        ttl=config.FLEET_CACHE_TTL,
+        workers=config.FLEET_WORKERS
+    )
+    logger.info(f"🛰️ Fleet view over {len(fleet.peers())} peers (deadline {config.FLEET_DEADLINE:g}s, cached {config.FLEET_CACHE_TTL:g}s)")
+    return fleet
+
+def build_probe():
+    """Pick the probe function for the configured mode"""
+    if config.PROBE_MODE == "fleet":
+        # Aggregator: the snapshot is the fleet's health, one probe per peer instance
+        if FLEET is None:
+            logger.error("❌ HEALTH_CHECK_MODE=fleet needs HEALTH_CHECK_FLEET_PEERS or HEALTH_CHECK_FLEET_PEERS_FILE")
+            sys.exit(1)
+        return partial(run_fleet_probe, FLEET, config.FLEET_DEADLINE + 1)
+    
+    if config.PROBE_MODE == "script":
+        # Fallback: run health-check.sh exactly as before
+        if not os.path.exists(HEALTH_CHECK_SCRIPT):
+            logger.error(f"Health check script not found: {HEALTH_CHECK_SCRIPT}")
+            sys.exit(1)
+        
+        # Make sure script is executable
+        os.chmod(HEALTH_CHECK_SCRIPT, 0o755)
+        logger.info(f"📋 Using health check script: {HEALTH_CHECK_SCRIPT}")
+        # The container no longer installs these at startup; only the script needs them
+        missing = [tool for tool in ("curl", "docker") if shutil.which(tool) is None]
+        if missing:
+            logger.warning(f"⚠️ health-check.sh needs {', '.join(missing)}: run apk add --no-cache curl docker-cli first")
+        return partial(run_health_check_script, HEALTH_CHECK_SCRIPT, config.SCRIPT_TIMEOUT)
+    
+    engine = ProbeEngine(
+        [
+            HttpProbe(
+                "sms_backend", "SMS Backend", config.BACKEND_URL, config.PROBE_TIMEOUT, config.PROBE_RETRIES,
+                breaker=BREAKERS.get("sms_backend")
+            ),
+            HttpProbe(
+                "sms_frontend", "SMS Frontend", config.FRONTEND_URL, config.PROBE_TIMEOUT, config.PROBE_RETRIES,
+                breaker=BREAKERS.get("sms_frontend")
+            ),
+            DockerContainersProbe(DOCKER_CLIENT, REQUIRED_CONTAINERS, states=coalesced_container_states),
+            BackgroundServicesProbe(DOCKER_CLIENT, background_status)
+        ],
+        config.PROBE_DEADLINE
+    )
+    logger.info(f"🩺 Native probes: {config.BACKEND_URL}, {config.FRONTEND_URL}, docker at {config.DOCKER_SOCKET}")
+    return partial(run_probe_engine, engine)
+
 def main():
     """Main server function"""
+    global FLEET
     # Register signal handlers
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
     
-    # Check if health check script exists
-    if not os.path.exists(HEALTH_CHECK_SCRIPT):
-        logger.error(f"Health check script not found: {HEALTH_CHECK_SCRIPT}")
+    # Bind first: connections queue in the backlog from here on instead of being refused
+    try:
+        httpd = ThreadPoolHTTPServer(
+            (config.BIND_ADDRESS, PORT),
+            HealthCheckHandler,
+            workers=config.WORKERS,
+            backlog=config.BACKLOG,
+            heavy_slots=config.HEAVY_SLOTS,
+            idle_timeout=config.KEEPALIVE_TIMEOUT,
+            max_idle=config.KEEPALIVE_MAX_IDLE
+        )
+    except OSError as e:
+        if e.errno == 98:  # Address already in use
+            logger.error(f"❌ Port {PORT} is already in use")
+        else:
+            logger.error(f"❌ Failed to start server: {str(e)}")
         sys.exit(1)
+    STARTUP.mark("listening")
+    
+    # Serve the previous process's last snapshot until the first live probe replaces it
+    if config.SNAPSHOT_FILE:
+        snapshot = load_snapshot(config.SNAPSHOT_FILE, config.SNAPSHOT_MAX_AGE)
+        if snapshot is not None:
+            SNAPSHOT_STORE.publish(snapshot)
+            STARTUP.mark("snapshot_restored")
+            logger.info(f"♨️ Warming up from saved {snapshot.status} snapshot ({snapshot.restored_age:.0f}s old)")
     
-    # Make sure script is executable
-    os.chmod(HEALTH_CHECK_SCRIPT, 0o755)
+    # Start refreshing the shared health snapshot in the background
+    # Probe history from before the restart, then keep saving it
+    if config.HISTORY_FILE:
+        if HISTORY.load(config.HISTORY_FILE):
+            logger.info(f"📉 Loaded health history from {config.HISTORY_FILE}")
+        HistorySaver(HISTORY, config.HISTORY_FILE, config.HISTORY_SAVE_INTERVAL).start()
+    
+    FLEET = build_fleet()
+    probe = build_probe()
+    
+    def timed_probe():
+        snapshot = probe()
+        STARTUP.mark("first_live_snapshot")
+        return snapshot
+    
+    # Runs sooner than the interval while a breaker is due for a re-probe
+    probe_loop = ProbeLoop(
+        SNAPSHOT_STORE, timed_probe, config.PROBE_INTERVAL, BREAKERS.next_probe_delay, history=HISTORY,
+        snapshot_file=config.SNAPSHOT_FILE
+    )
+    probe_loop.start()
+    
+    # Heartbeats from the background service runners
+    heartbeat_listener = HeartbeatListener(HEARTBEATS, config.HEARTBEAT_SOCKET, config.HEARTBEAT_UDP_PORT)
+    if heartbeat_listener.bind():
+        heartbeat_listener.start()
+    
+    # Keep log indexes current as the logs grow
+    IndexRefresher(LOG_INDEXES, config.LOG_INDEX_REFRESH).start()
+    
+    # Throughput analytics pick up where the last run stopped reading
+    if LOG_STATS.load():
+        logger.info(f"📊 Resuming log stats from {config.LOG_STATS_FILE}")
+    LogStatsUpdater(LOG_STATS, config.LOG_STATS_INTERVAL).start()
     
     # Start the server
     try:
-        with socketserver.TCPServer(("127.0.0.1", PORT), HealthCheckHandler) as httpd:
-            logger.info(f"🚀 ALB Health Check Server started on port {PORT}")
-            logger.info(f"📋 Using health check script: {HEALTH_CHECK_SCRIPT}")
+        with httpd:
+            CallbackGauge("health_server_busy_workers", "Worker threads currently serving a connection", lambda: httpd.busy_workers)
+            CallbackGauge("health_server_queued_connections", "Accepted connections waiting for a worker", lambda: httpd.queued_connections)
+            CallbackGauge("health_server_idle_connections", "Keep-alive connections parked between requests", lambda: httpd.idle_connections)
+            logger.info(f"🚀 ALB Health Check Server started on {config.BIND_ADDRESS}:{PORT}")
+            logger.info(f"🧵 {config.WORKERS} workers, {config.HEAVY_SLOTS} reserved for diagnostic endpoints")
             logger.info(f"🔗 Health check endpoint: http://127.0.0.1:{PORT}/health-check")
             logger.info(f"📊 Server status endpoint: http://127.0.0.1:{PORT}/status")
             logger.info(f"🔧 Detailed services endpoint: http://127.0.0.1:{PORT}/services")
             logger.info(f"📋 Live logs endpoint: http://127.0.0.1:{PORT}/logs/[service_name]")
+            logger.info(f"📡 Log follow endpoint: http://127.0.0.1:{PORT}/logs/[service_name]/follow")
+            logger.info(f"📈 Metrics endpoint: http://127.0.0.1:{PORT}/metrics")
+            logger.info(f"📦 Log archive endpoint: http://127.0.0.1:{PORT}/logs-archive?since=4h")
+            logger.info(f"📊 Activity endpoint: http://127.0.0.1:{PORT}/activity?service=")
+            logger.info(f"📉 History endpoint: http://127.0.0.1:{PORT}/history?probe=&from=&to=&step=")
+            if FLEET is not None:
+                logger.info(f"🛰️ Fleet endpoint: http://127.0.0.1:{PORT}/fleet/[instance]")
             
             httpd.serve_forever()
             
-    except OSError as e:
-        if e.errno == 98:  # Address already in use
-            logger.error(f"❌ Port {PORT} is already in use")
-        else:
-            logger.error(f"❌ Failed to start server: {str(e)}")
-        sys.exit(1)
     except Exception as e:
         logger.error(f"❌ Unexpected server error: {str(e)}")
         sys.exit(1)
@@ -0,0 +1,3 @@
+"""
+Support package for the ALB health check server (health-check-server.py)
+"""
@@ -0,0 +1,637 @@
+"""
+Load and latency benchmark for health-check-server.py
+
+Starts the real server against local stand-ins: stub backend and frontend
+HTTP servers with configurable latency and failure rates, a
+FakeDockerDaemon, synthetic multi-GB service logs and, with --peers, fake
+peer instances for /fleet. It then drives a
+weighted mix of endpoints at a fixed concurrency, optionally with clients
+streaming whole logs in the background. The JSON report covers throughput,
+latency percentiles per endpoint, time to the first correct /health-check
+answer (also across --restarts), server RSS and threads, and subprocess and
+Docker call counts, and is meant to be diffed between runs:
+
+    cd modules/ec2/scripts
+    python3 -m health_check.bench --duration 30 --concurrency 32 --log-size 2G \\
+        --large-readers 2 --workdir /tmp/hc-bench -o before.json
+    python3 -m health_check.bench ... -o after.json --baseline before.json
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlencode
+
+from health_check.fakes import FakeDockerDaemon, FakePeer
+
+logger = logging.getLogger(__name__)
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "health-check-server.py")
+LOG_SERVICES = ("scheduled_messages", "ai_processor")
+DEFAULT_MIX = "health=70,status=5,services=10,metrics=5,logs_tail=5,logs_query=3,logs_range=2"
+PERCENTILES = (50, 90, 95, 99, 99.9)
+READ_CHUNK = 64 * 1024
+
+# One block of synthetic log lines shares a timestamp, so every block is one second of log
+LOG_BLOCK_BYTES = 64 * 1024
+_LOG_MESSAGES = (
+    b" - INFO - Found 3 scheduled messages to send\n",
+    b" - INFO - \xe2\x9c\x85 Sent scheduled message 48213 to +15555550123\n",
+    b" - ERROR - Failed to send message 48214: carrier timeout\n",
+    b" - INFO - Found 2 inbound messages to process\n",
+    b" - INFO - AI inbound message processing completed successfully\n",
+    b"Traceback (most recent call last):\n",
+    b'  File "/app/scripts/scheduler_runner.py", line 88, in run\n',
+)
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.stub.lock:
+            self.server.stub.connections += 1
+
+    def do_GET(self):
+        stub = self.server.stub
+        if stub.latency:
+            time.sleep(stub.latency)
+        failed = stub.failure_rate and random.random() < stub.failure_rate
+        body = b'{"status": "error"}' if failed else b'{"status": "ok"}'
+        self.send_response(500 if failed else 200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with stub.lock:
+            stub.requests += 1
+
+
+class _StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Probes that timed out hang up before the answer is written
+        pass
+
+
+class StubService:
+    """Stand-in for sms_backend or sms_frontend that answers after `latency` seconds"""
+
+    def __init__(self, latency=0.0, failure_rate=0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.requests = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._server = _StubHTTPServer(("127.0.0.1", 0), _StubHandler)
+        self._server.stub = self
+        threading.Thread(target=self._server.serve_forever, name="stub-service", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def parse_size(value):
+    """'512M', '2G' or plain bytes"""
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    value = value.strip().upper().removesuffix("B")
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+def parse_mix(value):
+    """'health=70,services=10' -> {"health": 70.0, "services": 10.0}"""
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def _log_block(second, lines):
+    prefix = time.strftime("%Y-%m-%d %H:%M:%S,000", time.gmtime(second)).encode()
+    # Traceback lines are continuations and carry no timestamp, like real logs
+    return b"".join(line if line.startswith((b"Traceback", b"  ")) else prefix + line for line in lines)
+
+
+def write_synthetic_log(path, size, end_time):
+    """Write `size` bytes of timestamped lines ending at end_time; returns (first, last) epoch seconds
+
+    An existing file of exactly `size` bytes is reused, so a persistent
+    --workdir only pays for generating multi-GB logs once.
+    """
+    lines = []
+    while sum(len(line) for line in lines) < LOG_BLOCK_BYTES:
+        lines.extend(_LOG_MESSAGES)
+    blocks = -(-size // len(_log_block(0, lines)))
+    first = int(end_time) - blocks
+    if os.path.exists(path) and os.path.getsize(path) == size:
+        return first, int(end_time)
+
+    started = time.monotonic()
+    with open(path, "wb") as f:
+        for second in range(first, first + blocks):
+            f.write(_log_block(second, lines))
+        f.truncate(size)
+    logger.info(f"📝 Wrote {size / 1024 ** 2:.0f} MiB to {path} in {time.monotonic() - started:.1f}s")
+    return first, int(end_time)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class EndpointStats:
+    """Latencies and status counts for one endpoint, owned by a single client thread"""
+
+    def __init__(self):
+        self.latencies = []
+        self.statuses = {}
+        self.bytes = 0
+
+    def record(self, seconds, status, nbytes):
+        self.latencies.append(seconds)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.bytes += nbytes
+
+    def merge(self, other):
+        self.latencies.extend(other.latencies)
+        for status, count in other.statuses.items():
+            self.statuses[status] = self.statuses.get(status, 0) + count
+        self.bytes += other.bytes
+
+    @property
+    def errors(self):
+        return sum(count for status, count in self.statuses.items() if status == "error" or int(status) >= 500)
+
+    def summary(self, duration):
+        return {
+            "requests": len(self.latencies),
+            "errors": self.errors,
+            "throughput_rps": round(len(self.latencies) / duration, 2),
+            "bytes": self.bytes,
+            "status": {str(status): count for status, count in sorted(self.statuses.items(), key=lambda item: str(item[0]))},
+            "latency_ms": latency_summary(self.latencies)
+        }
+
+
+def latency_summary(latencies):
+    """Nearest-rank percentiles, mean and max in milliseconds"""
+    if not latencies:
+        return {}
+    ordered = sorted(latencies)
+    summary = {}
+    for percentile in PERCENTILES:
+        rank = max(int(len(ordered) * percentile / 100 + 0.5) - 1, 0)
+        summary[f"p{percentile:g}"] = round(ordered[min(rank, len(ordered) - 1)] * 1000, 3)
+    summary["mean"] = round(sum(ordered) / len(ordered) * 1000, 3)
+    summary["max"] = round(ordered[-1] * 1000, 3)
+    return summary
+
+
+def build_requests(args, log_spans):
+    """{endpoint name: callable returning (path, headers)}"""
+
+    def service():
+        return random.choice(LOG_SERVICES)
+
+    def time_window():
+        name = service()
+        first, last = log_spans[name]
+        since = random.uniform(first, max(first, last - 300))
+        return f"/logs/{name}?" + urlencode({"since": int(since), "until": int(since) + 300, "limit": 1000}), {}
+
+    return {
+        "health": lambda: ("/health-check", {}),
+        "status": lambda: ("/status", {}),
+        "services": lambda: ("/services", {}),
+        "metrics": lambda: ("/metrics", {}),
+        "history": lambda: ("/history?step=60", {}),
+        "activity": lambda: ("/activity", {}),
+        "fleet": lambda: ("/fleet", {}),
+        "logs_tail": lambda: (f"/logs/{service()}?tail=100", {}),
+        "logs_range": lambda: (f"/logs/{service()}", {"Range": f"bytes=-{args.range_bytes}"}),
+        "logs_query": time_window,
+        "logs_full": lambda: (f"/logs/{service()}", {}),
+    }
+
+
+def run_client(port, requests, mix, stop_at, timeout, stats):
+    """Issue requests over one keep-alive connection until stop_at"""
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    rng = random.Random()
+    conn = None
+    while time.monotonic() < stop_at:
+        name = rng.choices(names, weights)[0]
+        path, headers = requests[name]()
+        if conn is None:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+        nbytes = 0
+        started = time.perf_counter()
+        try:
+            conn.request("GET", path, headers=headers)
+            response = conn.getresponse()
+            while True:
+                chunk = response.read(READ_CHUNK)
+                if not chunk:
+                    break
+                nbytes += len(chunk)
+            status = response.status
+            if response.will_close:
+                conn.close()
+                conn = None
+        except (OSError, http.client.HTTPException):
+            status = "error"
+            conn.close()
+            conn = None
+        stats.setdefault(name, EndpointStats()).record(time.perf_counter() - started, status, nbytes)
+    if conn is not None:
+        conn.close()
+
+
+class ProcessMonitor(threading.Thread):
+    """Samples the server's RSS, thread count and child processes from /proc"""
+
+    def __init__(self, pid, interval=0.25):
+        super().__init__(name="bench-monitor", daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.rss = []
+        self.threads = []
+        self.max_children = 0
+        self.children_seen = set()
+        self._stop_event = threading.Event()
+
+    def sample(self):
+        try:
+            with open(f"/proc/{self.pid}/status") as f:
+                fields = dict(line.split(":", 1) for line in f if ":" in line)
+        except OSError:
+            return
+        self.rss.append(int(fields["VmRSS"].split()[0]) * 1024)
+        self.threads.append(int(fields["Threads"]))
+        children = set()
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    # The command name may contain spaces; ppid is the second field after it
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            if ppid == self.pid:
+                children.add(int(entry))
+        self.max_children = max(self.max_children, len(children))
+        self.children_seen |= children
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.sample()
+
+    def summary(self):
+        if not self.rss:
+            return {"rss_mb": None, "threads_max": None, "child_processes": None}
+        return {
+            "rss_mb": {
+                "start": round(self.rss[0] / 1024 ** 2, 2),
+                "max": round(max(self.rss) / 1024 ** 2, 2),
+                "end": round(self.rss[-1] / 1024 ** 2, 2)
+            },
+            "threads_max": max(self.threads),
+            "child_processes": {"max_concurrent": self.max_children, "distinct_seen": len(self.children_seen)}
+        }
+
+
+def scrape_metric_totals(port, prefixes):
+    """Sum each metric family in /metrics across its labels"""
+    totals = dict.fromkeys(prefixes, 0.0)
+    try:
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+        conn.request("GET", "/metrics")
+        text = conn.getresponse().read().decode()
+        conn.close()
+    except (OSError, http.client.HTTPException):
+        return totals
+    for line in text.splitlines():
+        for prefix in prefixes:
+            if line.startswith(prefix) and line[len(prefix)] in " {":
+                totals[prefix] += float(line.rsplit(" ", 1)[1])
+    return totals
+
+
+def measure_startup(port, process, launched, timeout=20):
+    """Seconds from launch to the first answer, the first 200 and the first 200 from a live probe
+
+    A restarted server may answer 200 from its saved snapshot ("warming")
+    before its first live probe completes; first_live_s is the time to the
+    first answer that reflects the new process's own probe.
+    """
+    timings = {"first_response_s": None, "first_ok_s": None, "first_live_s": None, "warming_served": False}
+    deadline = launched + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"health-check-server.py exited with {process.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health-check")
+            response = conn.getresponse()
+            body = json.loads(response.read())
+            conn.close()
+        except (OSError, http.client.HTTPException, ValueError):
+            time.sleep(0.005)
+            continue
+        elapsed = round(time.monotonic() - launched, 3)
+        if timings["first_response_s"] is None:
+            timings["first_response_s"] = elapsed
+        if response.status == 200 and timings["first_ok_s"] is None:
+            timings["first_ok_s"] = elapsed
+        if body.get("status") == "warming":
+            timings["warming_served"] = True
+        elif response.status == 200:
+            timings["first_live_s"] = elapsed
+            return timings
+        time.sleep(0.005)
+    raise RuntimeError(f"health-check-server.py not ready after {timeout}s")
+
+
+def compare(report, baseline):
+    """Relative change of the headline numbers against a previous report"""
+
+    def delta(new, old):
+        if new is None or not old:
+            return None
+        return round((new - old) / old * 100, 1)
+
+    rows = {"throughput_rps": (report["totals"]["throughput_rps"], baseline["totals"]["throughput_rps"])}
+    for key in ("p50", "p99"):
+        rows[f"latency_ms.{key}"] = (report["latency_ms"].get(key), baseline["latency_ms"].get(key))
+    for key in ("first_ok_s", "first_live_s"):
+        rows[f"startup.{key}"] = (report["startup"]["initial"][key], baseline.get("startup", {}).get("initial", {}).get(key))
+    for name, stats in report["endpoints"].items():
+        old = baseline["endpoints"].get(name)
+        if old:
+            rows[f"{name}.p99_ms"] = (stats["latency_ms"].get("p99"), old["latency_ms"].get("p99"))
+    if report["server"]["rss_mb"] and baseline["server"]["rss_mb"]:
+        rows["rss_mb.max"] = (report["server"]["rss_mb"]["max"], baseline["server"]["rss_mb"]["max"])
+    return {name: {"baseline": old, "current": new, "change_pct": delta(new, old)} for name, (new, old) in rows.items()}
+
+
+def run(args):
+    mix = parse_mix(args.mix)
+    unknown = set(mix) - set(build_requests(args, {}))
+    if unknown:
+        raise SystemExit(f"Unknown endpoints in --mix: {', '.join(sorted(unknown))}")
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="hc-bench-")
+    logs_dir = os.path.join(workdir, "logs")
+    index_dir = os.path.join(workdir, "index")
+    os.makedirs(logs_dir, exist_ok=True)
+    # Start every run from an empty log index so runs stay comparable
+    shutil.rmtree(index_dir, ignore_errors=True)
+    os.makedirs(index_dir)
+
+    end_time = time.time()
+    log_size = parse_size(args.log_size)
+    log_spans = {
+        name: write_synthetic_log(os.path.join(logs_dir, f"{name}.log"), log_size, end_time)
+        for name in LOG_SERVICES
+    }
+
+    backend = StubService(args.backend_latency, args.backend_failure_rate).start()
+    frontend = StubService(args.frontend_latency, args.frontend_failure_rate).start()
+
+    docker = FakeDockerDaemon(os.path.join(workdir, "docker.sock"))
+    if args.docker_latency:
+        default_handler = docker.default_exec_handler
+
+        def slow_exec(container, cmd):
+            time.sleep(args.docker_latency)
+            return default_handler(container, cmd)
+
+        docker.exec_handler = slow_exec
+    docker.start()
+
+    # Stand-ins for the other instances behind /fleet
+    peers = [FakePeer(latency=args.peer_latency).start() for _ in range(args.peers)]
+
+    port = _free_port()
+    env = {
+        **os.environ,
+        "PYTHONUNBUFFERED": "1",
+        "HEALTH_CHECK_PORT": str(port),
+        "HEALTH_CHECK_BIND": "127.0.0.1",
+        "HEALTH_CHECK_BACKEND_URL": f"{backend.url}/health",
+        "HEALTH_CHECK_FRONTEND_URL": frontend.url,
+        "HEALTH_CHECK_DOCKER_SOCKET": docker.socket_path,
+        "HEALTH_CHECK_LOGS_DIR": logs_dir,
+        "HEALTH_CHECK_LOG_INDEX_DIR": index_dir,
+        "HEALTH_CHECK_PROBE_INTERVAL": str(args.probe_interval),
+    }
+    if peers:
+        env["HEALTH_CHECK_FLEET_PEERS"] = ",".join(f"peer{i}={peer.url}" for i, peer in enumerate(peers))
+    for item in args.server_env:
+        key, _, value = item.partition("=")
+        env[key] = value
+
+    server_log = open(os.path.join(workdir, "server.log"), "wb")
+
+    def launch():
+        return time.monotonic(), subprocess.Popen(
+            [sys.executable, SERVER_SCRIPT], env=env, stdout=server_log, stderr=subprocess.STDOUT
+        )
+
+    def stop(process):
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    launched, process = launch()
+    monitor = ProcessMonitor(process.pid)
+    metric_families = ("health_subprocess_runs_total", "health_docker_api_calls_total", "health_singleflight_shared_total")
+    restarts = []
+    try:
+        startup = measure_startup(port, process, launched)
+        monitor.sample()
+        metrics_before = scrape_metric_totals(port, metric_families)
+        docker_requests_before = sum(docker.requests.values())
+        docker_execs_before = docker.exec_count
+        monitor.start()
+
+        requests = build_requests(args, log_spans)
+        stop_at = time.monotonic() + args.duration
+        client_stats = [{} for _ in range(args.concurrency)]
+        background_stats = [{} for _ in range(args.large_readers)]
+        threads = [
+            threading.Thread(target=run_client, args=(port, requests, mix, stop_at, args.timeout, stats), daemon=True)
+            for stats in client_stats
+        ] + [
+            threading.Thread(target=run_client, args=(port, requests, {"logs_full": 1}, stop_at, args.timeout, stats), daemon=True)
+            for stats in background_stats
+        ]
+        logger.info(f"🚦 {args.concurrency} clients + {args.large_readers} large log readers for {args.duration:g}s against port {port}")
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        monitor.stop()
+        metrics_after = scrape_metric_totals(port, metric_families)
+
+        # Redeploy-style restarts: the new process finds the snapshot the previous one saved
+        for _ in range(args.restarts):
+            stop(process)
+            launched, process = launch()
+            restarts.append(measure_startup(port, process, launched))
+        if args.restarts:
+            logger.info(f"♨️ Restarts: first 200 after {', '.join(str(r['first_ok_s']) for r in restarts)}s")
+    finally:
+        stop(process)
+        server_log.close()
+        docker.stop()
+        backend.stop()
+        frontend.stop()
+        for peer in peers:
+            peer.stop()
+
+    endpoints = {}
+    for stats in client_stats:
+        for name, endpoint in stats.items():
+            endpoints.setdefault(name, EndpointStats()).merge(endpoint)
+    overall = EndpointStats()
+    for endpoint in endpoints.values():
+        overall.merge(endpoint)
+    background = EndpointStats()
+    for stats in background_stats:
+        for endpoint in stats.values():
+            background.merge(endpoint)
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": {
+            "duration_s": args.duration,
+            "concurrency": args.concurrency,
+            "large_readers": args.large_readers,
+            "mix": mix,
+            "log_size_bytes": log_size,
+            "range_bytes": args.range_bytes,
+            "backend": {"latency_s": args.backend_latency, "failure_rate": args.backend_failure_rate},
+            "frontend": {"latency_s": args.frontend_latency, "failure_rate": args.frontend_failure_rate},
+            "docker_exec_latency_s": args.docker_latency,
+            "probe_interval_s": args.probe_interval,
+            "peers": {"count": args.peers, "latency_s": args.peer_latency},
+            "restarts": args.restarts,
+            "server_env": args.server_env
+        },
+        "totals": {
+            "requests": len(overall.latencies),
+            "errors": overall.errors,
+            "throughput_rps": round(len(overall.latencies) / elapsed, 2),
+            "bytes": overall.bytes
+        },
+        "latency_ms": latency_summary(overall.latencies),
+        "startup": {"initial": startup, "restarts": restarts},
+        "endpoints": {name: endpoints[name].summary(elapsed) for name in sorted(endpoints)},
+        "background": {"logs_full": background.summary(elapsed)} if args.large_readers else {},
+        "server": {
+            **monitor.summary(),
+            "subprocess_runs": int(metrics_after["health_subprocess_runs_total"] - metrics_before["health_subprocess_runs_total"]),
+            "docker": {
+                "api_requests": sum(docker.requests.values()) - docker_requests_before,
+                "execs": docker.exec_count - docker_execs_before,
+                "coalesced_callers": int(metrics_after["health_singleflight_shared_total"] - metrics_before["health_singleflight_shared_total"])
+            },
+            "stub_requests": {"backend": backend.requests, "frontend": frontend.requests},
+            # Fan-out cost of /fleet: requests and new connections across all peers
+            "peer_requests": sum(sum(peer.requests.values()) for peer in peers),
+            "peer_connections": sum(peer.connections for peer in peers)
+        }
+    }
+    if not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load (default 30)")
+    parser.add_argument("--concurrency", type=int, default=16, help="mixed-traffic clients (default 16)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"endpoint weights (default {DEFAULT_MIX})")
+    parser.add_argument("--large-readers", type=int, default=0, help="clients streaming whole logs in the background")
+    parser.add_argument("--log-size", default="1G", help="size of each synthetic log, e.g. 512M, 4G (default 1G)")
+    parser.add_argument("--range-bytes", type=int, default=8 * 1024 ** 2, help="suffix Range size for logs_range")
+    parser.add_argument("--backend-latency", type=float, default=0.005)
+    parser.add_argument("--backend-failure-rate", type=float, default=0.0)
+    parser.add_argument("--frontend-latency", type=float, default=0.005)
+    parser.add_argument("--frontend-failure-rate", type=float, default=0.0)
+    parser.add_argument("--docker-latency", type=float, default=0.05, help="seconds per fake docker exec")
+    parser.add_argument("--probe-interval", type=float, default=10)
+    parser.add_argument("--peers", type=int, default=0, help="fake peer instances for /fleet (add fleet=N to --mix)")
+    parser.add_argument("--peer-latency", type=float, default=0.01, help="seconds per fake peer answer")
+    parser.add_argument("--restarts", type=int, default=0, help="restart the server N times after the load and time each start")
+    parser.add_argument("--timeout", type=float, default=30, help="client socket timeout")
+    parser.add_argument("--server-env", action="append", default=[], metavar="KEY=VALUE", help="extra server environment")
+    parser.add_argument("--workdir", help="keep logs here between runs (default: temporary directory)")
+    parser.add_argument("-o", "--output", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--baseline", help="previous report to compare against")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] bench: %(message)s", stream=sys.stderr)
+    report = run(args)
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["comparison"] = compare(report, json.load(f))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+        logger.info(f"📊 {report['totals']['throughput_rps']} req/s, p99 {report['latency_ms'].get('p99')} ms -> {args.output}")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""
+Circuit breakers for probed dependencies
+
+A breaker opens after `failure_threshold` consecutive failures. While it is
+open, callers get the last known failure immediately instead of repeating
+the I/O. Each time it opens, the re-probe backoff doubles (with jitter, up
+to `max_backoff`). After the backoff, one half-open trial at a time is let
+through. `recovery_successes` successful trials close the breaker again; the
+probe loop runs every `recovery_interval` seconds while a breaker is
+half-open, so a recovering dependency is confirmed quickly.
+"""
+
+import random
+import threading
+import time
+
+from health_check.metrics import Counter
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+TRANSITIONS = Counter("health_breaker_transitions_total", "Circuit breaker state changes", ["breaker", "state"])
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose breaker is open"""
+
+    def __init__(self, breaker):
+        retry_in = breaker.retry_in()
+        message = f"Circuit {breaker.state.replace('_', '-')} for {breaker.name}"
+        if breaker.consecutive_failures:
+            message += f" after {breaker.consecutive_failures} consecutive failures"
+        if retry_in:
+            message += f", next probe in {retry_in:.0f}s"
+        if breaker.last_error:
+            message += f" (last error: {breaker.last_error})"
+        super().__init__(message)
+        self.breaker = breaker
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker for one dependency"""
+
+    def __init__(self, name, failure_threshold=3, base_backoff=5.0, max_backoff=120.0, jitter=0.2,
+                 recovery_successes=2, recovery_interval=2.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.recovery_successes = recovery_successes
+        self.recovery_interval = recovery_interval
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.last_error = None
+        # Times opened since the last full recovery; drives the exponential backoff
+        self.open_count = 0
+        self.open_until = None
+        self._trial_successes = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def _transition(self, state):
+        self.state = state
+        TRANSITIONS.labels(self.name, state).inc()
+
+    def _backoff(self):
+        backoff = min(self.max_backoff, self.base_backoff * 2 ** (self.open_count - 1))
+        return backoff * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _open(self, now):
+        self.open_count += 1
+        self.open_until = now + self._backoff()
+        self._trial_successes = 0
+        self._transition(OPEN)
+
+    def allow(self):
+        """True when the caller may do the I/O; every allowed call must be followed by record()"""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if now < self.open_until:
+                    return False
+                self._transition(HALF_OPEN)
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record(self, ok, error=None):
+        with self._lock:
+            now = time.monotonic()
+            if ok:
+                self.consecutive_failures = 0
+                if self.state == HALF_OPEN:
+                    self._trial_in_flight = False
+                    self._trial_successes += 1
+                    if self._trial_successes >= self.recovery_successes:
+                        self.open_count = 0
+                        self.open_until = None
+                        self._transition(CLOSED)
+                return
+            self.consecutive_failures += 1
+            self.last_error = error
+            if self.state == HALF_OPEN:
+                self._trial_in_flight = False
+                self._open(now)
+            elif self.state == CLOSED and self.consecutive_failures >= self.failure_threshold:
+                self._open(now)
+
+    def is_open(self):
+        """True while the breaker is open and its backoff has not run out (does not start a trial)"""
+        return self.state == OPEN and time.monotonic() < self.open_until
+
+    def call(self, fn, *args, **kwargs):
+        """Run fn through the breaker, raising CircuitOpenError while open"""
+        if not self.allow():
+            raise CircuitOpenError(self)
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self.record(False, str(e))
+            raise
+        self.record(True)
+        return result
+
+    def retry_in(self, now=None):
+        """Seconds until the next probe is allowed, or None when closed"""
+        now = now if now is not None else time.monotonic()
+        if self.state == OPEN:
+            return max(self.open_until - now, 0.0)
+        if self.state == HALF_OPEN:
+            return 0.0
+        return None
+
+    def to_dict(self):
+        retry_in = self.retry_in()
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "open_count": self.open_count,
+            "retry_in_seconds": round(retry_in, 1) if retry_in is not None else None,
+            "last_error": self.last_error
+        }
+
+
+class BreakerRegistry:
+    """One breaker per dependency name, created on first use with shared settings"""
+
+    def __init__(self, **settings):
+        self.settings = settings
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(name, CircuitBreaker(name, **self.settings))
+        return breaker
+
+    def describe(self):
+        return {name: breaker.to_dict() for name, breaker in sorted(self._breakers.items())}
+
+    def next_probe_delay(self, interval):
+        """How soon the probe loop should run again: sooner while any breaker is recovering"""
+        delay = interval
+        for breaker in list(self._breakers.values()):
+            retry_in = breaker.retry_in()
+            if retry_in is not None:
+                # Half-open (or due) breakers read as 0s; re-probe them at the recovery pace
+                delay = min(delay, max(retry_in, breaker.recovery_interval))
+        return delay
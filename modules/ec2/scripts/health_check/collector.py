@@ -0,0 +1,339 @@
+"""
+Parallel streaming log collector
+
+Collects the Docker logs of every container and the *.log files on the
+shared logs volume into one gzipped tar stream. This replaces the
+container-by-container `docker-compose logs` copies the shell scripts made.
+Sources are read concurrently by at most `concurrency` readers. Each is
+written to the archive as soon as it is complete, and nothing is staged on
+disk first:
+
+- A log file without a time filter is copied straight from the volume.
+- Docker logs and time-filtered files must be complete before tar knows
+  their size. They are buffered in memory up to `spool_bytes`, then in a
+  temp file. No more than `concurrency` sources are buffered at any time.
+
+Served as /logs-archive by the health server, or run on the instance:
+
+    docker exec -w /app health_check_service python3 -m health_check.collector --since 4h > logs.tar.gz
+"""
+
+import argparse
+import gzip
+import io
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from health_check.log_index import parse_time_param
+from health_check.logs import CHUNK_SIZE
+from health_check.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+COLLECTIONS = Counter("health_log_collections_total", "Log archives produced by the collector")
+COLLECTED_BYTES = Counter("health_log_collected_bytes_total", "Uncompressed log bytes written to archives", ["source"])
+SOURCE_ERRORS = Counter("health_log_collect_errors_total", "Log sources that could not be collected", ["source"])
+
+# Go durations as docker logs --since takes them (4h, 2h30m, 1.5h, 500ms), plus d for days
+_DURATION_PART = re.compile(r"(\d+(?:\.\d*)?|\.\d+)(ns|us|µs|ms|s|m|h|d)")
+_DURATION = re.compile(r"(?:(?:\d+(?:\.\d*)?|\.\d+)(?:ns|us|µs|ms|s|m|h|d))+")
+_UNITS = {"ns": 1e-9, "us": 1e-6, "µs": 1e-6, "ms": 1e-3, "s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_duration(value):
+    """Seconds in a duration like 4h or 2h30m; None when value isn't one"""
+    value = value.strip()
+    if not _DURATION.fullmatch(value):
+        return None
+    return sum(float(number) * _UNITS[unit] for number, unit in _DURATION_PART.findall(value))
+
+
+def parse_time_bound(value, now=None):
+    """Epoch seconds from a relative duration like docker's --since 4h or 2h30m, epoch seconds or ISO-8601"""
+    duration = parse_duration(value)
+    if duration is not None:
+        return (now if now is not None else time.time()) - duration
+    return parse_time_param(value)
+
+
+class _ExactReader:
+    """Reads exactly `size` bytes, zero-padding a file that shrank under us so the tar stays valid"""
+
+    def __init__(self, f, size):
+        self.f = f
+        self.remaining = size
+        self.truncated = False
+
+    def read(self, n=-1):
+        if n < 0 or n > self.remaining:
+            n = self.remaining
+        data = self.f.read(n)
+        if len(data) < n:
+            self.truncated = True
+            data += bytes(n - len(data))
+        self.remaining -= n
+        return data
+
+
+class Source:
+    """One log in the archive; open() returns (size, file object) ready for tar"""
+
+    kind = None
+
+    def __init__(self, name, arcname):
+        self.name = name
+        self.arcname = arcname
+        self.mtime = time.time()
+
+    def open(self, spool_bytes, spool_dir):
+        raise NotImplementedError
+
+    @staticmethod
+    def _spool(chunks, spool_bytes, spool_dir):
+        spool = tempfile.SpooledTemporaryFile(max_size=spool_bytes, dir=spool_dir)
+        try:
+            for chunk in chunks:
+                spool.write(chunk)
+            size = spool.tell()
+            spool.seek(0)
+        except BaseException:
+            spool.close()
+            raise
+        return size, spool
+
+
+class FileSource(Source):
+    """A *.log file on the shared volume"""
+
+    kind = "file"
+
+    def __init__(self, path, arcname, since=None, until=None, indexes=None):
+        super().__init__(os.path.basename(path), arcname)
+        self.path = path
+        self.since = since
+        self.until = until
+        self.indexes = indexes
+
+    def open(self, spool_bytes, spool_dir):
+        f = open(self.path, "rb")
+        try:
+            st = os.fstat(f.fileno())
+            self.mtime = st.st_mtime
+            if self.since is None and self.until is None:
+                # Known size: tar reads straight from the file, the bytes present now and no more
+                return st.st_size, f
+            index = self.indexes.get(self.path) if self.indexes is not None else None
+            if index is None:
+                raise ValueError("time filters on log files need a log index")
+            with f:
+                return self._spool(index.query(f, st.st_size, self.since, self.until), spool_bytes, spool_dir)
+        except BaseException:
+            f.close()
+            raise
+
+
+class DockerLogSource(Source):
+    """stdout/stderr of one container, filtered by the daemon"""
+
+    kind = "docker"
+
+    def __init__(self, client, container, arcname, since=None, until=None, timeout=None, tail=None):
+        super().__init__(container, arcname)
+        self.client = client
+        self.since = since
+        self.until = until
+        self.timeout = timeout
+        self.tail = tail
+
+    def open(self, spool_bytes, spool_dir):
+        stream = self.client.container_logs(self.name, self.since, self.until, timeout=self.timeout, tail=self.tail)
+        try:
+            return self._spool(stream.chunks(), spool_bytes, spool_dir)
+        finally:
+            stream.close()
+
+
+def build_sources(client, logs_dir, since=None, until=None, containers=None, files=True, indexes=None,
+                  docker_timeout=None, tail=None):
+    """Every container's Docker log plus every *.log in logs_dir, as Sources
+
+    `tail` keeps only the last lines of each Docker log, like docker logs --tail.
+    Returns (sources, container list), where the container list is the raw
+    /containers/json answer for the archive, or an error dict when Docker
+    could not be reached.
+    """
+    sources = []
+    try:
+        listing = client.list_containers()
+    except Exception as e:
+        listing = {"error": str(e)}
+    if isinstance(listing, list):
+        for container in listing:
+            name = (container.get("Names") or [container.get("Id", "")])[0].lstrip("/")
+            # Compose service names work too (nginx for nginx_proxy)
+            service = (container.get("Labels") or {}).get("com.docker.compose.service")
+            if containers is None or name in containers or service in containers:
+                sources.append(DockerLogSource(client, name, f"docker/{name}.log", since, until, docker_timeout, tail))
+    if files:
+        try:
+            names = sorted(name for name in os.listdir(logs_dir) if name.endswith(".log"))
+        except OSError:
+            names = []
+        for name in names:
+            sources.append(FileSource(os.path.join(logs_dir, name), f"files/{name}", since, until, indexes))
+    return sources, listing
+
+
+def _member(arcname, size, mtime):
+    info = tarfile.TarInfo(arcname)
+    info.size = size
+    info.mtime = int(mtime)
+    info.mode = 0o644
+    return info
+
+
+def write_archive(out, sources, extra=None, concurrency=4, spool_bytes=8 * 1024 * 1024, spool_dir=None,
+                  prefix="logs", compresslevel=3):
+    """Stream a .tar.gz of every source to `out` and return the manifest
+
+    `extra` is {arcname: bytes} for small generated members. The manifest (per
+    source: bytes, seconds, error) is the last member of the archive.
+    """
+    started = time.monotonic()
+    COLLECTIONS.inc()
+    results = queue.Queue()
+    # Bounds buffered sources too: a slot is only freed once its source is in the archive
+    slots = threading.Semaphore(concurrency)
+    stop = threading.Event()
+
+    def read(source):
+        source_started = time.monotonic()
+        try:
+            size, f = source.open(spool_bytes, spool_dir)
+            results.put((source, size, f, None, source_started))
+        except Exception as e:
+            results.put((source, 0, None, str(e), source_started))
+
+    def feed():
+        for source in sources:
+            slots.acquire()
+            if stop.is_set():
+                return
+            executor.submit(read, source)
+
+    manifest = {"started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "sources": {}}
+    gz = gzip.GzipFile(fileobj=out, mode="wb", compresslevel=compresslevel, mtime=0)
+    tar = tarfile.open(fileobj=gz, mode="w|", format=tarfile.PAX_FORMAT, copybufsize=CHUNK_SIZE)
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="log-collector")
+    feeder = threading.Thread(target=feed, name="log-collector-feed", daemon=True)
+    feeder.start()
+    try:
+        for arcname, data in (extra or {}).items():
+            tar.addfile(_member(f"{prefix}/{arcname}", len(data), time.time()), io.BytesIO(data))
+
+        for _ in range(len(sources)):
+            source, size, f, error, source_started = results.get()
+            entry = {"kind": source.kind, "name": source.name}
+            if error is not None:
+                SOURCE_ERRORS.labels(source.kind).inc()
+                entry["error"] = error
+            else:
+                try:
+                    reader = _ExactReader(f, size)
+                    tar.addfile(_member(f"{prefix}/{source.arcname}", size, source.mtime), reader)
+                    COLLECTED_BYTES.labels(source.kind).inc(size)
+                    entry["bytes"] = size
+                    if reader.truncated:
+                        entry["error"] = "file shrank while being archived; zero-padded"
+                finally:
+                    f.close()
+            entry["seconds"] = round(time.monotonic() - source_started, 3)
+            manifest["sources"][source.arcname] = entry
+            slots.release()
+    finally:
+        # On a client disconnect: unblock the feeder, wait out in-flight reads and drop their buffers
+        stop.set()
+        for _ in range(concurrency):
+            slots.release()
+        feeder.join()
+        executor.shutdown(wait=True, cancel_futures=True)
+        while True:
+            try:
+                f = results.get_nowait()[2]
+            except queue.Empty:
+                break
+            if f is not None:
+                f.close()
+
+    manifest["seconds"] = round(time.monotonic() - started, 3)
+    data = json.dumps(manifest, indent=2).encode()
+    tar.addfile(_member(f"{prefix}/manifest.json", len(data), time.time()), io.BytesIO(data))
+    tar.close()
+    gz.close()
+    return manifest
+
+
+def main(argv=None):
+    """python3 -m health_check.collector: archive logs to a file or stdout"""
+    from health_check import config
+    from health_check.docker_api import DockerClient
+    from health_check.log_index import LogIndexRegistry
+
+    parser = argparse.ArgumentParser(description="Collect all Docker and service logs into one .tar.gz")
+    parser.add_argument("--since", help="Start of the window: 4h, 30m, epoch seconds or ISO-8601")
+    parser.add_argument("--until", help="End of the window, same formats")
+    parser.add_argument("--tail", type=int, help="Only the last N lines of each Docker log (default: all)")
+    parser.add_argument("--containers", help="Comma-separated container or compose service names (default: all)")
+    parser.add_argument("--no-files", action="store_true", help=f"Skip the *.log files in {config.LOGS_DIR}")
+    parser.add_argument("--concurrency", type=int, default=config.COLLECT_CONCURRENCY)
+    parser.add_argument("-o", "--output", default="-", help="Archive path, or - for stdout (default)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] LogCollector: %(message)s",
+                        stream=sys.stderr)
+
+    try:
+        since = parse_time_bound(args.since) if args.since else None
+        until = parse_time_bound(args.until) if args.until else None
+    except ValueError:
+        parser.error("--since/--until must be a duration like 4h or 2h30m, epoch seconds or ISO-8601")
+    if args.tail is not None and args.tail < 0:
+        parser.error("--tail must be a non-negative integer")
+
+    client = DockerClient(config.DOCKER_SOCKET, timeout=config.DOCKER_TIMEOUT)
+    indexes = LogIndexRegistry(config.LOGS_DIR, config.LOG_INDEX_DIR, config.LOG_INDEX_STRIDE)
+    containers = set(args.containers.split(",")) if args.containers else None
+    sources, listing = build_sources(client, config.LOGS_DIR, since, until, containers, not args.no_files, indexes,
+                                     config.DOCKER_TIMEOUT, args.tail)
+    prefix = "logs-" + time.strftime("%Y%m%d_%H%M%S", time.gmtime())
+
+    out = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    try:
+        manifest = write_archive(
+            out, sources, {"containers.json": json.dumps(listing, indent=2).encode()},
+            concurrency=max(1, args.concurrency), spool_bytes=config.COLLECT_SPOOL_BYTES,
+            spool_dir=config.COLLECT_SPOOL_DIR or None, prefix=prefix, compresslevel=config.COLLECT_GZIP_LEVEL
+        )
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+        client.close()
+
+    failed = [name for name, entry in manifest["sources"].items() if "error" in entry]
+    total = sum(entry.get("bytes", 0) for entry in manifest["sources"].values())
+    logger.info(f"📦 {len(sources)} logs, {total} bytes in {manifest['seconds']:.1f}s ({len(failed)} failed)")
+    for name in failed:
+        logger.warning(f"⚠️ {name}: {manifest['sources'][name]['error']}")
+    return 1 if failed and len(failed) == len(sources) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
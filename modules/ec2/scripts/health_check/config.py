@@ -0,0 +1,118 @@
+"""
+Runtime configuration for the health check server
+
+Every value can be overridden through an environment variable so the
+docker-compose file can tune the server without editing code.
+"""
+
+import os
+
+# Server
+PORT = int(os.environ.get("HEALTH_CHECK_PORT", "8888"))
+HEALTH_CHECK_SCRIPT = os.environ.get("HEALTH_CHECK_SCRIPT", "/app/sms-seller-connect/health-check.sh")
+SCRIPT_TIMEOUT = float(os.environ.get("HEALTH_CHECK_SCRIPT_TIMEOUT", "15"))
+
+# Background probe loop
+# "native" probes dependencies in-process, "script" runs health-check.sh, "fleet" checks the peer instances
+PROBE_MODE = os.environ.get("HEALTH_CHECK_MODE", "native")
+PROBE_INTERVAL = float(os.environ.get("HEALTH_CHECK_PROBE_INTERVAL", "10"))
+STALE_AFTER = float(os.environ.get("HEALTH_CHECK_STALE_AFTER", "45"))
+
+# Native HTTP probes
+BACKEND_URL = os.environ.get("HEALTH_CHECK_BACKEND_URL", "http://sms_backend:8900/health")
+FRONTEND_URL = os.environ.get("HEALTH_CHECK_FRONTEND_URL", "http://sms_frontend:8082")
+PROBE_TIMEOUT = float(os.environ.get("HEALTH_CHECK_PROBE_TIMEOUT", "5"))
+PROBE_RETRIES = int(os.environ.get("HEALTH_CHECK_PROBE_RETRIES", "2"))
+PROBE_DEADLINE = float(os.environ.get("HEALTH_CHECK_PROBE_DEADLINE", "8"))
+
+# HTTP server core
+BIND_ADDRESS = os.environ.get("HEALTH_CHECK_BIND", "127.0.0.1")
+WORKERS = int(os.environ.get("HEALTH_CHECK_WORKERS", "16"))
+BACKLOG = int(os.environ.get("HEALTH_CHECK_BACKLOG", "64"))
+HEAVY_SLOTS = int(os.environ.get("HEALTH_CHECK_HEAVY_SLOTS", "4"))
+KEEPALIVE_TIMEOUT = float(os.environ.get("HEALTH_CHECK_KEEPALIVE_TIMEOUT", "15"))
+# Idle keep-alive connections are parked without a worker; beyond this many, new idle ones are closed
+KEEPALIVE_MAX_IDLE = int(os.environ.get("HEALTH_CHECK_KEEPALIVE_MAX_IDLE", "1024"))
+# JSON responses at least this large are gzipped for clients that accept it
+RESPONSE_GZIP_MIN_BYTES = int(os.environ.get("HEALTH_CHECK_RESPONSE_GZIP_MIN_BYTES", "1024"))
+
+# Docker Engine API
+DOCKER_SOCKET = os.environ.get("HEALTH_CHECK_DOCKER_SOCKET", "/var/run/docker.sock")
+DOCKER_TIMEOUT = float(os.environ.get("HEALTH_CHECK_DOCKER_TIMEOUT", "10"))
+
+# Single-flight coalescing of Docker calls shared by /services and the probes
+# TTL: how long a finished result is reused; WAIT: how long one /services caller waits for it
+COALESCE_TTL = float(os.environ.get("HEALTH_CHECK_COALESCE_TTL", "2"))
+COALESCE_WAIT = float(os.environ.get("HEALTH_CHECK_COALESCE_WAIT", "5"))
+
+# Circuit breakers per dependency (HTTP probes, Docker daemon, exec-checked background services)
+# Open after THRESHOLD consecutive failures; re-probe after BASE_BACKOFF doubling up to MAX_BACKOFF (+/- JITTER);
+# close after RECOVERY_SUCCESSES half-open trials spaced RECOVERY_INTERVAL apart
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get("HEALTH_CHECK_BREAKER_FAILURE_THRESHOLD", "3"))
+BREAKER_BASE_BACKOFF = float(os.environ.get("HEALTH_CHECK_BREAKER_BASE_BACKOFF", "5"))
+BREAKER_MAX_BACKOFF = float(os.environ.get("HEALTH_CHECK_BREAKER_MAX_BACKOFF", "120"))
+BREAKER_JITTER = float(os.environ.get("HEALTH_CHECK_BREAKER_JITTER", "0.2"))
+BREAKER_RECOVERY_SUCCESSES = int(os.environ.get("HEALTH_CHECK_BREAKER_RECOVERY_SUCCESSES", "2"))
+BREAKER_RECOVERY_INTERVAL = float(os.environ.get("HEALTH_CHECK_BREAKER_RECOVERY_INTERVAL", "2"))
+
+# Service logs
+LOGS_DIR = os.environ.get("HEALTH_CHECK_LOGS_DIR", "/app/logs")
+LOG_GZIP_MIN_BYTES = int(os.environ.get("HEALTH_CHECK_LOG_GZIP_MIN_BYTES", "1024"))
+
+# Log collector (/logs-archive, python3 -m health_check.collector)
+# Concurrent readers; Docker logs are buffered in memory up to SPOOL_BYTES each, then in SPOOL_DIR (empty: system temp)
+COLLECT_CONCURRENCY = int(os.environ.get("HEALTH_CHECK_COLLECT_CONCURRENCY", "4"))
+COLLECT_SPOOL_BYTES = int(os.environ.get("HEALTH_CHECK_COLLECT_SPOOL_BYTES", str(8 * 1024 * 1024)))
+COLLECT_SPOOL_DIR = os.environ.get("HEALTH_CHECK_COLLECT_SPOOL_DIR", "")
+COLLECT_GZIP_LEVEL = int(os.environ.get("HEALTH_CHECK_COLLECT_GZIP_LEVEL", "3"))
+
+# Heartbeats from the background service runners (unix datagram socket on app_logs, optional UDP)
+HEARTBEAT_SOCKET = os.environ.get("HEALTH_CHECK_HEARTBEAT_SOCKET", os.path.join(LOGS_DIR, "heartbeat.sock"))
+HEARTBEAT_UDP_PORT = int(os.environ.get("HEALTH_CHECK_HEARTBEAT_UDP_PORT", "0"))
+# Loop interval assumed when a runner doesn't report one; stalled after interval + loop time + grace
+HEARTBEAT_INTERVAL = float(os.environ.get("HEALTH_CHECK_HEARTBEAT_INTERVAL", "60"))
+HEARTBEAT_GRACE = float(os.environ.get("HEALTH_CHECK_HEARTBEAT_GRACE", "30"))
+
+# Probe history for /history: RESOLUTION-second slots kept for RETENTION seconds,
+# saved to HISTORY_FILE every SAVE_INTERVAL seconds (empty path: memory only)
+HISTORY_RESOLUTION = float(os.environ.get("HEALTH_CHECK_HISTORY_RESOLUTION", "5"))
+HISTORY_RETENTION = float(os.environ.get("HEALTH_CHECK_HISTORY_RETENTION", str(3 * 24 * 3600)))
+HISTORY_FILE = os.environ.get("HEALTH_CHECK_HISTORY_FILE", os.path.join(LOGS_DIR, "health-history.bin"))
+HISTORY_SAVE_INTERVAL = float(os.environ.get("HEALTH_CHECK_HISTORY_SAVE_INTERVAL", "60"))
+HISTORY_MAX_POINTS = int(os.environ.get("HEALTH_CHECK_HISTORY_MAX_POINTS", "1000"))
+
+# Warm restart: every live snapshot is saved to SNAPSHOT_FILE (empty path: disabled) and, on the next
+# start, served as "warming" until the first live probe completes if it is at most MAX_AGE seconds old
+SNAPSHOT_FILE = os.environ.get("HEALTH_CHECK_SNAPSHOT_FILE", os.path.join(LOGS_DIR, "health-snapshot.json"))
+SNAPSHOT_MAX_AGE = float(os.environ.get("HEALTH_CHECK_SNAPSHOT_MAX_AGE", "300"))
+
+# Timestamp index for ?since=&until=&grep= queries (empty dir: next to each log)
+LOG_INDEX_DIR = os.environ.get("HEALTH_CHECK_LOG_INDEX_DIR", "")
+LOG_INDEX_STRIDE = int(os.environ.get("HEALTH_CHECK_LOG_INDEX_STRIDE", str(64 * 1024)))
+LOG_INDEX_REFRESH = float(os.environ.get("HEALTH_CHECK_LOG_INDEX_REFRESH", "60"))
+LOG_QUERY_MAX_LINES = int(os.environ.get("HEALTH_CHECK_LOG_QUERY_MAX_LINES", "10000"))
+
+# Throughput analytics for /activity and /services: the service logs are parsed from saved offsets every
+# INTERVAL seconds (at most MAX_READ bytes per log per update); a log seen for the first time is only
+# read from its last BACKFILL bytes. Per-minute buckets cover WINDOW minutes; state is saved to FILE
+LOG_STATS_INTERVAL = float(os.environ.get("HEALTH_CHECK_LOG_STATS_INTERVAL", "5"))
+LOG_STATS_FILE = os.environ.get("HEALTH_CHECK_LOG_STATS_FILE", os.path.join(LOGS_DIR, "log-stats.json"))
+LOG_STATS_BACKFILL = int(os.environ.get("HEALTH_CHECK_LOG_STATS_BACKFILL", str(1024 * 1024)))
+LOG_STATS_MAX_READ = int(os.environ.get("HEALTH_CHECK_LOG_STATS_MAX_READ", str(16 * 1024 * 1024)))
+LOG_STATS_WINDOW = int(os.environ.get("HEALTH_CHECK_LOG_STATS_WINDOW", "60"))
+
+# Fleet view (/fleet, HEALTH_CHECK_MODE=fleet): peers as "name=http://host:8888" entries, comma-separated in
+# PEERS and/or one per line in PEERS_FILE (re-read when it changes). Each peer gets TIMEOUT per request and
+# DEADLINE for the whole fan-out; a merged view is reused for CACHE_TTL seconds
+FLEET_PEERS = os.environ.get("HEALTH_CHECK_FLEET_PEERS", "")
+FLEET_PEERS_FILE = os.environ.get("HEALTH_CHECK_FLEET_PEERS_FILE", "")
+FLEET_TIMEOUT = float(os.environ.get("HEALTH_CHECK_FLEET_TIMEOUT", "2"))
+FLEET_DEADLINE = float(os.environ.get("HEALTH_CHECK_FLEET_DEADLINE", "3"))
+FLEET_CACHE_TTL = float(os.environ.get("HEALTH_CHECK_FLEET_CACHE_TTL", "5"))
+FLEET_WORKERS = int(os.environ.get("HEALTH_CHECK_FLEET_WORKERS", "64"))
+
+# Live log following
+FOLLOW_POLL_INTERVAL = float(os.environ.get("HEALTH_CHECK_FOLLOW_POLL_INTERVAL", "0.5"))
+FOLLOW_HEARTBEAT = float(os.environ.get("HEALTH_CHECK_FOLLOW_HEARTBEAT", "15"))
+FOLLOW_IDLE_TIMEOUT = float(os.environ.get("HEALTH_CHECK_FOLLOW_IDLE_TIMEOUT", "30"))
+FOLLOW_MAX_SUBSCRIBERS = int(os.environ.get("HEALTH_CHECK_FOLLOW_MAX_SUBSCRIBERS", "100"))
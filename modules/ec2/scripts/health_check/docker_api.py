@@ -0,0 +1,268 @@
+"""
+Minimal Docker Engine API client over /var/run/docker.sock
+
+Speaks plain HTTP over the unix socket with pooled keep-alive connections,
+so container state, exec and log calls need no docker CLI and no fork.
+"""
+
+import http.client
+import json
+import queue
+import socket
+import struct
+import time
+from urllib.parse import quote, urlencode
+
+from health_check.metrics import Counter
+
+DOCKER_CALLS = Counter("health_docker_api_calls_total", "Docker Engine API operations", ["operation"])
+DOCKER_TIMEOUTS = Counter("health_docker_api_timeouts_total", "Docker Engine API operations that timed out", ["operation"])
+DOCKER_ERRORS = Counter("health_docker_api_errors_total", "Docker Engine API operations that failed", ["operation"])
+
+
+class DockerAPIError(Exception):
+    """Raised when the Docker daemon returns an error or cannot be reached"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection that connects to a unix domain socket"""
+
+    def __init__(self, socket_path, timeout):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+
+def demux_stream(data):
+    """Split a multiplexed exec stream into (stdout, stderr) bytes"""
+    stdout = bytearray()
+    stderr = bytearray()
+    offset = 0
+    while offset + 8 <= len(data):
+        stream_type, size = struct.unpack_from(">BxxxL", data, offset)
+        offset += 8
+        chunk = data[offset:offset + size]
+        offset += size
+        if stream_type == 2:
+            stderr += chunk
+        else:
+            stdout += chunk
+    return bytes(stdout), bytes(stderr)
+
+
+class LogStream:
+    """Body of a /containers/{id}/logs response on its own connection; close() when done"""
+
+    def __init__(self, conn, response):
+        self._conn = conn
+        self._response = response
+
+    def chunks(self, block_size=64 * 1024):
+        """Yield log bytes in blocks, demultiplexing stdout/stderr frames when the container has no TTY"""
+        pending = bytearray()
+        multiplexed = None
+        while True:
+            data = self._response.read(block_size)
+            if not data:
+                return
+            if multiplexed is None:
+                # Without a TTY every frame starts with a stream byte (0-2) and three zero bytes
+                multiplexed = len(data) >= 8 and data[0] <= 2 and data[1:4] == b"\x00\x00\x00"
+            if not multiplexed:
+                yield data
+                continue
+            pending += data
+            output = bytearray()
+            offset = 0
+            while len(pending) - offset >= 8:
+                size = int.from_bytes(pending[offset + 4:offset + 8], "big")
+                if len(pending) - offset - 8 < size:
+                    break
+                output += pending[offset + 8:offset + 8 + size]
+                offset += 8 + size
+            del pending[:offset]
+            if output:
+                yield bytes(output)
+
+    def close(self):
+        self._conn.close()
+
+
+class ExecResult:
+    """Output of one exec run inside a container"""
+
+    __slots__ = ("exit_code", "stdout", "stderr")
+
+    def __init__(self, exit_code, stdout, stderr):
+        self.exit_code = exit_code
+        self.stdout = stdout
+        self.stderr = stderr
+
+
+class DockerClient:
+    """Thread-safe client for the handful of Engine API calls the health server needs"""
+
+    def __init__(self, socket_path="/var/run/docker.sock", timeout=10, max_idle=4):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=max_idle)
+
+    def _checkout(self, timeout):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = UnixHTTPConnection(self.socket_path, timeout)
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn
+
+    def _checkin(self, conn):
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def request(self, method, path, body=None, timeout=None, reuse=True):
+        """Send one API request and return (status, body bytes)"""
+        timeout = timeout or self.timeout
+        headers = {"Host": "docker"}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+
+        # An idle pooled socket may have been closed by the daemon - retry once on a fresh one
+        for attempt in range(2):
+            conn = self._checkout(timeout)
+            fresh = conn.sock is None
+            try:
+                conn.request(method, path, body=payload, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                if fresh or attempt:
+                    raise DockerAPIError(f"Docker API {method} {path} failed: {e}") from e
+                continue
+            if reuse and not response.will_close:
+                self._checkin(conn)
+            else:
+                conn.close()
+            return response.status, data
+
+    def _json(self, method, path, body=None, expected=(200,), timeout=None):
+        status, data = self.request(method, path, body, timeout)
+        if status not in expected:
+            message = data.decode(errors="replace").strip()
+            try:
+                message = json.loads(data).get("message", message)
+            except (ValueError, AttributeError):
+                pass
+            raise DockerAPIError(f"Docker API {method} {path} returned {status}: {message}", status)
+        return json.loads(data) if data else None
+
+    def _instrumented(self, operation, call, *args, **kwargs):
+        DOCKER_CALLS.labels(operation).inc()
+        try:
+            return call(*args, **kwargs)
+        except Exception as e:
+            if isinstance(e.__cause__, TimeoutError) or isinstance(e, TimeoutError):
+                DOCKER_TIMEOUTS.labels(operation).inc()
+            DOCKER_ERRORS.labels(operation).inc()
+            raise
+
+    def ping(self):
+        status, _ = self._instrumented("ping", self.request, "GET", "/_ping")
+        return status == 200
+
+    def list_containers(self, all=True):
+        """Every container with its state in a single call"""
+        return self._instrumented("list_containers", self._json, "GET", "/containers/json?" + urlencode({"all": int(all)}))
+
+    def container_states(self):
+        """{container name: state} for every container, e.g. {"sms_backend": "running"}"""
+        states = {}
+        for container in self.list_containers():
+            for name in container.get("Names", []):
+                states[name.lstrip("/")] = container.get("State", "unknown")
+        return states
+
+    def container_logs(self, container, since=None, until=None, timestamps=True, timeout=None, tail=None):
+        """Open a container's stdout/stderr log as a LogStream, filtered by since/until and tail like docker logs"""
+        return self._instrumented("logs", self._container_logs, container, since, until, timestamps, timeout, tail)
+
+    def _container_logs(self, container, since, until, timestamps, timeout, tail):
+        params = {"stdout": 1, "stderr": 1, "timestamps": int(timestamps)}
+        if tail is not None:
+            params["tail"] = int(tail)
+        if since is not None:
+            params["since"] = f"{since:.9f}"
+        if until is not None:
+            params["until"] = f"{until:.9f}"
+        path = f"/containers/{quote(container)}/logs?" + urlencode(params)
+
+        # Logs can be large, so they get a dedicated connection that is read incrementally
+        conn = UnixHTTPConnection(self.socket_path, timeout or self.timeout)
+        try:
+            conn.request("GET", path, headers={"Host": "docker"})
+            response = conn.getresponse()
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            raise DockerAPIError(f"Docker API GET {path} failed: {e}") from e
+        if response.status != 200:
+            message = response.read().decode(errors="replace").strip()
+            conn.close()
+            try:
+                message = json.loads(message).get("message", message)
+            except (ValueError, AttributeError):
+                pass
+            raise DockerAPIError(f"Docker API GET {path} returned {response.status}: {message}", response.status)
+        return LogStream(conn, response)
+
+    def exec_run(self, container, cmd, timeout=None):
+        """Run a command inside a container and return its ExecResult"""
+        return self._instrumented("exec", self._exec_run, container, cmd, timeout)
+
+    def _exec_run(self, container, cmd, timeout):
+        timeout = timeout or self.timeout
+        started = time.monotonic()
+        created = self._json(
+            "POST", f"/containers/{quote(container)}/exec",
+            {"AttachStdout": True, "AttachStderr": True, "Tty": False, "Cmd": cmd},
+            expected=(201,), timeout=timeout
+        )
+        exec_id = created["Id"]
+
+        # exec start hijacks the connection, so it can never go back to the pool
+        remaining = max(timeout - (time.monotonic() - started), 0.1)
+        status, data = self.request(
+            "POST", f"/exec/{exec_id}/start", {"Detach": False, "Tty": False},
+            timeout=remaining, reuse=False
+        )
+        if status != 200:
+            raise DockerAPIError(f"Docker exec start returned {status}", status)
+        stdout, stderr = demux_stream(data)
+
+        inspect = self._json("GET", f"/exec/{exec_id}/json", timeout=timeout)
+        return ExecResult(inspect.get("ExitCode"), stdout.decode(errors="replace"), stderr.decode(errors="replace"))
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
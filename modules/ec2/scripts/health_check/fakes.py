@@ -0,0 +1,361 @@
+"""
+Local stand-ins for the health server's dependencies
+
+FakeDockerDaemon answers the Engine API calls used by DockerClient on a unix
+socket, so the probes, /services and the log collector can be exercised
+without Docker. FakePeer plays another instance's health server for the
+fleet view.
+"""
+
+import hashlib
+import http.server
+import itertools
+import json
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import parse_qs, unquote, urlsplit
+
+
+def frame(stream_type, payload):
+    """Encode one multiplexed exec stream frame"""
+    return struct.pack(">BxxxL", stream_type, len(payload)) + payload
+
+
+class _ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _FakeDockerHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.daemon.lock:
+            self.server.daemon.connections += 1
+
+    def send_json(self, status_code, data):
+        body = json.dumps(data).encode()
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length)) if length else {}
+
+    def do_GET(self):
+        daemon = self.server.daemon
+        daemon.count("GET " + urlsplit(self.path).path)
+        path = urlsplit(self.path).path
+        if path == "/_ping":
+            body = b"OK"
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif path == "/containers/json":
+            self.send_json(200, [
+                {"Id": name, "Names": [f"/{name}"], "State": state, "Status": state}
+                for name, state in daemon.containers.items()
+            ])
+        elif path.startswith("/containers/") and path.endswith("/logs"):
+            self.send_logs(unquote(path.split("/")[2]), parse_qs(urlsplit(self.path).query))
+        elif path.startswith("/exec/") and path.endswith("/json"):
+            exec_id = path.split("/")[2]
+            run = daemon.execs.get(exec_id)
+            if run is None:
+                self.send_json(404, {"message": f"No such exec instance: {exec_id}"})
+            else:
+                self.send_json(200, {"ID": exec_id, "Running": False, "ExitCode": run.get("exit_code")})
+        else:
+            self.send_json(404, {"message": "page not found"})
+
+    def send_logs(self, container, query):
+        daemon = self.server.daemon
+        if container not in daemon.containers:
+            self.send_json(404, {"message": f"No such container: {container}"})
+            return
+        # Like dockerd for a container without a TTY: multiplexed frames, then the connection is closed
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.docker.multiplexed-stream")
+        self.end_headers()
+        logs = daemon.logs.get(container)
+        if isinstance(logs, str):
+            # A file path: stream it as-is in 16 KiB frames (no filtering)
+            with open(logs, "rb") as f:
+                while True:
+                    block = f.read(16 * 1024)
+                    if not block:
+                        break
+                    self.wfile.write(frame(1, block))
+        else:
+            since = float(query["since"][0]) if "since" in query else None
+            until = float(query["until"][0]) if "until" in query else None
+            tail = int(query["tail"][0]) if query.get("tail", ["all"])[0] != "all" else None
+            lines = []
+            for line in (logs if logs is not None else daemon.default_logs(container)).splitlines(keepends=True):
+                stamp = datetime.fromisoformat(line.split(b" ", 1)[0].decode().rstrip("Z")[:26]).replace(
+                    tzinfo=timezone.utc
+                ).timestamp()
+                if (since is None or stamp >= since) and (until is None or stamp <= until):
+                    lines.append(line)
+            if tail is not None:
+                lines = lines[len(lines) - min(tail, len(lines)):]
+            for line in lines:
+                self.wfile.write(frame(2 if b"ERROR" in line else 1, line))
+        self.close_connection = True
+
+    def do_POST(self):
+        daemon = self.server.daemon
+        path = urlsplit(self.path).path
+        daemon.count("POST " + path)
+        body = self.read_json()
+        parts = path.split("/")
+        if len(parts) == 4 and parts[1] == "containers" and parts[3] == "exec":
+            container = unquote(parts[2])
+            if daemon.containers.get(container) != "running":
+                self.send_json(409, {"message": f"Container {container} is not running"})
+                return
+            exec_id = daemon.new_exec(container, body.get("Cmd", []))
+            self.send_json(201, {"Id": exec_id})
+        elif len(parts) == 4 and parts[1] == "exec" and parts[3] == "start":
+            run = daemon.execs.get(parts[2])
+            if run is None:
+                self.send_json(404, {"message": f"No such exec instance: {parts[2]}"})
+                return
+            exit_code, stdout, stderr = daemon.exec_handler(run["container"], run["cmd"])
+            run["exit_code"] = exit_code
+            # Like dockerd: raw multiplexed stream, then the connection is closed
+            self.send_response(200)
+            self.send_header("Content-Type", "application/vnd.docker.raw-stream")
+            self.end_headers()
+            if stdout:
+                self.wfile.write(frame(1, stdout.encode()))
+            if stderr:
+                self.wfile.write(frame(2, stderr.encode()))
+            self.close_connection = True
+        else:
+            self.send_json(404, {"message": "page not found"})
+
+
+class FakeDockerDaemon:
+    """In-process Docker daemon on a unix socket with canned container and exec state"""
+
+    def __init__(self, socket_path, containers=None, background=None, exec_handler=None, logs=None):
+        self.socket_path = socket_path
+        self.containers = dict(containers or {
+            "sms_backend": "running",
+            "sms_frontend": "running",
+            "nginx_proxy": "running"
+        })
+        # {service name: {"PROCESS": ..., "PID": ..., ...}} rendered by the default exec handler
+        self.background = background if background is not None else {
+            "scheduled-messages": {"PROCESS": "running", "PID": "101"},
+            "ai-processor": {"PROCESS": "running", "PID": "102"}
+        }
+        self.exec_handler = exec_handler or self.default_exec_handler
+        # {container: bytes of timestamped lines, or a file path streamed as-is}
+        self.logs = dict(logs or {})
+        self.execs = {}
+        self.requests = {}
+        self.connections = 0
+        self.lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._server = None
+        self._thread = None
+
+    def count(self, key):
+        with self.lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    @property
+    def exec_count(self):
+        return len(self.execs)
+
+    def new_exec(self, container, cmd):
+        exec_id = f"exec{next(self._ids)}"
+        self.execs[exec_id] = {"container": container, "cmd": cmd, "exit_code": None}
+        return exec_id
+
+    def default_logs(self, container):
+        """A few timestamped lines per container, one a minute up to now, in UTC"""
+        now = int(time.time()) // 60 * 60
+        return b"".join(
+            f"{time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(now - 60 * age))}.000000000Z {container} {level} line {age}\n".encode()
+            for age, level in zip(range(4, -1, -1), ("INFO", "INFO", "ERROR", "INFO", "INFO"))
+        )
+
+    def default_exec_handler(self, container, cmd):
+        lines = []
+        for name, parts in self.background.items():
+            fields = {
+                "PROCESS": "not_started", "PID": "", "LOG_EXISTS": "true",
+                "LOG_SIZE": "0", "LOG_MODIFIED": "unknown", **parts
+            }
+            recent = fields.pop("RECENT", "")
+            line = "|".join([f"SERVICE:{name}"] + [f"{key}:{value}" for key, value in fields.items()])
+            lines.append(f"{line}|RECENT:{recent}")
+        return 0, "\n".join(lines) + "\n", ""
+
+    def start(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._server = _ThreadingUnixHTTPServer(self.socket_path, _FakeDockerHandler)
+        self._server.daemon = self
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-dockerd", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _QuietHTTPServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients that gave up on a slow answer are expected
+        pass
+
+
+class _FakePeerHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.peer.lock:
+            self.server.peer.connections += 1
+            self.server.peer.sockets.add(self.connection)
+
+    def finish(self):
+        with self.server.peer.lock:
+            self.server.peer.sockets.discard(self.connection)
+        super().finish()
+
+    def do_GET(self):
+        peer = self.server.peer
+        path = urlsplit(self.path).path
+        peer.count(path)
+        if peer.latency:
+            time.sleep(peer.latency)
+        if path == "/health-check":
+            status_code, data = (200 if peer.status in ("healthy", "warming") else 503), peer.health()
+        elif path == "/services":
+            status_code, data = 200, peer.services()
+        else:
+            status_code, data = 404, {"error": "Not Found"}
+        body = json.dumps(data, sort_keys=True).encode()
+        # Like the real server: a 200 whose body is unchanged is revalidated with a 304
+        tag = 'W/"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        if status_code == 200 and self.headers.get("If-None-Match") == tag:
+            self.send_response(304)
+            self.send_header("ETag", tag)
+            self.end_headers()
+            return
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", tag)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakePeer:
+    """Another instance's health server on 127.0.0.1, answering /health-check and /services"""
+
+    def __init__(self, status="healthy", latency=0.0, containers=None, background=None):
+        self.set_status(status)
+        self.latency = latency
+        self.containers = dict(containers or {
+            "sms_backend": "running",
+            "sms_frontend": "running",
+            "nginx_proxy": "running"
+        })
+        self.background = dict(background or {"scheduled-messages": "running", "ai-processor": "running"})
+        self.requests = {}
+        self.connections = 0
+        self.sockets = set()
+        self.lock = threading.Lock()
+        self._server = None
+        self._port = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._port}"
+
+    def count(self, key):
+        with self.lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def set_status(self, status):
+        """Change the reported status; like a new snapshot, this changes checked_at too"""
+        self.status = status
+        self.checked_at = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+    def health(self):
+        data = {
+            "status": self.status,
+            "checked_at": self.checked_at,
+            "snapshot_age_seconds": 1.0,
+            "probes": {"sms_backend": {"ok": self.status != "unhealthy"}}
+        }
+        if self.status == "unhealthy":
+            data["error"] = "SMS Backend: HTTP 500"
+        return data
+
+    def services(self):
+        return {
+            "containers": {name: {"state": state} for name, state in self.containers.items()},
+            "background_services": {name: {"status": status} for name, status in self.background.items()}
+        }
+
+    def start(self):
+        # The same port across restarts, so a stopped peer can come back where the aggregator expects it
+        self._server = _QuietHTTPServer(("127.0.0.1", self._port), _FakePeerHandler)
+        self._server.peer = self
+        self._port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name="fake-peer", daemon=True).start()
+        return self
+
+    def stop(self):
+        """Stop listening and drop open keep-alive connections, like an instance going away"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        with self.lock:
+            for sock in self.sockets:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,394 @@
+"""
+Fleet-wide health view
+
+Aggregates the health servers of every instance built from this module.
+Each peer's /health-check and /services are fetched at the same time over
+pooled keep-alive connections, and every peer is bounded by its own
+deadline, so one slow or dead instance can't hold up the others. A
+/services answer the peer has not changed since the last fan-out is
+revalidated with If-None-Match and comes back as a bodiless 304. The last good answer from
+each peer is kept: an instance that stops answering is reported as
+unreachable together with what it said last and how old that is.
+
+Peers come from HEALTH_CHECK_FLEET_PEERS and/or HEALTH_CHECK_FLEET_PEERS_FILE,
+one "name=http://host:port" (or just "host:port") per entry; the file is
+re-read whenever it changes.
+"""
+
+import gzip
+import http.client
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+from health_check.metrics import Counter, Histogram
+from health_check.probes import ConnectionPool, ProbeResult
+from health_check.singleflight import SingleFlight
+from health_check.snapshot import HealthSnapshot, utc_timestamp
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8888
+
+# Path on each peer and the status codes that carry a usable answer; an unhealthy instance answers 503
+FLEET_PATHS = {
+    "/health-check": (200, 503),
+    "/services": (200,)
+}
+# Paths whose ETag covers every field the view uses; the /health-check ETag leaves out checked_at and ages
+REVALIDATED_PATHS = ("/services",)
+
+FANOUTS = Counter("health_fleet_fanouts_total", "Concurrent fan-outs to the fleet's peers")
+FETCH_LATENCY = Histogram("health_fleet_fetch_duration_seconds", "Latency of each request to a peer", ["peer"])
+FETCH_ERRORS = Counter("health_fleet_fetch_errors_total", "Peer requests that failed or missed their deadline", ["peer"])
+NOT_MODIFIED = Counter("health_fleet_not_modified_total", "Peer answers revalidated with a 304", ["peer"])
+
+
+def parse_peers(text):
+    """[(name, base URL)] from "name=http://host:port" or bare "host:port" entries
+
+    Entries are separated by commas or newlines; "#" starts a comment. An
+    entry without a name is named after its host:port.
+    """
+    peers = []
+    names = set()
+    for line in text.splitlines():
+        for entry in line.split("#", 1)[0].split(","):
+            entry = entry.strip()
+            if not entry:
+                continue
+            name, separator, url = entry.partition("=")
+            if not separator:
+                name, url = "", entry
+            url = url.strip()
+            parts = urlsplit(url if "://" in url else f"http://{url}")
+            if parts.scheme != "http" or not parts.hostname:
+                raise ValueError(f"Unsupported peer {entry!r}: expected name=http://host:port")
+            base_url = f"http://{parts.hostname}:{parts.port or DEFAULT_PORT}"
+            name = name.strip() or base_url.removeprefix("http://")
+            if name in names:
+                raise ValueError(f"Duplicate peer name {name!r}")
+            names.add(name)
+            peers.append((name, base_url))
+    return peers
+
+
+class PeerAnswer:
+    """A peer's last usable answer on one path"""
+
+    __slots__ = ("status_code", "data", "etag", "received_at", "validated_at")
+
+    def __init__(self, status_code, data, etag):
+        self.status_code = status_code
+        self.data = data
+        self.etag = etag
+        # When the body arrived, and when the peer last confirmed it (a 304 keeps the body)
+        self.received_at = self.validated_at = time.monotonic()
+
+
+class Peer:
+    """One instance's health server: its connection pool and last answers"""
+
+    def __init__(self, name, url):
+        parts = urlsplit(url)
+        self.name = name
+        self.url = url
+        # One connection per path fetched concurrently
+        self.pool = ConnectionPool(parts.hostname, parts.port, max_idle=len(FLEET_PATHS))
+        self.answers = {}
+
+    def fetch(self, path, timeout, deadline):
+        """GET path, revalidating the last answer; a PeerAnswer, or raises on failure"""
+        headers = {"User-Agent": "sms-health-fleet", "Accept-Encoding": "gzip"}
+        previous = self.answers.get(path)
+        if previous is not None and previous.etag and path in REVALIDATED_PATHS:
+            headers["If-None-Match"] = previous.etag
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError("deadline exceeded")
+            conn = self.pool.checkout(min(timeout, remaining))
+            reused = conn.sock is not None
+            try:
+                conn.request("GET", path, headers=headers)
+                response = conn.getresponse()
+                body = response.read()
+            except TimeoutError:
+                self.pool.discard(conn)
+                raise
+            except (OSError, http.client.HTTPException):
+                self.pool.discard(conn)
+                # An idle keep-alive socket may have been closed by the peer; retry once on a fresh one
+                if reused:
+                    continue
+                raise
+            if response.will_close:
+                self.pool.discard(conn)
+            else:
+                self.pool.checkin(conn)
+            break
+
+        if response.status == 304 and previous is not None:
+            NOT_MODIFIED.labels(self.name).inc()
+            previous.validated_at = time.monotonic()
+            return previous
+        if response.status not in FLEET_PATHS[path]:
+            raise ValueError(f"HTTP {response.status}")
+        if response.getheader("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        answer = PeerAnswer(response.status, json.loads(body), response.getheader("ETag"))
+        self.answers[path] = answer
+        return answer
+
+    def close(self):
+        self.pool.close()
+
+
+class FleetRound:
+    """Outcome of one fan-out: per peer, which paths answered and how fast"""
+
+    __slots__ = ("started", "finished", "timestamp", "results")
+
+    def __init__(self, started):
+        self.started = started
+        self.finished = None
+        self.timestamp = utc_timestamp()
+        # {peer name: (Peer, {path: error or None}, latency_ms)}
+        self.results = {}
+
+
+def _age(now, since):
+    return round(now - since, 3) if since is not None else None
+
+
+class FleetAggregator:
+    """Concurrent fan-out to every peer, cached for `ttl` seconds and shared by concurrent callers"""
+
+    def __init__(self, peers=(), peers_file=None, timeout=2.0, deadline=3.0, ttl=5.0, workers=64):
+        self.static_peers = list(peers)
+        self.peers_file = peers_file
+        self.timeout = timeout
+        self.deadline = deadline
+        self._peers = {}
+        self._file_state = None
+        self._file_peers = []
+        self._lock = threading.Lock()
+        self._calls = SingleFlight(ttl=ttl)
+        # Threads start on demand; every request of a fan-out runs at once up to this many
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fleet")
+        self.peers()
+
+    def peers(self):
+        """Current peers, re-reading the peers file when it has changed"""
+        with self._lock:
+            if self.peers_file:
+                self._reload_file()
+            wanted = dict(self.static_peers)
+            wanted.update(self._file_peers)
+            # Keep the pools and last answers of peers whose address did not change
+            for name in [name for name, peer in self._peers.items() if wanted.get(name) != peer.url]:
+                self._peers.pop(name).close()
+            for name, url in wanted.items():
+                if name not in self._peers:
+                    self._peers[name] = Peer(name, url)
+            return list(self._peers.values())
+
+    def _reload_file(self):
+        try:
+            st = os.stat(self.peers_file)
+            state = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            state = None
+        if state == self._file_state:
+            return
+        self._file_state = state
+        if state is None:
+            logger.warning(f"⚠️ Fleet peers file {self.peers_file} not found")
+            self._file_peers = []
+            return
+        try:
+            with open(self.peers_file) as f:
+                self._file_peers = parse_peers(f.read())
+        except (OSError, ValueError) as e:
+            # Keep the last good list rather than losing the whole fleet to a typo
+            logger.warning(f"⚠️ Ignoring fleet peers file {self.peers_file}: {str(e)}")
+            return
+        logger.info(f"🛰️ {len(self._file_peers)} fleet peers from {self.peers_file}")
+
+    def _fetch_peer(self, peer, path, deadline):
+        started = time.monotonic()
+        try:
+            peer.fetch(path, self.timeout, deadline)
+            error = None
+        except Exception as e:
+            FETCH_ERRORS.labels(peer.name).inc()
+            error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+        latency = time.monotonic() - started
+        FETCH_LATENCY.labels(peer.name).observe(latency)
+        return error, latency * 1000
+
+    def collect(self):
+        """Fan out to every peer once and return the FleetRound"""
+        FANOUTS.inc()
+        fleet_round = FleetRound(time.monotonic())
+        # Each peer's requests share a deadline counted from the fan-out, independent of the other peers
+        deadline = fleet_round.started + self.deadline
+        futures = {}
+        for peer in self.peers():
+            for path in FLEET_PATHS:
+                futures[self._executor.submit(self._fetch_peer, peer, path, deadline)] = (peer, path)
+        done, _ = wait(futures, timeout=self.deadline)
+
+        for future, (peer, path) in futures.items():
+            _, errors, latency_ms = fleet_round.results.setdefault(peer.name, (peer, {}, 0.0))
+            if future in done:
+                errors[path], path_latency_ms = future.result()
+            else:
+                errors[path], path_latency_ms = f"Deadline of {self.deadline:g}s exceeded", self.deadline * 1000
+            fleet_round.results[peer.name] = (peer, errors, max(latency_ms, path_latency_ms))
+        fleet_round.finished = time.monotonic()
+        return fleet_round
+
+    def current(self, timeout=None):
+        """The latest FleetRound, fanning out only when the cached one has expired"""
+        return self._calls.do("fleet", self.collect, timeout)
+
+    def view(self, timeout=None):
+        """Merged fleet view with per-instance freshness"""
+        return render(self.current(timeout))
+
+    def instance(self, name, timeout=None):
+        """Last /health-check and /services answers of one peer; None for an unknown name"""
+        fleet_round = self.current(timeout)
+        if name not in fleet_round.results:
+            return None
+        peer, errors, latency_ms = fleet_round.results[name]
+        now = time.monotonic()
+        detail = _instance(peer, errors, latency_ms, now)
+        for path, key in (("/health-check", "health"), ("/services", "services")):
+            answer = peer.answers.get(path)
+            detail[key] = answer.data if answer is not None else None
+        return detail
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        for peer in self._peers.values():
+            peer.close()
+
+
+def _instance(peer, errors, latency_ms, now):
+    """Per-instance entry: status, freshness and the compact container and service states"""
+    health = peer.answers.get("/health-check")
+    services = peer.answers.get("/services")
+    reachable = errors.get("/health-check") is None and health is not None
+    entry = {
+        "url": peer.url,
+        "status": health.data.get("status", "unknown") if reachable else "unreachable",
+        "ok": reachable and health.status_code == 200,
+        "latency_ms": round(latency_ms, 1),
+        "error": "; ".join(f"{path}: {error}" for path, error in errors.items() if error) or None,
+        # Seconds since the peer last confirmed each answer, and the age of the probe snapshot behind it
+        "age_seconds": _age(now, health.validated_at) if health else None,
+        "services_age_seconds": _age(now, services.validated_at) if services else None,
+        "snapshot_age_seconds": None,
+        "checked_at": None,
+        "probes": {},
+        "containers": {},
+        "background_services": {}
+    }
+    if health is not None:
+        reported = health.data.get("snapshot_age_seconds")
+        if isinstance(reported, (int, float)):
+            # A cached round keeps the old body, so its reported age is advanced by the time since it arrived
+            entry["snapshot_age_seconds"] = round(reported + now - health.received_at, 3)
+        entry["checked_at"] = health.data.get("checked_at")
+        entry["probes"] = {name: result.get("ok") for name, result in (health.data.get("probes") or {}).items()}
+        if not reachable:
+            entry["last_status"] = health.data.get("status", "unknown")
+        elif health.data.get("error"):
+            entry["health_error"] = health.data["error"]
+    if services is not None:
+        entry["containers"] = {
+            name: info.get("state", "unknown") for name, info in (services.data.get("containers") or {}).items()
+        }
+        entry["background_services"] = {
+            name: info.get("status", "unknown") for name, info in (services.data.get("background_services") or {}).items()
+        }
+    return entry
+
+
+def render(fleet_round, now=None):
+    """Merged view of a FleetRound; ages are computed at render time so a cached round stays accurate"""
+    now = now if now is not None else time.monotonic()
+    instances = {}
+    summary = {"healthy": 0, "warming": 0, "unhealthy": 0, "unreachable": 0}
+    containers = {}
+    background_services = {}
+    for name, (peer, errors, latency_ms) in fleet_round.results.items():
+        entry = instances[name] = _instance(peer, errors, latency_ms, now)
+        bucket = entry["status"] if entry["status"] in summary else "unhealthy"
+        summary[bucket] += 1
+        for container, state in entry["containers"].items():
+            merged = containers.setdefault(container, {"running": 0, "instances": {}})
+            merged["running"] += state == "running"
+            merged["instances"][name] = state
+        for service, status in entry["background_services"].items():
+            merged = background_services.setdefault(service, {"running": 0, "instances": {}})
+            merged["running"] += status == "running"
+            merged["instances"][name] = status
+
+    ok = sum(entry["ok"] for entry in instances.values())
+    if not instances:
+        status = "unknown"
+    elif ok == len(instances):
+        status = "healthy"
+    elif ok:
+        status = "degraded"
+    else:
+        status = "unhealthy"
+    return {
+        "status": status,
+        "instances_total": len(instances),
+        "instances_ok": ok,
+        "summary": summary,
+        "fetched_at": fleet_round.timestamp,
+        "age_seconds": _age(now, fleet_round.finished),
+        "fan_out_ms": round((fleet_round.finished - fleet_round.started) * 1000, 1),
+        "containers": containers,
+        "background_services": background_services,
+        "instances": instances
+    }
+
+
+def run_fleet_probe(aggregator, timeout=None):
+    """Fleet mode probe: one snapshot whose probes are the peer instances"""
+    started = time.monotonic()
+    fleet_round = aggregator.current(timeout)
+    view = render(fleet_round)
+    lines = []
+    failures = []
+    probes = {}
+    for name, entry in view["instances"].items():
+        if entry["ok"]:
+            # No timing in the details: they are part of this server's /health-check ETag
+            lines.append(f"✅ {name} is {entry['status']}")
+            error = None
+        else:
+            error = entry["error"] or entry.get("health_error") or f"Instance is {entry['status']}"
+            lines.append(f"❌ {name} is {entry['status']}: {error}")
+            failures.append(f"{name}: {error}")
+        result = ProbeResult(name, entry["ok"], latency_ms=entry["latency_ms"], attempts=1, error=error)
+        probes[name] = result.to_dict()
+    if not probes:
+        failures.append("No fleet peers configured")
+    return HealthSnapshot(
+        "unhealthy" if failures else "healthy",
+        "\n".join(lines),
+        error="; ".join(failures) or None,
+        duration_ms=(time.monotonic() - started) * 1000,
+        probes=probes
+    )
@@ -0,0 +1,289 @@
+"""
+Live log following shared across subscribers
+
+One LogTailer thread per file polls for appended bytes, detects truncation
+and rotation, and encodes each batch of new lines once per output format.
+Subscriber sockets are detached from the HTTP worker pool and written
+non-blocking by the tailer, so an extra watcher costs one send per batch and
+holds no worker thread.
+"""
+
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from the file per tick, for new data and for each catching-up subscriber
+READ_BUDGET = 256 * 1024
+# A subscriber that falls this far behind on its socket is dropped
+MAX_PENDING = 1024 * 1024
+# A partial line longer than this is emitted without waiting for its newline
+MAX_PARTIAL = 64 * 1024
+
+
+def encode_sse(end_offset, data):
+    """One SSE `log` event carrying every complete line in data"""
+    lines = data.rstrip(b"\n").split(b"\n")
+    body = b"".join(b"data: " + line.rstrip(b"\r") + b"\n" for line in lines)
+    return b"id: %d\nevent: log\n" % end_offset + body + b"\n"
+
+
+def encode_chunk(data):
+    """One HTTP/1.1 chunk"""
+    return b"%x\r\n" % len(data) + data + b"\r\n"
+
+
+ENCODERS = {
+    "sse": encode_sse,
+    "raw": lambda end_offset, data: encode_chunk(data),
+}
+
+
+def encode_reset(fmt, reason, offset):
+    if fmt == "sse":
+        return b'event: %s\ndata: {"offset": %d}\n\n' % (reason.encode(), offset)
+    return encode_chunk(b"# log %s, following from offset %d\n" % (reason.encode(), offset))
+
+
+class Subscriber:
+    """A detached client socket following one log file"""
+
+    def __init__(self, sock, fmt, offset):
+        self.sock = sock
+        self.fmt = fmt
+        # Next file offset this subscriber needs; None means "start at the live end"
+        self.offset = offset
+        self.pending = bytearray()
+        self.last_sent = time.monotonic()
+        self.closed = False
+        sock.setblocking(False)
+
+    def enqueue(self, data):
+        self.pending += data
+        if len(self.pending) > MAX_PENDING:
+            self.close()
+            return
+        self.flush()
+
+    def flush(self):
+        if not self.pending or self.closed:
+            return
+        try:
+            sent = self.sock.send(self.pending)
+            del self.pending[:sent]
+            self.last_sent = time.monotonic()
+        except (BlockingIOError, InterruptedError):
+            pass
+        except OSError:
+            self.close()
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+
+
+class LogTailer(threading.Thread):
+    """Polls one log file and fans new lines out to every subscriber"""
+
+    def __init__(self, path, poll_interval, heartbeat_interval, idle_timeout, retire=None):
+        super().__init__(name=f"tail-{os.path.basename(path)}", daemon=True)
+        self.path = path
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        # Called once idle; returns True when the tailer may exit
+        self.retire = retire
+        self.position = 0
+        self._file = None
+        self._identity = None
+        self._partial = b""
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._idle_since = time.monotonic()
+        self._stop_event = threading.Event()
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def subscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.append(subscriber)
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        try:
+            while not self._stop_event.wait(self.poll_interval):
+                self.tick()
+                if self._subscribers:
+                    self._idle_since = time.monotonic()
+                elif time.monotonic() - self._idle_since > self.idle_timeout:
+                    if self.retire is None or self.retire(self):
+                        break
+        finally:
+            with self._lock:
+                for subscriber in self._subscribers:
+                    subscriber.close()
+                self._subscribers = []
+            if self._file is not None:
+                self._file.close()
+
+    def _open(self):
+        try:
+            f = open(self.path, "rb")
+        except OSError:
+            return False
+        st = os.fstat(f.fileno())
+        if self._file is not None:
+            self._file.close()
+        self._file = f
+        self._identity = (st.st_dev, st.st_ino)
+        return True
+
+    def _reset(self, reason):
+        """Restart at offset 0 after truncation or rotation"""
+        logger.info(f"🔄 {self.path} was {reason}, following from the start")
+        self.position = 0
+        self._partial = b""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.offset = 0
+            subscriber.enqueue(encode_reset(subscriber.fmt, reason, 0))
+
+    def _check_file(self):
+        """Open, reopen or rewind the file; returns its current size or None"""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        if self._file is None:
+            if not self._open():
+                return None
+            # First open starts at the end, like tail -f
+            self.position = st.st_size
+            return st.st_size
+        if (st.st_dev, st.st_ino) != self._identity:
+            # Rotated: the old handle may still hold lines written before the rename
+            self._read_new(os.fstat(self._file.fileno()).st_size)
+            if self._open():
+                self._reset("rotated")
+            return os.fstat(self._file.fileno()).st_size
+        if st.st_size < self.position + len(self._partial):
+            self._reset("truncated")
+        return st.st_size
+
+    def _read_new(self, size):
+        """Read appended bytes and broadcast the complete lines"""
+        start = self.position + len(self._partial)
+        if size <= start:
+            return
+        self._file.seek(start)
+        data = self._partial + self._file.read(min(size - start, READ_BUDGET))
+        cut = data.rfind(b"\n") + 1
+        if cut == 0 and len(data) > MAX_PARTIAL:
+            cut = len(data)
+        self._partial = data[cut:]
+        if cut:
+            self._broadcast(data[:cut])
+
+    def _broadcast(self, data):
+        begin = self.position
+        end = begin + len(data)
+        frames = {}
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            if subscriber.offset is None:
+                # Live subscriber: the batch was appended after it joined
+                subscriber.offset = begin
+            if subscriber.offset == begin:
+                frame = frames.get(subscriber.fmt)
+                if frame is None:
+                    # Encode once per format, shared by every live subscriber
+                    frame = frames[subscriber.fmt] = ENCODERS[subscriber.fmt](end, data)
+                subscriber.enqueue(frame)
+                subscriber.offset = end
+        self.position = end
+
+    def _catch_up(self, subscriber):
+        """Replay file bytes for a subscriber that resumed from an older offset"""
+        if subscriber.offset is None or subscriber.offset >= self.position:
+            return
+        self._file.seek(subscriber.offset)
+        data = self._file.read(min(self.position - subscriber.offset, READ_BUDGET))
+        cut = data.rfind(b"\n") + 1 or len(data)
+        data = data[:cut]
+        if data:
+            subscriber.enqueue(ENCODERS[subscriber.fmt](subscriber.offset + len(data), data))
+            subscriber.offset += len(data)
+
+    def tick(self):
+        size = self._check_file()
+        with self._lock:
+            subscribers = list(self._subscribers)
+        if size is not None:
+            for subscriber in subscribers:
+                if subscriber.offset is not None and subscriber.offset > self.position:
+                    # Offset from before a rotation or truncation
+                    subscriber.offset = 0
+                    subscriber.enqueue(encode_reset(subscriber.fmt, "reset", 0))
+                self._catch_up(subscriber)
+            self._read_new(size)
+
+        now = time.monotonic()
+        for subscriber in subscribers:
+            if subscriber.fmt == "sse" and now - subscriber.last_sent > self.heartbeat_interval:
+                subscriber.enqueue(b": keepalive\n\n")
+            subscriber.flush()
+        with self._lock:
+            self._subscribers = [subscriber for subscriber in self._subscribers if not subscriber.closed]
+
+
+class FollowHub:
+    """One shared tailer per log file, created on demand and retired when idle"""
+
+    def __init__(self, poll_interval, heartbeat_interval, idle_timeout, max_subscribers):
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self.max_subscribers = max_subscribers
+        self._tailers = {}
+        self._lock = threading.Lock()
+
+    @property
+    def subscriber_count(self):
+        return sum(tailer.subscriber_count for tailer in list(self._tailers.values()))
+
+    def tailers(self):
+        return dict(self._tailers)
+
+    def subscribe(self, path, sock, fmt, offset):
+        """Attach a detached socket to the tailer for path; False when at capacity"""
+        with self._lock:
+            if self.subscriber_count >= self.max_subscribers:
+                return False
+            tailer = self._tailers.get(path)
+            if tailer is None:
+                tailer = LogTailer(path, self.poll_interval, self.heartbeat_interval, self.idle_timeout, self._retire)
+                self._tailers[path] = tailer
+                tailer.start()
+            tailer.subscribe(Subscriber(sock, fmt, offset))
+            return True
+
+    def _retire(self, tailer):
+        # Decided under the hub lock so a concurrent subscribe can't attach to an exiting tailer
+        with self._lock:
+            if tailer.subscriber_count:
+                return False
+            if self._tailers.get(tailer.path) is tailer:
+                del self._tailers[tailer.path]
+            return True
@@ -0,0 +1,205 @@
+"""
+Heartbeats from the background service runners
+
+Each runner sends one small JSON datagram per loop iteration to a unix
+datagram socket on the shared app_logs volume (or, optionally, a UDP port).
+The datagram carries the service name, PID, items processed and loop
+duration. The health server keeps the latest beat per service in memory, so
+liveness needs no docker exec, and a loop that stops ticking is reported
+as stalled even while its process still holds the PID.
+
+send_heartbeat() is stdlib-only so the runners can carry a copy of it. It
+never raises, so a missing health server can't break a runner loop:
+
+    send_heartbeat("scheduled-messages", items=sent, loop_seconds=elapsed, interval=60)
+"""
+
+import json
+import logging
+import os
+import selectors
+import socket
+import threading
+import time
+
+from health_check.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+MAX_DATAGRAM = 4096
+DEFAULT_SOCKET = "/app/logs/heartbeat.sock"
+
+HEARTBEATS = Counter("health_heartbeats_total", "Heartbeats received from background services", ["service"])
+REJECTED_HEARTBEATS = Counter("health_heartbeats_rejected_total", "Malformed or unknown-service heartbeats")
+
+
+def send_heartbeat(service, items=0, loop_seconds=0.0, interval=None, socket_path=None):
+    """Fire-and-forget heartbeat from a runner loop; returns False when it could not be sent"""
+    message = {
+        "service": service,
+        "pid": os.getpid(),
+        "ts": time.time(),
+        "items": items,
+        "loop_seconds": loop_seconds
+    }
+    if interval is not None:
+        message["interval"] = interval
+    path = socket_path or os.environ.get("HEALTH_HEARTBEAT_SOCKET", DEFAULT_SOCKET)
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.sendto(json.dumps(message).encode(), path)
+        return True
+    except OSError:
+        return False
+
+
+class Heartbeat:
+    """Latest state reported by one service"""
+
+    __slots__ = (
+        "service", "pid", "received_at", "received_wall", "sent_at", "ticks",
+        "items", "items_total", "loop_seconds", "interval", "restarts"
+    )
+
+    def __init__(self, service):
+        self.service = service
+        self.pid = None
+        self.received_at = None
+        self.received_wall = None
+        self.sent_at = None
+        self.ticks = 0
+        self.items = 0
+        self.items_total = 0
+        self.loop_seconds = 0.0
+        self.interval = None
+        self.restarts = 0
+
+
+class HeartbeatRegistry:
+    """In-memory heartbeat per known service with stall detection"""
+
+    def __init__(self, services, default_interval, grace):
+        self.services = set(services)
+        self.default_interval = default_interval
+        self.grace = grace
+        self._beats = {}
+        self._lock = threading.Lock()
+
+    def record(self, payload):
+        """Apply one datagram; False when it is malformed or names an unknown service"""
+        try:
+            message = json.loads(payload)
+            service = message["service"]
+            items = int(message.get("items", 0))
+            loop_seconds = float(message.get("loop_seconds", 0.0))
+            interval = float(message["interval"]) if "interval" in message else None
+        except (ValueError, TypeError, KeyError):
+            REJECTED_HEARTBEATS.inc()
+            return False
+        if not isinstance(service, str) or service not in self.services:
+            REJECTED_HEARTBEATS.inc()
+            return False
+
+        with self._lock:
+            beat = self._beats.get(service)
+            if beat is None:
+                beat = self._beats[service] = Heartbeat(service)
+            pid = message.get("pid")
+            if beat.pid is not None and pid != beat.pid:
+                beat.restarts += 1
+            beat.pid = pid
+            beat.received_at = time.monotonic()
+            beat.received_wall = time.time()
+            beat.sent_at = message.get("ts")
+            beat.ticks += 1
+            beat.items = items
+            beat.items_total += items
+            beat.loop_seconds = loop_seconds
+            if interval is not None:
+                beat.interval = interval
+        HEARTBEATS.labels(service).inc()
+        return True
+
+    def get(self, service):
+        return self._beats.get(service)
+
+    def deadline(self, beat):
+        """Seconds without a beat after which the loop counts as stalled"""
+        interval = beat.interval if beat.interval is not None else self.default_interval
+        return interval + beat.loop_seconds + self.grace
+
+    def is_stalled(self, beat, now=None):
+        now = now if now is not None else time.monotonic()
+        return now - beat.received_at > self.deadline(beat)
+
+    def describe(self, beat, now=None):
+        """JSON-ready view of one heartbeat"""
+        now = now if now is not None else time.monotonic()
+        return {
+            "pid": beat.pid,
+            "last_tick": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(beat.received_wall)) + 'Z',
+            "age_seconds": round(now - beat.received_at, 3),
+            "stalled": self.is_stalled(beat, now),
+            "stall_after_seconds": round(self.deadline(beat), 3),
+            "ticks": beat.ticks,
+            "items_processed": beat.items,
+            "items_total": beat.items_total,
+            "loop_duration_ms": round(beat.loop_seconds * 1000, 1),
+            "interval_seconds": beat.interval if beat.interval is not None else self.default_interval,
+            "restarts": beat.restarts
+        }
+
+
+class HeartbeatListener(threading.Thread):
+    """Receives heartbeat datagrams on a unix socket and, optionally, a UDP port"""
+
+    def __init__(self, registry, socket_path=None, udp_port=None, udp_bind="0.0.0.0"):
+        super().__init__(name="heartbeat-listener", daemon=True)
+        self.registry = registry
+        self.socket_path = socket_path
+        self.udp_port = udp_port
+        self.udp_bind = udp_bind
+        self._selector = selectors.DefaultSelector()
+        self._sockets = []
+
+    def bind(self):
+        """Open the listening sockets; returns False when none could be bound"""
+        if self.socket_path:
+            try:
+                if os.path.exists(self.socket_path):
+                    os.unlink(self.socket_path)
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+                sock.bind(self.socket_path)
+                # Runners in sms_backend use a different user
+                os.chmod(self.socket_path, 0o666)
+                self._register(sock)
+                logger.info(f"💓 Heartbeat socket: {self.socket_path}")
+            except OSError as e:
+                logger.warning(f"⚠️ Could not bind heartbeat socket {self.socket_path}: {str(e)}")
+        if self.udp_port:
+            try:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                sock.bind((self.udp_bind, self.udp_port))
+                self._register(sock)
+                logger.info(f"💓 Heartbeat UDP port: {self.udp_port}")
+            except OSError as e:
+                logger.warning(f"⚠️ Could not bind heartbeat UDP port {self.udp_port}: {str(e)}")
+        return bool(self._sockets)
+
+    def _register(self, sock):
+        sock.setblocking(False)
+        self._selector.register(sock, selectors.EVENT_READ)
+        self._sockets.append(sock)
+
+    def run(self):
+        while True:
+            for key, _ in self._selector.select():
+                while True:
+                    try:
+                        payload = key.fileobj.recv(MAX_DATAGRAM)
+                    except (BlockingIOError, InterruptedError):
+                        break
+                    except OSError as e:
+                        logger.warning(f"⚠️ Heartbeat receive failed: {str(e)}")
+                        break
+                    self.registry.record(payload)
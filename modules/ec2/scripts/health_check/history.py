@@ -0,0 +1,270 @@
+"""
+Fixed-memory probe history
+
+Every probe cycle is recorded into a ring of fixed-width time slots per probe
+(default 5 s), held in two flat arrays: a one-byte state and a float32
+latency. Memory is fixed however long the server runs; three days at 5 s
+is about 260 KB per probe. A slot keeps the worst result seen in it. Queries
+downsample a window with slice-wide array operations (count, sum, min, max)
+instead of per-sample Python code. The rings are periodically written to
+disk so the history survives a restart.
+"""
+
+import array
+import json
+import logging
+import math
+import os
+import threading
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+NO_DATA = 0
+UP = 1
+DOWN = 2
+# Latency of a slot without a measured latency; exact in float32, so slices can be compared against it
+NO_LATENCY = -1.0
+
+MAGIC = b"HCHIST1\n"
+
+# Name the whole snapshot is recorded under, next to the individual probes
+OVERALL = "overall"
+
+
+def _iso(epoch):
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(epoch)) + 'Z'
+
+
+class ProbeRing:
+    """State and latency slots for one probe"""
+
+    __slots__ = ("states", "latencies")
+
+    def __init__(self, capacity):
+        self.states = array.array("B", bytes(capacity))
+        self.latencies = array.array("f", [NO_LATENCY]) * capacity
+
+    def clear(self, start, stop):
+        """Reset slot indexes [start, stop) to no data"""
+        self.states[start:stop] = array.array("B", bytes(stop - start))
+        self.latencies[start:stop] = array.array("f", [NO_LATENCY]) * (stop - start)
+
+
+def summarize(states, latencies):
+    """Sample count, up/down ratios and latency min/max/avg for a run of slots"""
+    up = states.count(UP)
+    down = states.count(DOWN)
+    samples = up + down
+    summary = {
+        "samples": samples,
+        "up_ratio": round(up / samples, 4) if samples else None,
+        "down_ratio": round(down / samples, 4) if samples else None,
+        "latency_ms": None
+    }
+    missing = latencies.count(NO_LATENCY)
+    measured = len(latencies) - missing
+    if measured:
+        summary["latency_ms"] = {
+            "min": round(min(filter(NO_LATENCY.__ne__, latencies)), 1),
+            "max": round(max(latencies), 1),
+            # Every missing slot holds -1.0, so adding them back leaves the measured total
+            "avg": round((math.fsum(latencies) + missing) / measured, 1)
+        }
+    return summary
+
+
+class HealthHistory:
+    """Per-probe rings covering the last `retention` seconds at `resolution` seconds per slot"""
+
+    def __init__(self, resolution, retention):
+        self.resolution = resolution
+        self.capacity = max(1, int(retention // resolution))
+        self._rings = {}
+        # Absolute slot number (epoch // resolution) of the newest slot
+        self._last_slot = None
+        self._lock = threading.Lock()
+
+    def probes(self):
+        return sorted(self._rings)
+
+    def _ring(self, name):
+        ring = self._rings.get(name)
+        if ring is None:
+            ring = self._rings[name] = ProbeRing(self.capacity)
+        return ring
+
+    def _advance(self, slot):
+        """Move the ring head to `slot`, clearing slots that were skipped"""
+        if self._last_slot is None:
+            self._last_slot = slot
+            return
+        gap = min(slot - self._last_slot, self.capacity)
+        if gap <= 0:
+            return
+        start = (self._last_slot + 1) % self.capacity
+        stop = start + gap
+        for ring in self._rings.values():
+            if stop <= self.capacity:
+                ring.clear(start, stop)
+            else:
+                ring.clear(start, self.capacity)
+                ring.clear(0, stop - self.capacity)
+        self._last_slot = slot
+
+    def record(self, name, ok, latency_ms=None, at=None):
+        """Record one probe result; the slot keeps the worst state and the highest latency"""
+        slot = int((at if at is not None else time.time()) // self.resolution)
+        with self._lock:
+            self._advance(slot)
+            if self._last_slot - slot >= self.capacity:
+                return
+            ring = self._ring(name)
+            index = slot % self.capacity
+            if not ok:
+                ring.states[index] = DOWN
+            elif ring.states[index] == NO_DATA:
+                ring.states[index] = UP
+            if latency_ms is not None and latency_ms > ring.latencies[index]:
+                ring.latencies[index] = latency_ms
+
+    def record_snapshot(self, snapshot, at=None):
+        """Record the overall status and every native probe result of one cycle"""
+        at = at if at is not None else time.time()
+        self.record(OVERALL, snapshot.healthy, snapshot.duration_ms, at)
+        for name, result in snapshot.probes.items():
+            # A probe skipped by its circuit breaker has no latency worth recording
+            latency_ms = result["latency_ms"] if result.get("attempts") else None
+            self.record(name, result["ok"], latency_ms, at)
+
+    def _window(self, values, start, stop):
+        """Copy absolute slots [start, stop) out of a ring array"""
+        first = start % self.capacity
+        last = first + (stop - start)
+        if last <= self.capacity:
+            return values[first:last]
+        return values[first:] + values[:last - self.capacity]
+
+    def query(self, names, since, until, step=None, max_points=1000):
+        """Downsample [since, until) into buckets of `step` seconds per probe"""
+        if not all(math.isfinite(value) for value in (since, until, step or 0)):
+            raise ValueError("since, until and step must be finite")
+        with self._lock:
+            newest = self._last_slot
+            if newest is None:
+                start = stop = int(until // self.resolution)
+            else:
+                # Only retained slots are ever copied or summarized, however wide the window asked for
+                oldest = newest - self.capacity + 1
+                start = min(max(int(since // self.resolution), oldest), newest + 1)
+                stop = min(max(math.ceil(until / self.resolution), start), newest + 1)
+
+            # Buckets are whole slots aligned to the step, so repeated polls line up
+            step_slots = max(1, math.ceil((step or (stop - start) * self.resolution / 300) / self.resolution))
+            if math.ceil((stop - start) / step_slots) > max_points:
+                step_slots = math.ceil((stop - start) / max_points)
+            step_slots = min(step_slots, self.capacity)
+
+            windows = {}
+            for name in names:
+                ring = self._rings.get(name)
+                if ring is not None and stop > start:
+                    windows[name] = (self._window(ring.states, start, stop), self._window(ring.latencies, start, stop))
+
+        # Aligning may reach back past the first retained slot; that part of the first bucket has no data
+        aligned = start - start % step_slots
+        result = {
+            "from": _iso(aligned * self.resolution),
+            "to": _iso(stop * self.resolution),
+            "step_seconds": step_slots * self.resolution,
+            "resolution_seconds": self.resolution,
+            "probes": {}
+        }
+        for name in names:
+            if name not in windows:
+                result["probes"][name] = {"summary": summarize(array.array("B"), array.array("f")), "points": []}
+                continue
+            states, latencies = windows[name]
+            points = []
+            for bucket in range(aligned, stop, step_slots):
+                first = max(bucket - start, 0)
+                last = bucket + step_slots - start
+                points.append({
+                    "t": _iso(bucket * self.resolution),
+                    **summarize(states[first:last], latencies[first:last])
+                })
+            result["probes"][name] = {"summary": summarize(states, latencies), "points": points}
+        return result
+
+    def save(self, path):
+        """Atomically write the rings to `path`"""
+        with self._lock:
+            names = sorted(self._rings)
+            header = {
+                "resolution": self.resolution,
+                "capacity": self.capacity,
+                "last_slot": self._last_slot,
+                "probes": names
+            }
+            body = b"".join(
+                self._rings[name].states.tobytes() + self._rings[name].latencies.tobytes() for name in names
+            )
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(MAGIC + json.dumps(header).encode() + b"\n" + zlib.compress(body, 1))
+        os.replace(temp_path, path)
+
+    def load(self, path):
+        """Restore rings saved with the same resolution and retention; False when nothing was loaded"""
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return False
+        try:
+            if not data.startswith(MAGIC):
+                raise ValueError("not a history file")
+            header_end = data.index(b"\n", len(MAGIC))
+            header = json.loads(data[len(MAGIC):header_end])
+            if header["resolution"] != self.resolution or header["capacity"] != self.capacity:
+                logger.info("📉 Saved health history uses different slots; starting empty")
+                return False
+            body = zlib.decompress(data[header_end + 1:])
+            ring_bytes = self.capacity * 5
+            if len(body) != ring_bytes * len(header["probes"]):
+                raise ValueError("truncated history")
+            rings = {}
+            for position, name in enumerate(header["probes"]):
+                chunk = body[position * ring_bytes:(position + 1) * ring_bytes]
+                ring = rings[name] = ProbeRing.__new__(ProbeRing)
+                ring.states = array.array("B", chunk[:self.capacity])
+                ring.latencies = array.array("f", chunk[self.capacity:])
+        except (ValueError, KeyError, zlib.error) as e:
+            logger.warning(f"⚠️ Ignoring unreadable health history {path}: {str(e)}")
+            return False
+        with self._lock:
+            self._rings = rings
+            self._last_slot = header["last_slot"]
+        return True
+
+
+class HistorySaver(threading.Thread):
+    """Writes the history to disk every `interval` seconds"""
+
+    def __init__(self, history, path, interval):
+        super().__init__(name="health-history-saver", daemon=True)
+        self.history = history
+        self.path = path
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.history.save(self.path)
+            except OSError as e:
+                logger.warning(f"⚠️ Could not save health history: {str(e)}")
+
+    def stop(self):
+        self._stop_event.set()
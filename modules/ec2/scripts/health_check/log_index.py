@@ -0,0 +1,314 @@
+"""
+Sparse timestamp index over service logs
+
+Every `stride` bytes the index records the timestamp and offset of the next
+timestamped line. Building it samples one small block per stride instead of
+reading the whole file, updates only look at bytes appended since the last
+sample, and the index is persisted next to the log as `<log>.idx`.
+
+A time-range query binary-searches the index for the byte range that can
+contain the window and scans only that range, so its cost does not depend
+on the total size of the log.
+"""
+
+import calendar
+import logging
+import math
+import os
+import re
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+# Python logging's default asctime: "2025-01-07 12:00:00,123"
+_TIMESTAMP = re.compile(rb"(\d{4})-(\d{2})-(\d{2})[ T](\d{2}):(\d{2}):(\d{2})")
+
+_MAGIC = b"SMSLIDX1"
+# magic, st_dev, st_ino, next sample offset, file size, entry count
+_HEADER = struct.Struct("<8sQQqqQ")
+
+SAMPLE_BLOCK = 4096
+# Bytes examined for a timestamped line per stride; an untimestamped stretch is skipped, not scanned
+SAMPLE_SCAN = 4 * SAMPLE_BLOCK
+SCAN_CHUNK = 64 * 1024
+
+
+def parse_line_timestamp(line):
+    """Epoch seconds of a log line's leading timestamp, or None (continuation lines)"""
+    match = _TIMESTAMP.match(line)
+    if match is None:
+        return None
+    year, month, day, hour, minute, second = (int(value) for value in match.groups())
+    # Container logs are written in UTC
+    return calendar.timegm((year, month, day, hour, minute, second))
+
+
+def parse_time_param(value):
+    """Accept epoch seconds or an ISO-8601 timestamp (naive means UTC); ValueError otherwise"""
+    try:
+        seconds = float(value)
+    except ValueError:
+        pass
+    else:
+        # float() also takes nan and inf, which no time window can use
+        if not math.isfinite(seconds):
+            raise ValueError(f"Not a finite time: {value}")
+        return seconds
+    parsed = datetime.fromisoformat(value.strip())
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def iter_lines(f, start, end, chunk_size=SCAN_CHUNK):
+    """Yield (offset, line) for complete lines starting in [start, end)"""
+    f.seek(start)
+    offset = start
+    carry = b""
+    while offset < end:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        data = carry + chunk
+        position = 0
+        while True:
+            newline = data.find(b"\n", position)
+            if newline < 0:
+                break
+            yield offset, data[position:newline + 1]
+            offset += newline + 1 - position
+            position = newline + 1
+            if offset >= end:
+                return
+        carry = data[position:]
+    if carry and offset < end:
+        yield offset, carry
+
+
+class LogIndex:
+    """Sparse (timestamp, offset) samples for one log file"""
+
+    def __init__(self, log_path, index_path, stride):
+        self.log_path = log_path
+        self.index_path = index_path
+        self.stride = stride
+        self.timestamps = array("d")
+        self.offsets = array("q")
+        # Offset where the next sample will be taken, and the file size at the last update
+        self.next_sample = 0
+        self.size = 0
+        self.identity = None
+        # monotonic time of the last update, so the request path can skip one the refresher just did
+        self.updated_at = -math.inf
+        self.lock = threading.Lock()
+        self._dirty = False
+
+    def _clear(self, identity):
+        self.timestamps = array("d")
+        self.offsets = array("q")
+        self.next_sample = 0
+        self.size = 0
+        self.identity = identity
+        self._dirty = True
+
+    def load(self):
+        try:
+            with open(self.index_path, "rb") as f:
+                magic, dev, ino, next_sample, size, count = _HEADER.unpack(f.read(_HEADER.size))
+                if magic != _MAGIC:
+                    return False
+                timestamps = array("d")
+                offsets = array("q")
+                timestamps.fromfile(f, count)
+                offsets.fromfile(f, count)
+        except (OSError, EOFError, struct.error):
+            return False
+        self.timestamps, self.offsets = timestamps, offsets
+        self.next_sample = next_sample
+        self.size = size
+        self.identity = (dev, ino)
+        return True
+
+    def save(self):
+        if not self._dirty:
+            return
+        dev, ino = self.identity or (0, 0)
+        tmp_path = f"{self.index_path}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(_HEADER.pack(_MAGIC, dev, ino, self.next_sample, self.size, len(self.offsets)))
+                self.timestamps.tofile(f)
+                self.offsets.tofile(f)
+            os.replace(tmp_path, self.index_path)
+            self._dirty = False
+        except OSError as e:
+            logger.warning(f"⚠️ Could not persist log index {self.index_path}: {str(e)}")
+
+    @staticmethod
+    def _next_line_start(f, position, size):
+        """Offset of the first line that starts at or after position"""
+        if position == 0:
+            return 0
+        f.seek(position - 1)
+        if f.read(1) == b"\n":
+            return position
+        while position < size:
+            block = f.read(SAMPLE_BLOCK)
+            if not block:
+                break
+            newline = block.find(b"\n")
+            if newline >= 0:
+                return position + newline + 1
+            position += len(block)
+        return size
+
+    def _sample(self, f, position, size):
+        """(offset, timestamp) of the first timestamped line within SAMPLE_SCAN bytes of position
+
+        Without one the timestamp is None and the offset is where sampling
+        resumes: the next stride, or the end of the file when the scan
+        reached it (a traceback or untimestamped output still being written).
+        """
+        start = self._next_line_start(f, position, size)
+        end = min(start + SAMPLE_SCAN, size)
+        for offset, line in iter_lines(f, start, end, SAMPLE_BLOCK):
+            timestamp = parse_line_timestamp(line)
+            if timestamp is not None:
+                return offset, timestamp
+        return (start + self.stride if end < size else size), None
+
+    def update(self, max_age=None):
+        """Sample bytes appended since the last update; rebuild after truncation or rotation
+
+        With max_age, an index updated less than max_age seconds ago is only
+        checked for truncation and rotation: its unsampled tail just widens
+        the scan of a query a little.
+        """
+        with self.lock:
+            try:
+                f = open(self.log_path, "rb")
+            except OSError:
+                return
+            with f:
+                st = os.fstat(f.fileno())
+                identity = (st.st_dev, st.st_ino)
+                if identity != self.identity or st.st_size < self.size:
+                    self._clear(identity)
+                elif max_age is not None and time.monotonic() - self.updated_at < max_age:
+                    return
+                while self.next_sample < st.st_size:
+                    offset, timestamp = self._sample(f, self.next_sample, st.st_size)
+                    if timestamp is None:
+                        # Examined without finding a timestamped line; never scan that stretch again
+                        self.next_sample = offset
+                        self._dirty = True
+                        continue
+                    # Keep the samples non-decreasing so bisect stays valid if clocks step back
+                    if self.timestamps and timestamp < self.timestamps[-1]:
+                        timestamp = self.timestamps[-1]
+                    self.timestamps.append(timestamp)
+                    self.offsets.append(offset)
+                    self.next_sample = offset + self.stride
+                    self._dirty = True
+                if st.st_size != self.size:
+                    self.size = st.st_size
+                    self._dirty = True
+                self.updated_at = time.monotonic()
+
+    def byte_range(self, since, until, size):
+        """Smallest [start, end) that can hold every line with since <= ts <= until"""
+        start = 0
+        end = size
+        if since is not None:
+            # Last sample before the window: lines after it may already be inside
+            index = bisect_left(self.timestamps, since) - 1
+            if index >= 0:
+                start = self.offsets[index]
+        if until is not None:
+            # First sample after the window: nothing from there on can match
+            index = bisect_right(self.timestamps, until)
+            if index < len(self.offsets):
+                end = self.offsets[index]
+        return start, max(start, min(end, size))
+
+    def query(self, f, size, since=None, until=None, grep=None, limit=None):
+        """Yield matching lines; continuation lines inherit their parent's timestamp"""
+        start, end = self.byte_range(since, until, size)
+        needle = grep.encode() if grep else None
+        timestamp = None
+        matched = 0
+        for _, line in iter_lines(f, start, end):
+            line_timestamp = parse_line_timestamp(line)
+            if line_timestamp is not None:
+                timestamp = line_timestamp
+                if until is not None and timestamp > until:
+                    return
+            if timestamp is None or (since is not None and timestamp < since):
+                continue
+            if needle is not None and needle not in line:
+                continue
+            yield line
+            matched += 1
+            if limit is not None and matched >= limit:
+                return
+
+
+class LogIndexRegistry:
+    """Loads, refreshes and persists one LogIndex per log file"""
+
+    def __init__(self, logs_dir, index_dir, stride, max_age=None):
+        self.logs_dir = logs_dir
+        self.index_dir = index_dir or logs_dir
+        self.stride = stride
+        # With an IndexRefresher running, get() skips indexes it updated within max_age seconds
+        self.max_age = max_age
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def get(self, log_path, max_age=None):
+        with self._lock:
+            index = self._indexes.get(log_path)
+            if index is None:
+                name = os.path.basename(log_path)
+                index = LogIndex(log_path, os.path.join(self.index_dir, f"{name}.idx"), self.stride)
+                index.load()
+                self._indexes[log_path] = index
+        index.update(max_age if max_age is not None else self.max_age)
+        return index
+
+    def refresh_all(self):
+        """Bring every *.log in the logs directory up to date and persist the indexes"""
+        try:
+            names = [name for name in os.listdir(self.logs_dir) if name.endswith(".log")]
+        except OSError:
+            return
+        for name in names:
+            index = self.get(os.path.join(self.logs_dir, name), max_age=0)
+            with index.lock:
+                index.save()
+
+
+class IndexRefresher(threading.Thread):
+    """Keeps the log indexes current as the files grow"""
+
+    def __init__(self, registry, interval):
+        super().__init__(name="log-index-refresher", daemon=True)
+        self.registry = registry
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.registry.refresh_all()
+            except Exception as e:
+                logger.warning(f"⚠️ Log index refresh failed: {str(e)}")
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,382 @@
+"""
+Incremental throughput analytics from the background service logs
+
+Each service log is read from the offset where the previous update stopped,
+so an update costs time proportional to the bytes appended since; the file
+is never re-read. Lines are matched against a few patterns per service and
+counted into per-minute buckets keyed by the line's own timestamp. Rates
+over the last 1, 5 and 15 complete minutes come from those buckets. The
+offsets, totals and buckets are persisted, so a restart resumes where it
+stopped. A log seen for the first time is only read from its last
+`backfill` bytes.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from health_check.log_index import parse_line_timestamp
+from health_check.metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK = 256 * 1024
+RATE_WINDOWS = (1, 5, 15)
+
+EVENTS = Counter("health_log_events_total", "Events parsed from the background service logs", ["service", "event"])
+BYTES_PARSED = Counter("health_log_stats_bytes_total", "Log bytes parsed for throughput analytics", ["service"])
+AI_LATENCY = Histogram(
+    "health_ai_batch_duration_seconds",
+    "Time from picking up a batch of inbound messages to its completion, from ai_processor.log",
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0, 30.0, 60.0, 120.0)
+)
+
+# Counted for every log, from the logging level of each timestamped line
+_LEVEL = re.compile(rb" - (ERROR|CRITICAL|WARNING) - ")
+LEVEL_EVENTS = {b"ERROR": "errors", b"CRITICAL": "errors", b"WARNING": "warnings"}
+
+# Per service: (event, pattern); a group, when present, is the number of items the line reports
+SERVICE_EVENTS = {
+    "scheduled-messages": (
+        ("due", re.compile(rb"Found (\d+) scheduled messages? to send")),
+        ("sent", re.compile(rb"Sent scheduled message")),
+        ("failed", re.compile(rb"Failed to send")),
+    ),
+    "ai-processor": (
+        ("inbound", re.compile(rb"Found (\d+) inbound messages? to process")),
+        ("failed", re.compile(rb"(?i)failed to (?:process|generate|send)")),
+    ),
+}
+
+# Per service: work logged as a start line with an item count and a completion line.
+# Completing a batch counts its items as `event` and records start-to-completion latency.
+SERVICE_BATCHES = {
+    "ai-processor": (
+        re.compile(rb"Found (\d+) inbound messages? to process"),
+        re.compile(rb"AI inbound message processing completed"),
+        "processed"
+    ),
+}
+
+# Latency fields kept in each minute bucket next to the event counts
+_LATENCY_COUNT = "latency_count"
+_LATENCY_SUM = "latency_sum_ms"
+_LATENCY_MAX = "latency_max_ms"
+
+
+def _iso(epoch):
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(epoch)) + 'Z'
+
+
+class LogTracker:
+    """Offset, counters and per-minute buckets for one service log"""
+
+    def __init__(self, service, path, backfill, max_read, window_minutes):
+        self.service = service
+        self.path = path
+        self.backfill = backfill
+        self.max_read = max_read
+        self.window_minutes = window_minutes
+        self.patterns = SERVICE_EVENTS.get(service, ())
+        self.batch = SERVICE_BATCHES.get(service)
+        self.events = ["lines", "errors", "warnings"]
+        self.events += [event for event, _ in self.patterns if event not in self.events]
+        if self.batch is not None:
+            self.events.append(self.batch[2])
+
+        # (st_dev, st_ino) of the file the offset belongs to; None until first read
+        self.identity = None
+        self.offset = 0
+        self.size = 0
+        self.totals = dict.fromkeys(self.events, 0)
+        # Minute number (epoch // 60) -> {event: count, latency fields}
+        self.minutes = {}
+        self.last_seen = {}
+        self.last_latency_ms = None
+        self.last_line_at = None
+        self.updated_at = None
+        # (timestamp, items) of the batch in progress
+        self.batch_start = None
+        self.lock = threading.Lock()
+        # Event counts not yet added to the Prometheus counters; flushed once per chunk
+        self._unreported = {}
+
+        # Line prefix "YYYY-MM-DD HH:MM" of the last parsed minute, and that minute's epoch
+        self._minute_prefix = None
+        self._minute_epoch = 0
+
+    def _timestamp(self, line):
+        """Epoch seconds, with milliseconds, of a line's leading timestamp; None for continuation lines"""
+        prefix = line[:16]
+        if prefix != self._minute_prefix:
+            timestamp = parse_line_timestamp(line)
+            if timestamp is None:
+                return None
+            self._minute_prefix = prefix
+            self._minute_epoch = timestamp - timestamp % 60
+        # Same minute as the previous line: only the seconds need parsing
+        seconds = line[17:19]
+        if not seconds.isdigit():
+            return None
+        timestamp = self._minute_epoch + int(seconds)
+        if line[19:20] in (b",", b".") and line[20:23].isdigit():
+            timestamp += int(line[20:23]) / 1000
+        return timestamp
+
+    def _bucket(self, timestamp):
+        minute = int(timestamp // 60)
+        bucket = self.minutes.get(minute)
+        if bucket is None:
+            bucket = self.minutes[minute] = {}
+            oldest = minute - self.window_minutes
+            for stale in [key for key in self.minutes if key <= oldest]:
+                del self.minutes[stale]
+        return bucket
+
+    def _count(self, bucket, timestamp, event, items=1):
+        bucket[event] = bucket.get(event, 0) + items
+        self.totals[event] += items
+        self.last_seen[event] = timestamp
+        self._unreported[event] = self._unreported.get(event, 0) + items
+
+    def _latency(self, bucket, latency_ms):
+        bucket[_LATENCY_COUNT] = bucket.get(_LATENCY_COUNT, 0) + 1
+        bucket[_LATENCY_SUM] = bucket.get(_LATENCY_SUM, 0.0) + latency_ms
+        bucket[_LATENCY_MAX] = max(bucket.get(_LATENCY_MAX, 0.0), latency_ms)
+        self.last_latency_ms = latency_ms
+        AI_LATENCY.observe(latency_ms / 1000)
+
+    def _line(self, line):
+        timestamp = self._timestamp(line)
+        if timestamp is None:
+            # Tracebacks and other continuation lines belong to the line above
+            return
+        self.last_line_at = timestamp
+        bucket = self._bucket(timestamp)
+        self._count(bucket, timestamp, "lines")
+        level = _LEVEL.search(line)
+        if level is not None:
+            self._count(bucket, timestamp, LEVEL_EVENTS[level.group(1)])
+        for event, pattern in self.patterns:
+            match = pattern.search(line)
+            if match is not None:
+                self._count(bucket, timestamp, event, int(match.group(1)) if match.groups() else 1)
+        if self.batch is not None:
+            start, end, event = self.batch
+            match = start.search(line)
+            if match is not None:
+                self.batch_start = (timestamp, int(match.group(1)))
+            elif self.batch_start is not None and end.search(line):
+                started, items = self.batch_start
+                self.batch_start = None
+                self._count(bucket, timestamp, event, items)
+                self._latency(bucket, max(timestamp - started, 0.0) * 1000)
+
+    def update(self):
+        """Parse the lines appended since the last update; returns the number of bytes consumed"""
+        try:
+            f = open(self.path, "rb")
+        except OSError:
+            return 0
+        with f:
+            st = os.fstat(f.fileno())
+            identity = [st.st_dev, st.st_ino]
+            with self.lock:
+                self.size = st.st_size
+                self.updated_at = time.time()
+                if self.identity is None:
+                    # First sight: start near the end, so a multi-GB log isn't parsed from the top
+                    self.identity = identity
+                    self.offset = 0
+                    if st.st_size > self.backfill:
+                        f.seek(st.st_size - self.backfill - 1)
+                        f.readline()
+                        self.offset = f.tell()
+                elif identity != self.identity or st.st_size < self.offset:
+                    # Rotated or truncated: everything in the new file is new
+                    self.identity = identity
+                    self.offset = 0
+                    self.batch_start = None
+                offset = self.offset
+
+            end = min(st.st_size, offset + self.max_read)
+            f.seek(offset)
+            consumed = 0
+            carry = b""
+            while offset + consumed + len(carry) < end:
+                chunk = f.read(min(READ_CHUNK, end - offset - consumed - len(carry)))
+                if not chunk:
+                    break
+                data = carry + chunk
+                last_newline = data.rfind(b"\n")
+                if last_newline < 0:
+                    carry = data
+                    continue
+                carry = data[last_newline + 1:]
+                with self.lock:
+                    for line in data[:last_newline].split(b"\n"):
+                        self._line(line)
+                    consumed += last_newline + 1
+                    self.offset = offset + consumed
+                    unreported, self._unreported = self._unreported, {}
+                for event, items in unreported.items():
+                    EVENTS.labels(self.service, event).inc(items)
+            if carry and len(carry) >= self.max_read:
+                # One line longer than a whole update: skip it rather than stall on it
+                with self.lock:
+                    consumed += len(carry)
+                    self.offset = offset + consumed
+        if consumed:
+            BYTES_PARSED.labels(self.service).inc(consumed)
+        # A partial last line stays unread until it is complete
+        return consumed
+
+    def describe(self, now=None, cursor=True):
+        """JSON-ready counters, rates over the last complete minutes and AI batch latency
+
+        cursor=False leaves out the read position and update time, which move on
+        every update even when nothing was logged.
+        """
+        now = now if now is not None else time.time()
+        current = int(now // 60)
+        with self.lock:
+            rates = {}
+            latency = {}
+            for window in RATE_WINDOWS:
+                buckets = [self.minutes.get(minute, {}) for minute in range(current - window, current)]
+                rates[f"{window}m"] = {
+                    event: round(sum(bucket.get(event, 0) for bucket in buckets) / window, 2)
+                    for event in self.events
+                }
+                if self.batch is not None:
+                    samples = sum(bucket.get(_LATENCY_COUNT, 0) for bucket in buckets)
+                    latency[f"{window}m"] = {
+                        "samples": samples,
+                        "avg": round(sum(bucket.get(_LATENCY_SUM, 0.0) for bucket in buckets) / samples, 1)
+                        if samples else None,
+                        "max": round(max(bucket.get(_LATENCY_MAX, 0.0) for bucket in buckets), 1)
+                        if samples else None
+                    }
+            result = {"log_file": os.path.basename(self.path)}
+            if cursor:
+                result["offset"] = self.offset
+                result["size_bytes"] = self.size
+                result["behind_bytes"] = max(self.size - self.offset, 0)
+                result["last_update"] = _iso(self.updated_at) if self.updated_at else None
+            result.update({
+                "last_line_at": _iso(self.last_line_at) if self.last_line_at else None,
+                "totals": dict(self.totals),
+                "per_minute": rates,
+                "last_seen": {event: _iso(timestamp) for event, timestamp in self.last_seen.items()}
+            })
+            if self.batch is not None:
+                result["ai_latency_ms"] = {
+                    "last": round(self.last_latency_ms, 1) if self.last_latency_ms is not None else None,
+                    **latency
+                }
+        return result
+
+    def state(self):
+        with self.lock:
+            return {
+                "identity": self.identity,
+                "offset": self.offset,
+                "totals": dict(self.totals),
+                "minutes": {str(minute): dict(bucket) for minute, bucket in self.minutes.items()},
+                "last_seen": dict(self.last_seen),
+                "last_latency_ms": self.last_latency_ms,
+                "last_line_at": self.last_line_at,
+                "batch_start": self.batch_start
+            }
+
+    def restore(self, state):
+        with self.lock:
+            self.identity = list(state["identity"]) if state["identity"] is not None else None
+            self.offset = int(state["offset"])
+            for event, count in state["totals"].items():
+                if event in self.totals:
+                    self.totals[event] = count
+            self.minutes = {int(minute): bucket for minute, bucket in state["minutes"].items()}
+            self.last_seen = dict(state["last_seen"])
+            self.last_latency_ms = state["last_latency_ms"]
+            self.last_line_at = state["last_line_at"]
+            self.batch_start = tuple(state["batch_start"]) if state["batch_start"] else None
+
+
+class LogStatsRegistry:
+    """One tracker per background service log, persisted together"""
+
+    def __init__(self, logs_dir, services, state_path, backfill, max_read, window_minutes):
+        self.state_path = state_path
+        self.trackers = {
+            name: LogTracker(
+                name, os.path.join(logs_dir, os.path.basename(info["log_file"])), backfill, max_read, window_minutes
+            )
+            for name, info in services.items()
+        }
+
+    def update_all(self):
+        """Bring every tracker up to date; returns the bytes parsed"""
+        return sum(tracker.update() for tracker in self.trackers.values())
+
+    def describe(self, name=None, cursor=True):
+        if name is not None:
+            return self.trackers[name].describe(cursor=cursor)
+        return {name: tracker.describe(cursor=cursor) for name, tracker in self.trackers.items()}
+
+    def save(self):
+        if not self.state_path:
+            return
+        state = {name: tracker.state() for name, tracker in self.trackers.items()}
+        temp_path = f"{self.state_path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(state, f, separators=(",", ":"))
+        os.replace(temp_path, self.state_path)
+
+    def load(self):
+        """Resume from the saved offsets; False when there was nothing usable"""
+        if not self.state_path:
+            return False
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Ignoring unreadable log stats {self.state_path}: {str(e)}")
+            return False
+        restored = False
+        for name, tracker in self.trackers.items():
+            if name not in state:
+                continue
+            try:
+                tracker.restore(state[name])
+                restored = True
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f"⚠️ Ignoring saved log stats for {name}: {str(e)}")
+        return restored
+
+
+class LogStatsUpdater(threading.Thread):
+    """Parses newly appended log lines every `interval` seconds and persists the offsets"""
+
+    def __init__(self, registry, interval):
+        super().__init__(name="log-stats-updater", daemon=True)
+        self.registry = registry
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                if self.registry.update_all():
+                    self.registry.save()
+            except Exception as e:
+                logger.warning(f"⚠️ Log stats update failed: {str(e)}")
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,146 @@
+"""
+Bounded-memory log file access
+
+Helpers for serving /logs/<service> without loading the file into memory:
+tail offsets found by reading backwards from EOF, single byte ranges,
+fixed-size chunk streaming and HTTP/1.1 chunked (optionally gzipped) output.
+"""
+
+import os
+import re
+import zlib
+
+CHUNK_SIZE = 64 * 1024
+
+_SERVICE_NAME = re.compile(r"^[A-Za-z0-9_.-]+$")
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(Exception):
+    """The requested byte range lies outside the file"""
+
+
+def resolve_log_path(logs_dir, service_name):
+    """Map a service name to its log file, refusing anything outside logs_dir"""
+    if not _SERVICE_NAME.match(service_name) or service_name.startswith("."):
+        return None
+    return os.path.join(logs_dir, f"{service_name}.log")
+
+
+def parse_line_count(value):
+    """A ?tail= line count; ValueError unless it is a non-negative integer"""
+    lines = int(value)
+    if lines < 0:
+        raise ValueError(f"negative line count: {lines}")
+    return lines
+
+
+def find_tail_offset(f, size, lines, block_size=CHUNK_SIZE):
+    """Byte offset where the last `lines` lines of the file begin
+
+    Reads fixed-size blocks backwards from `size`, so memory use does not
+    depend on the file or line count.
+    """
+    if lines <= 0:
+        return size
+    position = size
+    newlines = 0
+    # A trailing newline terminates the last line rather than starting a new one
+    if size > 0:
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            position -= 1
+    while position > 0:
+        read_size = min(block_size, position)
+        position -= read_size
+        f.seek(position)
+        block = f.read(read_size)
+        index = len(block)
+        while True:
+            index = block.rfind(b"\n", 0, index)
+            if index < 0:
+                break
+            newlines += 1
+            if newlines == lines:
+                return position + index + 1
+    return 0
+
+
+def parse_byte_range(header, size):
+    """Parse a single `bytes=` Range header into an inclusive (start, end)
+
+    Returns None when the header should be ignored (multiple or malformed
+    ranges serve the full body, as RFC 9110 allows).
+    """
+    match = _RANGE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the final N bytes
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable()
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+
+def iter_file_chunks(f, start, end, chunk_size=CHUNK_SIZE):
+    """Yield the bytes in [start, end) using one fixed-size buffer"""
+    f.seek(start)
+    remaining = end - start
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    while remaining > 0:
+        count = f.readinto(view[:min(chunk_size, remaining)])
+        if not count:
+            return
+        remaining -= count
+        yield view[:count]
+
+
+class ChunkedWriter:
+    """Write an HTTP/1.1 chunked body, optionally gzip-compressed on the fly"""
+
+    def __init__(self, wfile, compress=False):
+        self.wfile = wfile
+        # wbits=31 produces a gzip container
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def _chunk(self, data):
+        if data:
+            self.wfile.write(b"%x\r\n" % len(data))
+            self.wfile.write(data)
+            self.wfile.write(b"\r\n")
+
+    def write(self, data):
+        if self._compressor is not None:
+            data = self._compressor.compress(data)
+        self._chunk(data)
+
+    def flush(self):
+        """Push compressed data buffered so far out to the client"""
+        if self._compressor is not None:
+            self._chunk(self._compressor.flush(zlib.Z_SYNC_FLUSH))
+        self.wfile.flush()
+
+    def close(self):
+        if self._compressor is not None:
+            self._chunk(self._compressor.flush())
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def accepts_gzip(accept_encoding):
+    """True when the Accept-Encoding header allows gzip"""
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
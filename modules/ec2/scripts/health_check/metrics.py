@@ -0,0 +1,267 @@
+"""
+Prometheus text-format metrics
+
+Recording is lock-free: every thread writes into its own fixed-size
+array('d') shard and shards are only summed when /metrics is scraped.
+Observing a histogram is a bisect plus two array writes, so the
+instrumentation can stay on in production.
+"""
+
+import threading
+import weakref
+from array import array
+from bisect import bisect_left
+from collections import deque
+
+# Request and probe latencies in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(int(value)) if float(value).is_integer() else repr(value)
+
+
+class _ShardHolder:
+    """Thread-local owner of one shard; collected when its thread exits"""
+
+    __slots__ = ("shard", "__weakref__")
+
+    def __init__(self, shard):
+        self.shard = shard
+
+
+class _Sharded:
+    """Per-thread array('d') shards of a fixed width, summed on read
+
+    When a thread exits, its shard is folded into a base total and dropped, so
+    short-lived threads don't leave shards behind.
+    """
+
+    __slots__ = ("width", "_local", "_shards", "_base", "_retired", "_lock")
+
+    def __init__(self, width):
+        self.width = width
+        self._local = threading.local()
+        # Keyed by id(): arrays compare by value, so list.remove() could drop the wrong one
+        self._shards = {}
+        self._base = [0.0] * width
+        # Shards of exited threads, queued by their finalizer without taking the lock
+        self._retired = deque()
+        self._lock = threading.Lock()
+
+    def shard(self):
+        try:
+            return self._local.holder.shard
+        except AttributeError:
+            shard = array("d", bytes(8 * self.width))
+            holder = _ShardHolder(shard)
+            weakref.finalize(holder, self._retired.append, shard).atexit = False
+            with self._lock:
+                self._fold_retired()
+                self._shards[id(shard)] = shard
+            self._local.holder = holder
+            return shard
+
+    def _fold_retired(self):
+        """Move the shards of exited threads into the base total; caller holds the lock"""
+        while self._retired:
+            shard = self._retired.popleft()
+            for index in range(self.width):
+                self._base[index] += shard[index]
+            del self._shards[id(shard)]
+
+    def totals(self):
+        with self._lock:
+            self._fold_retired()
+            totals = list(self._base)
+            shards = list(self._shards.values())
+        for shard in shards:
+            for index in range(self.width):
+                totals[index] += shard[index]
+        return totals
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def labels(self, *values):
+        """Child for one label combination; cache it at the call site on hot paths"""
+        values = tuple(str(value) for value in values)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, value in self._samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("_values",)
+
+    def __init__(self):
+        self._values = _Sharded(1)
+
+    def inc(self, amount=1):
+        self._values.shard()[0] += amount
+
+    @property
+    def value(self):
+        return self._values.totals()[0]
+
+
+class Counter(_Metric):
+    """Monotonic counter"""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._children[()].inc(amount)
+
+    def _samples(self):
+        for values, child in list(self._children.items()):
+            yield "", _format_labels(self.labelnames, values), child.value
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount=1):
+        self._values.shard()[0] -= amount
+
+
+class Gauge(Counter):
+    """Up/down gauge (per-thread shards make inc/dec from many threads safe)"""
+
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def dec(self, amount=1):
+        self._children[()].dec(amount)
+
+
+class CallbackGauge(_Metric):
+    """Gauge whose value is computed at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, callback, registry=None):
+        self.callback = callback
+        super().__init__(name, documentation, (), registry)
+
+    def _new_child(self):
+        return None
+
+    def _samples(self):
+        try:
+            value = self.callback()
+        except Exception:
+            return
+        if value is not None:
+            yield "", "", value
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "_values")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        # One slot per bucket, one for +Inf, one for the sum
+        self._values = _Sharded(len(bounds) + 2)
+
+    def observe(self, value):
+        shard = self._values.shard()
+        shard[bisect_left(self.bounds, value)] += 1
+        shard[-1] += value
+
+    def totals(self):
+        return self._values.totals()
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS, registry=None):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value):
+        self._children[()].observe(value)
+
+    def _samples(self):
+        for values, child in list(self._children.items()):
+            totals = child.totals()
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float("inf"),), totals[:-1]):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                yield "_bucket", _format_labels(self.labelnames, values, le), cumulative
+            labels = _format_labels(self.labelnames, values)
+            yield "_sum", labels, totals[-1]
+            yield "_count", labels, cumulative
+
+
+class Registry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return ("\n".join(lines) + "\n").encode()
+
+
+REGISTRY = Registry()
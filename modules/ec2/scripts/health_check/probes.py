@@ -0,0 +1,273 @@
+"""
+In-process probe engine
+
+Checks every dependency at the same time from a persistent thread pool. HTTP
+connections are pooled per origin and reused across probe cycles, every probe
+has its own timeout, and the whole cycle is bounded by an overall deadline.
+A probe with a circuit breaker is skipped while the breaker is open and
+reported with its last error straight away.
+"""
+
+import http.client
+import logging
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+from health_check.breaker import CircuitOpenError
+from health_check.metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+PROBE_LATENCY = Histogram(
+    "health_probe_duration_seconds",
+    "Latency of each dependency probe, including retries",
+    ["probe"]
+)
+PROBE_FAILURES = Counter(
+    "health_probe_failures_total",
+    "Dependency probes that ended unhealthy",
+    ["probe"]
+)
+PROBE_SHORT_CIRCUITS = Counter(
+    "health_probe_short_circuits_total",
+    "Probes skipped because their circuit breaker was open",
+    ["probe"]
+)
+
+
+class ConnectionPool:
+    """Idle keep-alive connections to one origin, checked out one caller at a time"""
+
+    def __init__(self, host, port, max_idle=4):
+        self.host = host
+        self.port = port
+        self._idle = queue.LifoQueue(maxsize=max_idle)
+
+    def checkout(self, timeout):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn
+
+    def checkin(self, conn):
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def discard(self, conn):
+        conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class ProbeResult:
+    """Outcome of a single probe in one cycle"""
+
+    __slots__ = ("name", "ok", "status_code", "latency_ms", "attempts", "error", "breaker")
+
+    def __init__(self, name, ok, status_code=None, latency_ms=0.0, attempts=0, error=None):
+        self.name = name
+        self.ok = ok
+        self.status_code = status_code
+        self.latency_ms = latency_ms
+        self.attempts = attempts
+        self.error = error
+        # Breaker state after this result, for probes that have one
+        self.breaker = None
+
+    def to_dict(self):
+        return {
+            "ok": self.ok,
+            "status_code": self.status_code,
+            "latency_ms": round(self.latency_ms, 1),
+            "attempts": self.attempts,
+            "error": self.error,
+            "breaker": self.breaker
+        }
+
+
+class HttpProbe:
+    """GET a URL and treat any status below 400 as healthy (like curl -f)"""
+
+    def __init__(self, name, display_name, url, timeout, retries=2, critical=True, breaker=None):
+        parts = urlsplit(url)
+        self.name = name
+        self.display_name = display_name
+        self.url = url
+        self.path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        self.timeout = timeout
+        self.retries = retries
+        self.critical = critical
+        self.breaker = breaker
+        self.pool = ConnectionPool(parts.hostname, parts.port or 80)
+
+    def run(self, deadline):
+        """Probe until success, retries are exhausted or the deadline passes"""
+        started = time.monotonic()
+        error = None
+        status_code = None
+        attempts = 0
+        while attempts < self.retries:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                error = error or "deadline exceeded"
+                break
+            attempts += 1
+            conn = self.pool.checkout(min(self.timeout, remaining))
+            try:
+                conn.request("GET", self.path, headers={"User-Agent": "sms-health-check"})
+                response = conn.getresponse()
+                response.read()
+                status_code = response.status
+                if response.will_close:
+                    self.pool.discard(conn)
+                else:
+                    self.pool.checkin(conn)
+                if status_code < 400:
+                    return ProbeResult(self.name, True, status_code, (time.monotonic() - started) * 1000, attempts)
+                error = f"HTTP {status_code}"
+            except (OSError, http.client.HTTPException) as e:
+                # A reused socket may have been closed by the peer; the retry gets a fresh one
+                self.pool.discard(conn)
+                error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+        return ProbeResult(self.name, False, status_code, (time.monotonic() - started) * 1000, attempts, error)
+
+    def close(self):
+        self.pool.close()
+
+
+class DockerContainersProbe:
+    """Check that every required container is running with one Engine API call"""
+
+    def __init__(self, client, containers, critical=True, states=None):
+        self.name = "docker"
+        self.display_name = "Docker containers"
+        self.client = client
+        self.containers = containers
+        self.critical = critical
+        # Optional states(client, timeout=) override, e.g. a coalesced lookup
+        self.states = states
+
+    def run(self, deadline):
+        started = time.monotonic()
+        try:
+            if self.states is not None:
+                states = self.states(self.client, timeout=max(deadline - started, 0.1))
+            else:
+                states = self.client.container_states()
+        except Exception as e:
+            return ProbeResult(self.name, False, latency_ms=(time.monotonic() - started) * 1000, attempts=1, error=str(e))
+        latency_ms = (time.monotonic() - started) * 1000
+        down = [name for name in self.containers if states.get(name) != "running"]
+        if down:
+            return ProbeResult(self.name, False, latency_ms=latency_ms, attempts=1, error=f"Not running: {', '.join(down)}")
+        return ProbeResult(self.name, True, latency_ms=latency_ms, attempts=1)
+
+    def close(self):
+        pass
+
+
+class BackgroundServicesProbe:
+    """Check the backend's background services with one batched exec (non-critical by default)"""
+
+    def __init__(self, client, collect, critical=False):
+        self.name = "background_services"
+        self.display_name = "Background services"
+        self.client = client
+        self.collect = collect
+        self.critical = critical
+
+    def run(self, deadline):
+        started = time.monotonic()
+        try:
+            statuses = self.collect(self.client, timeout=max(deadline - started, 0.1))
+        except Exception as e:
+            return ProbeResult(self.name, False, latency_ms=(time.monotonic() - started) * 1000, attempts=1, error=str(e))
+        latency_ms = (time.monotonic() - started) * 1000
+        # CIRCUIT_OPEN marks a last-known status served while that service's breaker is open
+        open_circuits = [name for name, parts in statuses.items() if parts.get("CIRCUIT_OPEN")]
+        stalled = [name for name, parts in statuses.items() if parts.get("PROCESS") == "stalled"]
+        stopped = [
+            name for name, parts in statuses.items()
+            if parts.get("PROCESS") not in ("running", "stalled") and name not in open_circuits
+        ]
+        if stalled or stopped or open_circuits:
+            problems = []
+            if stopped:
+                problems.append(f"Not running: {', '.join(stopped)}")
+            if stalled:
+                problems.append(f"Stalled (missed heartbeat): {', '.join(stalled)}")
+            if open_circuits:
+                problems.append(f"Circuit open: {', '.join(open_circuits)}")
+            return ProbeResult(self.name, False, latency_ms=latency_ms, attempts=1, error="; ".join(problems))
+        return ProbeResult(self.name, True, latency_ms=latency_ms, attempts=1)
+
+    def close(self):
+        pass
+
+
+class ProbeEngine:
+    """Runs a set of probes concurrently under one overall deadline"""
+
+    def __init__(self, probes, deadline_seconds):
+        self.probes = probes
+        self.deadline_seconds = deadline_seconds
+        # Spare workers so a probe stuck past the deadline can't block the next cycle
+        self._executor = ThreadPoolExecutor(max_workers=max(4, 2 * len(probes)), thread_name_prefix="probe")
+
+    def run_all(self):
+        """Return {probe name: ProbeResult} for one cycle"""
+        started = time.monotonic()
+        deadline = started + self.deadline_seconds
+        results = {}
+        futures = {}
+        for probe in self.probes:
+            breaker = getattr(probe, "breaker", None)
+            if breaker is not None and not breaker.allow():
+                # Known-bad dependency: report it without touching the network
+                results[probe.name] = ProbeResult(probe.name, False, error=str(CircuitOpenError(breaker)))
+                results[probe.name].breaker = breaker.to_dict()
+                PROBE_SHORT_CIRCUITS.labels(probe.name).inc()
+                PROBE_FAILURES.labels(probe.name).inc()
+                continue
+            futures[self._executor.submit(probe.run, deadline)] = probe
+        done, _ = wait(futures, timeout=self.deadline_seconds)
+
+        for future, probe in futures.items():
+            if future in done:
+                try:
+                    results[probe.name] = future.result()
+                except Exception as e:
+                    results[probe.name] = ProbeResult(probe.name, False, error=f"Probe error: {str(e)}")
+            else:
+                results[probe.name] = ProbeResult(
+                    probe.name, False,
+                    latency_ms=(time.monotonic() - started) * 1000,
+                    error=f"Overall deadline of {self.deadline_seconds:g}s exceeded"
+                )
+            result = results[probe.name]
+            breaker = getattr(probe, "breaker", None)
+            if breaker is not None:
+                breaker.record(result.ok, result.error)
+                result.breaker = breaker.to_dict()
+            PROBE_LATENCY.labels(probe.name).observe(result.latency_ms / 1000)
+            if not result.ok:
+                PROBE_FAILURES.labels(probe.name).inc()
+        return {probe.name: results[probe.name] for probe in self.probes}
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        for probe in self.probes:
+            probe.close()
@@ -0,0 +1,98 @@
+"""
+JSON response encoding with pre-serialized static parts
+
+Static payload (container and background-service metadata) is serialized
+once at import as a Fragment and spliced into each response as raw JSON;
+only the small dynamic part is encoded per request. Output is compact by
+default, and a weak ETag over everything except per-request fields lets
+pollers revalidate with If-None-Match and get a 304.
+"""
+
+import hashlib
+import json
+import re
+
+# Fields that change on every request or probe cycle without the underlying state changing:
+# clocks, ages and measured latencies
+VOLATILE_KEYS = (
+    "timestamp", "snapshot_age_seconds", "age_seconds", "retry_in_seconds",
+    "checked_at", "last_check", "latency_ms", "probe_duration_ms"
+)
+
+# The C encoder can't embed raw JSON, so fragments go through as placeholder strings
+_PLACEHOLDER = re.compile(r'"\\u0000(\d+)\\u0000"')
+# A volatile member wherever it appears; quotes inside string values are escaped, so this only hits real keys
+_VOLATILE = re.compile(
+    rb'([{,])"(?:' + b"|".join(key.encode() for key in VOLATILE_KEYS) + rb')":(?:"[^"]*"|[^,}\]]*)'
+)
+
+
+class Fragment:
+    """Already-serialized compact JSON that dumps() embeds verbatim"""
+
+    __slots__ = ("text",)
+
+    def __init__(self, value):
+        self.text = _encode(value)
+
+
+class ObjectTemplate:
+    """JSON object whose static members are serialized once"""
+
+    __slots__ = ("members",)
+
+    def __init__(self, members):
+        # Members without the surrounding braces, ready to splice
+        self.members = _encode(members)[1:-1]
+
+    def fill(self, dynamic=None):
+        """Fragment of the static members followed by the dynamic ones"""
+        fragment = Fragment.__new__(Fragment)
+        if not dynamic:
+            fragment.text = "{" + self.members + "}"
+        else:
+            fragment.text = "{" + self.members + "," + _encode(dynamic)[1:]
+        return fragment
+
+
+def _encode(value):
+    fragments = {}
+
+    def placeholder(obj):
+        if isinstance(obj, Fragment):
+            key = str(id(obj))
+            fragments[key] = obj.text
+            return f"\x00{key}\x00"
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+    text = json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=placeholder)
+    if fragments:
+        text = _PLACEHOLDER.sub(lambda match: fragments.get(match.group(1), match.group(0)), text)
+    return text
+
+
+def dumps(value):
+    """Compact UTF-8 JSON with any Fragments spliced in as-is"""
+    return _encode(value).encode()
+
+
+def pretty(body):
+    """Indented rendering of a compact body for ?pretty=1"""
+    return json.dumps(json.loads(body), indent=2, ensure_ascii=False).encode()
+
+
+def etag(body):
+    """Weak ETag over a compact body, ignoring VOLATILE_KEYS"""
+    return 'W/"' + hashlib.blake2b(_VOLATILE.sub(rb"\1", body), digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(if_none_match, tag):
+    """Weak comparison of an If-None-Match header against our ETag"""
+    if not if_none_match:
+        return False
+    opaque = tag[2:]
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == opaque:
+            return True
+    return False
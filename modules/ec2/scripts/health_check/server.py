@@ -0,0 +1,270 @@
+"""
+Concurrent HTTP server core
+
+Connections are handed to a fixed pool of worker threads instead of being
+served one at a time, and HTTP/1.1 keep-alive lets nginx reuse upstream
+sockets. A keep-alive connection only holds a worker while a request is
+being served; between requests it is parked in a selector and queued for a
+worker again when the next request arrives, so idle clients can't starve
+new ones. Heavy diagnostic endpoints run behind a small semaphore so they can
+never occupy every worker: the remaining workers form a priority lane that
+always stays free for ALB health checks. A diagnostic request that finds
+every slot busy is turned away at once rather than waiting on a worker.
+"""
+
+import http.server
+import logging
+import os
+import queue
+import selectors
+import socketserver
+import threading
+import time
+
+from health_check.metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+QUEUE_WAIT = Histogram(
+    "health_server_queue_wait_seconds",
+    "Time an accepted connection waited for a worker thread"
+)
+REJECTED_CONNECTIONS = Counter(
+    "health_server_rejected_connections_total",
+    "Connections rejected because the backlog was full"
+)
+HEAVY_REJECTED = Counter(
+    "health_server_heavy_rejected_total",
+    "Diagnostic requests rejected because every heavy slot was busy"
+)
+IDLE_CLOSED = Counter(
+    "health_server_idle_closed_total",
+    "Parked keep-alive connections closed for idling too long or over the limit"
+)
+
+
+class HeavyRequestLimiter:
+    """Caps how many workers may run heavy diagnostic endpoints at once"""
+
+    def __init__(self, slots):
+        self.slots = slots
+        self._semaphore = threading.BoundedSemaphore(slots)
+
+    def acquire(self):
+        # Never block: a worker waiting for a slot would be taken out of the health-check lane
+        if self._semaphore.acquire(blocking=False):
+            return True
+        HEAVY_REJECTED.inc()
+        return False
+
+    def release(self):
+        self._semaphore.release()
+
+
+class PooledRequestHandler(http.server.BaseHTTPRequestHandler):
+    """Request handler that gives its worker back whenever the client goes quiet"""
+
+    def handle(self):
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection:
+            if not self._request_buffered():
+                # Nothing more to read yet: wait for the next request in the selector, not on this worker
+                self.server.park(self.request, self.client_address)
+                return
+            self.handle_one_request()
+
+    def _request_buffered(self):
+        """True when the next request (or part of it) has already arrived"""
+        self.connection.setblocking(False)
+        try:
+            return bool(self.rfile.peek(1))
+        except OSError:
+            return False
+        finally:
+            self.connection.settimeout(self.timeout)
+
+
+class IdleConnectionParker(threading.Thread):
+    """Holds idle keep-alive sockets in a selector and requeues each one once it is readable"""
+
+    def __init__(self, resume, idle_timeout, max_idle):
+        super().__init__(name="http-idle-parker", daemon=True)
+        self.resume = resume
+        self.idle_timeout = idle_timeout
+        self.max_idle = max_idle
+        self._selector = selectors.DefaultSelector()
+        self._incoming = queue.SimpleQueue()
+        self._wake_read, self._wake_write = os.pipe()
+        os.set_blocking(self._wake_read, False)
+        os.set_blocking(self._wake_write, False)
+        self._selector.register(self._wake_read, selectors.EVENT_READ)
+        self._parked = 0
+
+    @property
+    def parked(self):
+        return self._parked
+
+    def park(self, request, client_address):
+        """Hand an idle connection over from any thread"""
+        self._incoming.put((request, client_address))
+        try:
+            os.write(self._wake_write, b"\0")
+        except BlockingIOError:
+            # The pipe is full, so the parker is already due to wake up
+            pass
+
+    def _close(self, request):
+        IDLE_CLOSED.inc()
+        try:
+            request.close()
+        except OSError:
+            pass
+
+    def _accept_incoming(self, now):
+        try:
+            while os.read(self._wake_read, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        while True:
+            try:
+                request, client_address = self._incoming.get_nowait()
+            except queue.Empty:
+                return
+            if self._parked >= self.max_idle:
+                self._close(request)
+                continue
+            self._selector.register(request, selectors.EVENT_READ, (client_address, now + self.idle_timeout))
+            self._parked += 1
+
+    def run(self):
+        next_sweep = time.monotonic() + 1
+        while True:
+            events = self._selector.select(timeout=max(next_sweep - time.monotonic(), 0))
+            now = time.monotonic()
+            for key, _ in events:
+                if key.fileobj == self._wake_read:
+                    self._accept_incoming(now)
+                    continue
+                # The next request (or a close) arrived: back to the worker queue
+                self._selector.unregister(key.fileobj)
+                self._parked -= 1
+                self.resume(key.fileobj, key.data[0])
+            if now >= next_sweep:
+                next_sweep = now + 1
+                for key in list(self._selector.get_map().values()):
+                    if key.data is not None and key.data[1] <= now:
+                        self._selector.unregister(key.fileobj)
+                        self._parked -= 1
+                        self._close(key.fileobj)
+
+
+class ThreadPoolHTTPServer(http.server.HTTPServer):
+    """HTTPServer that dispatches accepted connections to a bounded worker pool"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(self, server_address, handler_class, workers, backlog, heavy_slots,
+                 idle_timeout=15.0, max_idle=1024):
+        if heavy_slots >= workers:
+            raise ValueError(f"heavy_slots ({heavy_slots}) must leave at least one worker for health checks ({workers} workers)")
+        super().__init__(server_address, handler_class)
+        self.workers = workers
+        self.heavy_limiter = HeavyRequestLimiter(heavy_slots)
+        self._connections = queue.Queue(maxsize=backlog)
+        self._busy = 0
+        self._busy_lock = threading.Lock()
+        self._detached = set()
+        self._parking = {}
+        # Idle keep-alive connections of PooledRequestHandler wait here instead of on a worker
+        self._parker = IdleConnectionParker(self.process_request, idle_timeout, max_idle)
+        self._parker.start()
+        self._threads = []
+        for index in range(workers):
+            thread = threading.Thread(target=self._worker, name=f"http-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def server_bind(self):
+        # HTTPServer.server_bind resolves the bind address with getfqdn(), a reverse DNS lookup
+        # that can stall startup for seconds; the name is only used for CGI, so skip it
+        socketserver.TCPServer.server_bind(self)
+        host, port = self.server_address[:2]
+        self.server_name = host
+        self.server_port = port
+
+    @property
+    def busy_workers(self):
+        return self._busy
+
+    @property
+    def queued_connections(self):
+        return self._connections.qsize()
+
+    @property
+    def idle_connections(self):
+        return self._parker.parked
+
+    def process_request(self, request, client_address):
+        """Queue the connection for a worker instead of serving it inline"""
+        try:
+            self._connections.put_nowait((request, client_address, time.perf_counter()))
+        except queue.Full:
+            REJECTED_CONNECTIONS.inc()
+            logger.warning(f"⚠️ Connection backlog full, rejecting {client_address[0]}")
+            self._reject(request)
+
+    def _reject(self, request):
+        try:
+            request.sendall(
+                b"HTTP/1.1 503 Service Unavailable\r\n"
+                b"Content-Type: text/plain\r\n"
+                b"Content-Length: 12\r\n"
+                b"Retry-After: 1\r\n"
+                b"Connection: close\r\n\r\n"
+                b"Server busy\n"
+            )
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+    def _worker(self):
+        while True:
+            request, client_address, queued_at = self._connections.get()
+            QUEUE_WAIT.observe(time.perf_counter() - queued_at)
+            with self._busy_lock:
+                self._busy += 1
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+                with self._busy_lock:
+                    self._busy -= 1
+
+    def detach(self, request):
+        """Hand a connection to another owner; the worker will not close it"""
+        self._detached.add(request)
+
+    def park(self, request, client_address):
+        """Keep an idle keep-alive connection open without a worker until its next request"""
+        # Handed over in shutdown_request, once this worker is completely done with the socket
+        self._parking[request] = client_address
+
+    def shutdown_request(self, request):
+        if request in self._detached:
+            self._detached.discard(request)
+            return
+        client_address = self._parking.pop(request, None)
+        if client_address is not None:
+            self._parker.park(request, client_address)
+            return
+        super().shutdown_request(request)
+
+    def should_release_connection(self):
+        """True when idle keep-alive sockets should be closed to make room for waiting clients"""
+        return not self._connections.empty()
@@ -0,0 +1,150 @@
+"""
+Background service definitions and batched status collection
+
+Services that send heartbeats are inspected locally: liveness from the
+heartbeat registry, log details from the shared app_logs volume. Any others
+are inspected with a single exec into sms_backend instead of one docker
+exec per service.
+"""
+
+import os
+import time
+
+from health_check.logs import find_tail_offset
+
+BACKEND_CONTAINER = "sms_backend"
+REQUIRED_CONTAINERS = ["sms_backend", "sms_frontend", "nginx_proxy"]
+
+CONTAINERS = {
+    "sms_backend": {
+        "name": "SMS Backend API",
+        "port": 8900,
+        "health_endpoint": "/health",
+        "description": "FastAPI backend with authentication and SMS processing"
+    },
+    "sms_frontend": {
+        "name": "SMS Frontend",
+        "port": 8082,
+        "description": "React frontend application"
+    },
+    "nginx_proxy": {
+        "name": "Nginx Reverse Proxy",
+        "port": 80,
+        "description": "Routes requests between frontend and backend"
+    }
+}
+
+BACKGROUND_SERVICES = {
+    "scheduled-messages": {
+        "display_name": "📨 Scheduled Messages Service",
+        "description": "Sends scheduled SMS messages every 60 seconds",
+        "script": "scripts/scheduler_runner.py",
+        "log_file": "logs/scheduled_messages.log"
+    },
+    "ai-processor": {
+        "display_name": "🤖 AI Response Processor",
+        "description": "Processes inbound messages for auto-responses using OpenAI",
+        "script": "scripts/ai_processor_runner.py",
+        "log_file": "logs/ai_processor.log"
+    }
+}
+
+# One line per service: SERVICE:<name>|PROCESS:...|PID:...|LOG_EXISTS:...|LOG_SIZE:...|LOG_MODIFIED:...|RECENT:...
+_STATUS_SCRIPT = """
+for entry in "$@"; do
+    service="${entry%%=*}"
+    log_file="/app/${entry#*=}"
+    pid_file="/app/logs/$service.pid"
+
+    process_status="not_started"
+    process_pid=""
+    if [ -f "$pid_file" ]; then
+        process_pid=$(cat "$pid_file" 2>/dev/null)
+        if [ ! -z "$process_pid" ] && kill -0 "$process_pid" 2>/dev/null; then
+            process_status="running"
+        else
+            process_status="stopped"
+        fi
+    fi
+
+    if [ -f "$log_file" ]; then
+        log_exists="true"
+        log_size=$(stat -c%s "$log_file" 2>/dev/null || echo "0")
+        log_modified=$(stat -c "%y" "$log_file" 2>/dev/null | cut -d'.' -f1 || echo "unknown")
+        recent_logs=$(tail -n 3 "$log_file" 2>/dev/null | tr '\\n' '|' | sed 's/|$//' || echo "")
+    else
+        log_exists="false"
+        log_size="0"
+        log_modified="unknown"
+        recent_logs=""
+    fi
+
+    echo "SERVICE:$service|PROCESS:$process_status|PID:$process_pid|LOG_EXISTS:$log_exists|LOG_SIZE:$log_size|LOG_MODIFIED:$log_modified|RECENT:$recent_logs"
+done
+"""
+
+
+def status_command(services=BACKGROUND_SERVICES):
+    """Exec Cmd that reports every service in one run"""
+    args = [f"{name}={info['log_file']}" for name, info in services.items()]
+    return ["sh", "-c", _STATUS_SCRIPT, "status"] + args
+
+
+def parse_status_output(output):
+    """Turn the batched status output into {service name: {KEY: value}}"""
+    statuses = {}
+    for line in output.splitlines():
+        if not line.startswith("SERVICE:"):
+            continue
+        head, _, recent = line.partition("|RECENT:")
+        parts = {"RECENT": recent}
+        for part in head.split('|'):
+            if ':' in part:
+                key, value = part.split(':', 1)
+                parts[key] = value
+        statuses[parts.pop("SERVICE")] = parts
+    return statuses
+
+
+def collect_background_status(client, timeout=None):
+    """Inspect every background service with a single exec into the backend container"""
+    result = client.exec_run(BACKEND_CONTAINER, status_command(), timeout=timeout)
+    if result.exit_code != 0:
+        raise RuntimeError(result.stderr.strip() or f"status exec exited with {result.exit_code}")
+    return parse_status_output(result.stdout)
+
+
+def local_log_status(path, recent_lines=3):
+    """LOG_* fields for a log on the shared volume, matching the exec output"""
+    try:
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            start = find_tail_offset(f, st.st_size, recent_lines)
+            f.seek(start)
+            recent = f.read(st.st_size - start).decode(errors="replace").splitlines()
+    except OSError:
+        return {"LOG_EXISTS": "false", "LOG_SIZE": "0", "LOG_MODIFIED": "unknown", "RECENT": ""}
+    return {
+        "LOG_EXISTS": "true",
+        "LOG_SIZE": str(st.st_size),
+        "LOG_MODIFIED": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(st.st_mtime)),
+        "RECENT": "|".join(recent)
+    }
+
+
+def collect_heartbeat_status(registry, logs_dir, services=BACKGROUND_SERVICES):
+    """Status for every service that has sent a heartbeat, without exec or subprocess"""
+    statuses = {}
+    now = time.monotonic()
+    for name, info in services.items():
+        beat = registry.get(name)
+        if beat is None:
+            continue
+        heartbeat = registry.describe(beat, now)
+        statuses[name] = {
+            "PROCESS": "stalled" if heartbeat["stalled"] else "running",
+            "PID": str(beat.pid or ""),
+            **local_log_status(os.path.join(logs_dir, os.path.basename(info["log_file"]))),
+            "HEARTBEAT": heartbeat
+        }
+    return statuses
@@ -0,0 +1,77 @@
+"""
+Single-flight coalescing of identical calls
+
+Concurrent callers asking for the same key share one execution, and its
+result is reused for a short TTL afterwards, so the number of Docker exec
+and API calls stays flat no matter how many clients poll at once. Each
+caller waits with its own timeout; giving up never cancels the shared call,
+which finishes on a long-lived worker thread and still serves everyone else.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from health_check.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+EXECUTIONS = Counter("health_singleflight_executions_total", "Coalesced calls actually executed", ["key"])
+SHARED = Counter("health_singleflight_shared_total", "Callers served by an in-flight or cached execution", ["key"])
+TIMEOUTS = Counter("health_singleflight_timeouts_total", "Callers that gave up waiting on a shared execution", ["key"])
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "finished_at")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.finished_at = None
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one execution"""
+
+    def __init__(self, ttl, workers=4):
+        self.ttl = ttl
+        self._calls = {}
+        self._lock = threading.Lock()
+        # At most one execution per key is in flight, so a worker per concurrently used key never queues
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="singleflight")
+
+    def do(self, key, fn, timeout=None):
+        """Return fn()'s result, sharing an in-flight or recent execution for key"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None and call.finished_at is not None and time.monotonic() - call.finished_at > self.ttl:
+                call = None
+            if call is None:
+                call = self._calls[key] = _Call()
+                EXECUTIONS.labels(key).inc()
+                self._executor.submit(self._run, key, call, fn)
+            else:
+                SHARED.labels(key).inc()
+
+        if not call.done.wait(timeout):
+            TIMEOUTS.labels(key).inc()
+            raise TimeoutError(f"Timed out after {timeout:g}s waiting for {key}")
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def _run(self, key, call, fn):
+        try:
+            call.result = fn()
+        except Exception as e:
+            # Failures are shared for the TTL too, so a down dependency isn't hammered
+            call.error = e
+        call.finished_at = time.monotonic()
+        if self.ttl <= 0:
+            # Dropped before waking the waiters, so none of them can come straight back and reuse it
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+        call.done.set()
@@ -0,0 +1,250 @@
+"""
+Background-refreshed health snapshot
+
+A single probe loop runs the health check on a fixed interval and publishes
+the result to a shared store. Request handlers only read the latest snapshot,
+so an ALB poll never waits on docker or curl. Each snapshot is also saved
+to disk; after a restart the saved one is served, marked as restored, until
+the first live probe of the new process completes.
+"""
+
+import json
+import logging
+import os
+import subprocess
+import threading
+import time
+from datetime import datetime
+
+from health_check.metrics import Counter
+from health_check.probes import PROBE_FAILURES, PROBE_LATENCY
+
+logger = logging.getLogger(__name__)
+
+SUBPROCESS_RUNS = Counter("health_subprocess_runs_total", "Subprocesses forked by the health server", ["command"])
+SUBPROCESS_TIMEOUTS = Counter("health_subprocess_timeouts_total", "Subprocesses killed after timing out", ["command"])
+SUBPROCESS_FAILURES = Counter("health_subprocess_failures_total", "Subprocesses that exited non-zero or failed to start", ["command"])
+
+
+def utc_timestamp():
+    """ISO-8601 UTC timestamp in the format used by every endpoint"""
+    return datetime.utcnow().isoformat() + 'Z'
+
+
+class HealthSnapshot:
+    """Result of one probe cycle"""
+
+    __slots__ = ("status", "timestamp", "checked_at", "duration_ms", "details", "error", "probes", "restored_age")
+
+    def __init__(self, status, details="", error=None, duration_ms=0.0, probes=None):
+        self.status = status
+        self.timestamp = utc_timestamp()
+        self.checked_at = time.monotonic()
+        self.duration_ms = duration_ms
+        self.details = details
+        self.error = error
+        # Per-probe results ({name: dict}) when the native probe engine is used
+        self.probes = probes or {}
+        # Age in seconds when loaded from disk at startup; None for a live snapshot
+        self.restored_age = None
+
+    @property
+    def healthy(self):
+        return self.status == "healthy"
+
+    @property
+    def restored(self):
+        return self.restored_age is not None
+
+    def age(self, now=None):
+        """Seconds since this snapshot was taken"""
+        return (now if now is not None else time.monotonic()) - self.checked_at
+
+
+class SnapshotStore:
+    """Holds the most recent snapshot and decides whether it is still usable"""
+
+    def __init__(self, stale_after):
+        self.stale_after = stale_after
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def publish(self, snapshot):
+        with self._lock:
+            self._snapshot = snapshot
+
+    def current(self):
+        # Reading a single attribute is atomic, so readers never take the lock
+        return self._snapshot
+
+    def is_stale(self, snapshot, now=None):
+        return snapshot is None or snapshot.age(now) > self.stale_after
+
+
+def save_snapshot(snapshot, path):
+    """Atomically write a snapshot for the next start to serve while it warms up"""
+    data = {
+        "status": snapshot.status,
+        "timestamp": snapshot.timestamp,
+        "checked_wall": time.time() - snapshot.age(),
+        "duration_ms": snapshot.duration_ms,
+        "details": snapshot.details,
+        "error": snapshot.error,
+        "probes": snapshot.probes
+    }
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(temp_path, path)
+
+
+def load_snapshot(path, max_age):
+    """The saved snapshot, marked as restored; None when missing, unreadable or older than max_age"""
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        age = time.time() - float(data["checked_wall"])
+        snapshot = HealthSnapshot(
+            data["status"], data["details"], data["error"], float(data["duration_ms"]), data["probes"]
+        )
+        snapshot.timestamp = data["timestamp"]
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.warning(f"⚠️ Ignoring unreadable health snapshot {path}: {str(e)}")
+        return None
+    if age > max_age:
+        logger.info(f"♨️ Saved health snapshot is {age:.0f}s old (limit {max_age:g}s); waiting for a live probe")
+        return None
+    # checked_at stays "now", so staleness counts from this start: a probe loop that never
+    # completes still turns the restored snapshot unhealthy after stale_after seconds
+    snapshot.restored_age = max(age, 0.0)
+    return snapshot
+
+
+def run_health_check_script(script, timeout):
+    """Run health-check.sh once and convert the outcome into a snapshot"""
+    started = time.monotonic()
+    SUBPROCESS_RUNS.labels("health-check.sh").inc()
+    try:
+        result = subprocess.run(
+            ['/bin/bash', script],
+            capture_output=True,
+            text=True,
+            timeout=timeout
+        )
+        duration_ms = (time.monotonic() - started) * 1000
+        if result.returncode == 0:
+            snapshot = HealthSnapshot("healthy", result.stdout.strip(), duration_ms=duration_ms)
+        else:
+            SUBPROCESS_FAILURES.labels("health-check.sh").inc()
+            snapshot = HealthSnapshot(
+                "unhealthy",
+                result.stdout.strip(),
+                error=result.stderr.strip() if result.stderr else "Health check failed",
+                duration_ms=duration_ms
+            )
+    except subprocess.TimeoutExpired:
+        SUBPROCESS_TIMEOUTS.labels("health-check.sh").inc()
+        snapshot = HealthSnapshot(
+            "unhealthy",
+            error=f"Health check timed out after {timeout:g} seconds",
+            duration_ms=(time.monotonic() - started) * 1000
+        )
+    except Exception as e:
+        SUBPROCESS_FAILURES.labels("health-check.sh").inc()
+        snapshot = HealthSnapshot(
+            "unhealthy",
+            error=f"Health check server error: {str(e)}",
+            duration_ms=(time.monotonic() - started) * 1000
+        )
+    PROBE_LATENCY.labels("health_check_script").observe(snapshot.duration_ms / 1000)
+    if not snapshot.healthy:
+        PROBE_FAILURES.labels("health_check_script").inc()
+    return snapshot
+
+
+def run_probe_engine(engine):
+    """Run every native probe once and convert the results into a snapshot"""
+    started = time.monotonic()
+    results = engine.run_all()
+
+    lines = []
+    failures = []
+    for probe in engine.probes:
+        result = results[probe.name]
+        if result.ok:
+            # No timings in the text: details is part of the ETag, latencies are reported per probe
+            lines.append(f"✅ {probe.display_name} is healthy")
+        else:
+            lines.append(f"❌ {probe.display_name} is unhealthy: {result.error}")
+            if probe.critical:
+                failures.append(f"{probe.display_name}: {result.error}")
+
+    return HealthSnapshot(
+        "unhealthy" if failures else "healthy",
+        "\n".join(lines),
+        error="; ".join(failures) or None,
+        duration_ms=(time.monotonic() - started) * 1000,
+        probes={name: result.to_dict() for name, result in results.items()}
+    )
+
+
+class ProbeLoop(threading.Thread):
+    """Daemon thread that refreshes a SnapshotStore every `interval` seconds"""
+
+    def __init__(self, store, probe, interval, next_interval=None, history=None, snapshot_file=None):
+        super().__init__(name="health-probe-loop", daemon=True)
+        self.store = store
+        self.probe = probe
+        self.interval = interval
+        # Optional next_interval(interval) that shortens the wait, e.g. while a breaker recovers
+        self.next_interval = next_interval
+        # Optional HealthHistory that records every snapshot
+        self.history = history
+        # Optional path every snapshot is saved to, for a warm restart
+        self.snapshot_file = snapshot_file
+        self._save_failing = False
+        self._stop_event = threading.Event()
+
+    def run(self):
+        logger.info(f"🔁 Probe loop started (interval {self.interval:g}s, stale after {self.store.stale_after:g}s)")
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            self.run_once()
+            # Keep a fixed cadence regardless of how long the probe took
+            interval = self.next_interval(self.interval) if self.next_interval else self.interval
+            remaining = interval - (time.monotonic() - started)
+            self._stop_event.wait(max(remaining, 0))
+
+    def run_once(self):
+        previous = self.store.current()
+        try:
+            snapshot = self.probe()
+        except Exception as e:
+            snapshot = HealthSnapshot("unhealthy", error=f"Probe loop error: {str(e)}")
+        self.store.publish(snapshot)
+        if self.history is not None:
+            self.history.record_snapshot(snapshot)
+        if self.snapshot_file:
+            self.save(snapshot)
+
+        if previous is None or previous.status != snapshot.status:
+            if snapshot.healthy:
+                logger.info(f"✅ Health snapshot is healthy ({snapshot.duration_ms:.0f} ms)")
+            else:
+                logger.warning(f"⚠️ Health snapshot is unhealthy: {snapshot.error}")
+        return snapshot
+
+    def save(self, snapshot):
+        try:
+            save_snapshot(snapshot, self.snapshot_file)
+            self._save_failing = False
+        except (OSError, TypeError, ValueError) as e:
+            # Warn once per failure streak, not every cycle
+            if not self._save_failing:
+                logger.warning(f"⚠️ Could not save health snapshot to {self.snapshot_file}: {str(e)}")
+            self._save_failing = True
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,69 @@
+"""
+Startup milestones
+
+Measures how long a (re)started server takes to listen, to answer, and to
+answer from a live probe. Times count from when the process was started,
+read from /proc so interpreter start-up and imports are included, or from
+when this module was imported where /proc is unavailable. Each milestone is
+recorded once, logged, shown in /status and exported as
+health_server_startup_seconds{milestone}.
+"""
+
+import logging
+import os
+import threading
+import time
+
+from health_check.metrics import Gauge
+
+logger = logging.getLogger(__name__)
+
+STARTUP_SECONDS = Gauge(
+    "health_server_startup_seconds",
+    "Seconds from process start to each startup milestone",
+    ["milestone"]
+)
+
+
+def process_age():
+    """Seconds since this process was started, or None without /proc"""
+    try:
+        with open("/proc/self/stat") as f:
+            # The command name may contain spaces; starttime is the 20th field after it
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, IndexError, ValueError):
+        return None
+    return max(uptime - start_ticks / os.sysconf("SC_CLK_TCK"), 0.0)
+
+
+class StartupTimer:
+    """First time each milestone was reached, relative to process start"""
+
+    def __init__(self):
+        age = process_age() or 0.0
+        self.started = time.monotonic() - age
+        self.started_at = time.time() - age
+        self.milestones = {}
+        self._lock = threading.Lock()
+
+    def mark(self, name):
+        """Record `name` the first time it is reached; True when this call recorded it"""
+        if name in self.milestones:
+            return False
+        with self._lock:
+            if name in self.milestones:
+                return False
+            seconds = time.monotonic() - self.started
+            self.milestones[name] = seconds
+        # Recorded once, so the gauge goes from zero straight to its value
+        STARTUP_SECONDS.labels(name).inc(seconds)
+        logger.info(f"⏱️ Startup: {name.replace('_', ' ')} after {seconds:.3f}s")
+        return True
+
+    def to_dict(self):
+        return {
+            "process_started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(self.started_at)) + 'Z',
+            "milestones_seconds": {name: round(seconds, 3) for name, seconds in self.milestones.items()}
+        }
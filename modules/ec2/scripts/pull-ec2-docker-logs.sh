@@ -23,9 +23,18 @@ SSH_USER="ec2-user"
 SSH_HOST="98.81.70.146"
 REMOTE_DIR="/app/sms-seller-connect"
 LOCAL_OUTPUT_DIR="../ec2-debug-output"  # Relative to scripts directory
+COLLECTOR_CONTAINER="health_check_service"  # Runs python3 -m health_check.collector
 
 # Create timestamp for this collection session
 TIMESTAMP=$(date +%Y%m%d_%H%M%S)
+ARCHIVE="$LOCAL_OUTPUT_DIR/ec2-logs-$TIMESTAMP.tar.gz"
+
+# Collection options
+SINCE=""
+UNTIL=""
+CONTAINERS=""
+NO_FILES=false
+EXTRACT=false
 
 echo -e "${BOLD}${BLUE}========================================${NC}"
 echo -e "${BOLD}${BLUE}   EC2 Docker Logs Collector${NC}"
@@ -51,27 +60,14 @@ log_message() {
     esac
 }
 
-# Function to execute SSH command with error handling
-execute_ssh_command() {
-    local description="$1"
-    local remote_command="$2"
-    local output_file="$3"
-    local step_num="$4"
-    local total_steps="$5"
-    
-    echo -e "${PURPLE}[$step_num/$total_steps]${NC} $description..."
-    
-    local full_ssh_command="ssh -i $SSH_KEY $SSH_USER@$SSH_HOST 'cd $REMOTE_DIR && $remote_command'"
-    
-    if eval "$full_ssh_command" > "$output_file" 2>&1; then
-        local file_size=$(wc -l < "$output_file" 2>/dev/null || echo "0")
-        log_message "SUCCESS" "$description completed (${file_size} lines saved)"
-        return 0
-    else
-        log_message "ERROR" "$description failed"
-        echo "Error details saved to: $output_file"
-        return 1
-    fi
+# Build the collector command line from the options
+collector_args() {
+    local args=""
+    [[ -n "$SINCE" ]] && args="$args --since $SINCE"
+    [[ -n "$UNTIL" ]] && args="$args --until $UNTIL"
+    [[ -n "$CONTAINERS" ]] && args="$args --containers $CONTAINERS"
+    [[ "$NO_FILES" == true ]] && args="$args --no-files"
+    echo "$args"
 }
 
 # Function to check prerequisites
@@ -109,150 +105,51 @@ check_prerequisites() {
         log_message "INFO" "Check if the SSH key has correct permissions (should be 600)"
         exit 1
     fi
-    
-    # Test Docker Compose on remote
-    log_message "INFO" "Testing Docker Compose on remote server..."
-    if ssh -i "$SSH_KEY" "$SSH_USER@$SSH_HOST" "cd $REMOTE_DIR && sudo docker-compose --version" >/dev/null 2>&1; then
-        log_message "SUCCESS" "Docker Compose found on remote server"
-    else
-        log_message "ERROR" "Docker Compose not accessible on remote server"
-        exit 1
-    fi
 }
 
 # Function to collect all logs
 collect_logs() {
-    log_message "INFO" "Starting log collection..."
+    log_message "INFO" "Streaming all container and service logs into $ARCHIVE..."
     echo ""
     
-    local failed_commands=0
-    local total_commands=8
-    
-    # 1. Complete Docker Compose logs
-    execute_ssh_command \
-        "Collecting complete Docker logs (last 2000 lines)" \
-        "sudo docker-compose logs --tail 2000" \
-        "$LOCAL_OUTPUT_DIR/complete-docker-logs-$TIMESTAMP.log" \
-        1 $total_commands || ((failed_commands++))
-    
-    # 2. Backend service logs
-    execute_ssh_command \
-        "Collecting backend service logs" \
-        "sudo docker-compose logs sms_backend" \
-        "$LOCAL_OUTPUT_DIR/backend-logs.log" \
-        2 $total_commands || ((failed_commands++))
-    
-    # 3. Frontend service logs
-    execute_ssh_command \
-        "Collecting frontend service logs" \
-        "sudo docker-compose logs sms_frontend" \
-        "$LOCAL_OUTPUT_DIR/frontend-logs.log" \
-        3 $total_commands || ((failed_commands++))
-    
-    # 4. Nginx proxy logs
-    execute_ssh_command \
-        "Collecting nginx proxy logs" \
-        "sudo docker-compose logs nginx" \
-        "$LOCAL_OUTPUT_DIR/nginx-logs.log" \
-        4 $total_commands || ((failed_commands++))
-    
-    # 5. Health check service logs
-    execute_ssh_command \
-        "Collecting health check service logs" \
-        "sudo docker-compose logs health_check" \
-        "$LOCAL_OUTPUT_DIR/health-check-logs.log" \
-        5 $total_commands || ((failed_commands++))
-    
-    # 6. Services status
-    execute_ssh_command \
-        "Collecting services status" \
-        "sudo docker-compose ps" \
-        "$LOCAL_OUTPUT_DIR/services-status.log" \
-        6 $total_commands || ((failed_commands++))
-    
-    # 7. Recent logs (last 4 hours)
-    execute_ssh_command \
-        "Collecting recent logs (last 4 hours)" \
-        "sudo docker-compose logs --since 4h" \
-        "$LOCAL_OUTPUT_DIR/recent-4h-logs.log" \
-        7 $total_commands || ((failed_commands++))
-    
-    # 8. Docker system info
-    execute_ssh_command \
-        "Collecting Docker system info and stats" \
-        "sudo docker system df && echo '=== CONTAINER STATS ===' && sudo docker stats --no-stream" \
-        "$LOCAL_OUTPUT_DIR/docker-system-info.log" \
-        8 $total_commands || ((failed_commands++))
-    
-    return $failed_commands
-}
-
-# Function to create summary
-create_summary() {
-    local failed_count="$1"
-    local summary_file="$LOCAL_OUTPUT_DIR/collection-summary-$TIMESTAMP.txt"
-    
-    cat > "$summary_file" << EOF
-EC2 Docker Logs Collection Summary
-==================================
-Collection Time: $(date)
-SSH Target: $SSH_USER@$SSH_HOST
-Remote Directory: $REMOTE_DIR
-Local Output: $LOCAL_OUTPUT_DIR
-
-Files Created:
-EOF
-    
-    echo "" >> "$summary_file"
-    ls -la "$LOCAL_OUTPUT_DIR"/*.log 2>/dev/null | while read line; do
-        echo "  $line" >> "$summary_file"
-    done 2>/dev/null || echo "  No log files found" >> "$summary_file"
-    
-    echo "" >> "$summary_file"
-    echo "Collection Status: $((8 - failed_count))/8 commands successful" >> "$summary_file"
-    
-    if [[ $failed_count -gt 0 ]]; then
-        echo "Failed Commands: $failed_count" >> "$summary_file"
+    # The collector reads every container log and /app/logs/*.log in parallel on the
+    # instance and writes one .tar.gz to stdout - nothing is copied to disk remotely
+    if ssh -i "$SSH_KEY" "$SSH_USER@$SSH_HOST" \
+        "sudo docker exec -w /app $COLLECTOR_CONTAINER python3 -m health_check.collector $(collector_args)" \
+        > "$ARCHIVE"; then
+        log_message "SUCCESS" "Archive saved: $ARCHIVE ($(du -h "$ARCHIVE" | cut -f1))"
+    else
+        log_message "ERROR" "Log collection failed"
+        return 1
     fi
     
-    log_message "INFO" "Summary saved to: $summary_file"
+    if [[ "$EXTRACT" == true ]]; then
+        tar -xzf "$ARCHIVE" -C "$LOCAL_OUTPUT_DIR"
+        log_message "SUCCESS" "Extracted into $LOCAL_OUTPUT_DIR/$(tar -tzf "$ARCHIVE" | head -1 | cut -d/ -f1)"
+    fi
 }
 
 # Function to show results
 show_results() {
-    local failed_count="$1"
-    
     echo ""
     echo -e "${BOLD}${GREEN}========================================${NC}"
     echo -e "${BOLD}${GREEN}   Collection Complete!${NC}"
     echo -e "${BOLD}${GREEN}========================================${NC}"
     echo ""
     
-    if [[ $failed_count -eq 0 ]]; then
-        log_message "SUCCESS" "All 8 log collections completed successfully!"
-    else
-        log_message "WARNING" "$((8 - failed_count))/8 log collections completed ($failed_count failed)"
-    fi
-    
-    echo ""
-    echo -e "${BOLD}${PURPLE}Files created in: ${CYAN}$(realpath $LOCAL_OUTPUT_DIR)${NC}"
+    echo -e "${BOLD}${PURPLE}Archive contents:${NC}"
     echo -e "${PURPLE}===========================================${NC}"
-    
-    if ls "$LOCAL_OUTPUT_DIR"/*.log >/dev/null 2>&1; then
-        ls -lah "$LOCAL_OUTPUT_DIR"/*.log | while read line; do
-            echo -e "${CYAN}  $line${NC}"
-        done
-    else
-        echo -e "${YELLOW}  No log files found${NC}"
-    fi
+    tar -tzvf "$ARCHIVE" | while read line; do
+        echo -e "${CYAN}  $line${NC}"
+    done
     
     echo ""
     echo -e "${BOLD}${PURPLE}Quick Commands:${NC}"
     echo -e "${PURPLE}===============${NC}"
-    echo -e "${YELLOW}  View complete logs:    ${NC}less $LOCAL_OUTPUT_DIR/complete-docker-logs-$TIMESTAMP.log"
-    echo -e "${YELLOW}  View backend logs:     ${NC}less $LOCAL_OUTPUT_DIR/backend-logs.log"
-    echo -e "${YELLOW}  View services status:  ${NC}cat $LOCAL_OUTPUT_DIR/services-status.log"
-    echo -e "${YELLOW}  View recent logs:      ${NC}less $LOCAL_OUTPUT_DIR/recent-4h-logs.log"
+    echo -e "${YELLOW}  Collection summary:    ${NC}tar -xzOf $ARCHIVE --wildcards '*/manifest.json'"
+    echo -e "${YELLOW}  View backend logs:     ${NC}tar -xzOf $ARCHIVE --wildcards '*/docker/sms_backend.log' | less"
+    echo -e "${YELLOW}  Container status:      ${NC}tar -xzOf $ARCHIVE --wildcards '*/containers.json'"
+    echo -e "${YELLOW}  Extract everything:    ${NC}tar -xzf $ARCHIVE -C $LOCAL_OUTPUT_DIR"
     echo ""
 }
 
@@ -270,48 +167,51 @@ trap cleanup SIGINT SIGTERM
 main() {
     check_prerequisites
     
-    if collect_logs; then
-        failed_count=$?
-    else
-        failed_count=$?
-    fi
-    
-    create_summary $failed_count
-    show_results $failed_count
-    
-    if [[ $failed_count -eq 0 ]]; then
-        exit 0
-    else
+    if ! collect_logs; then
         exit 1
     fi
+    
+    show_results
 }
 
-# Show usage if help requested
-if [[ "$1" == "--help" || "$1" == "-h" ]]; then
-    echo -e "${CYAN}Usage:${NC} $0"
+show_usage() {
+    echo -e "${CYAN}Usage:${NC} $0 [--since 4h] [--until TIME] [--containers a,b] [--no-files] [--extract]"
     echo ""
     echo -e "${CYAN}Description:${NC}"
-    echo "  Collects all Docker Compose logs from the SMS Seller Connect EC2 instance"
-    echo "  and saves them to the local ec2-debug-output directory."
+    echo "  Streams every Docker container log and the service logs in /app/logs from the"
+    echo "  SMS Seller Connect EC2 instance into one local .tar.gz, collected in parallel."
+    echo ""
+    echo -e "${CYAN}Options:${NC}"
+    echo "  --since TIME       Only logs from TIME on (e.g. 4h, 30m, 2025-01-07T03:00:00)"
+    echo "  --until TIME       Only logs up to TIME"
+    echo "  --containers LIST  Comma-separated containers (default: all)"
+    echo "  --no-files         Skip /app/logs/*.log"
+    echo "  --extract          Also extract the archive into the output directory"
     echo ""
     echo -e "${CYAN}Configuration:${NC}"
     echo "  SSH Key:    $SSH_KEY"
     echo "  SSH Target: $SSH_USER@$SSH_HOST"
-    echo "  Remote Dir: $REMOTE_DIR"
     echo "  Output Dir: $LOCAL_OUTPUT_DIR"
     echo ""
-    echo -e "${CYAN}Files Created:${NC}"
-    echo "  • complete-docker-logs-TIMESTAMP.log"
-    echo "  • backend-logs.log"
-    echo "  • frontend-logs.log"
-    echo "  • nginx-logs.log"
-    echo "  • health-check-logs.log"
-    echo "  • services-status.log"
-    echo "  • recent-4h-logs.log"
-    echo "  • docker-system-info.log"
-    echo "  • collection-summary-TIMESTAMP.txt"
-    exit 0
-fi
+    echo -e "${CYAN}Archive layout:${NC}"
+    echo "  • docker/<container>.log   stdout/stderr with timestamps"
+    echo "  • files/<name>.log         /app/logs/*.log"
+    echo "  • containers.json          container list and states"
+    echo "  • manifest.json            per-log size, duration and errors"
+}
+
+# Parse command line arguments
+while [[ $# -gt 0 ]]; do
+    case $1 in
+        --since) SINCE="$2"; shift 2 ;;
+        --until) UNTIL="$2"; shift 2 ;;
+        --containers) CONTAINERS="$2"; shift 2 ;;
+        --no-files) NO_FILES=true; shift ;;
+        --extract) EXTRACT=true; shift ;;
+        --help|-h) show_usage; exit 0 ;;
+        *) echo -e "${RED}Unknown option: $1${NC}"; show_usage; exit 1 ;;
+    esac
+done
 
 # Run main function
-main "$@" 
\ No newline at end of file
+main
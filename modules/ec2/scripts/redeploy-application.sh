@@ -106,13 +106,14 @@ download_fresh_config() {
     log_message "INFO" "Downloading health check scripts..."
     sudo aws s3 cp "s3://${S3_BUCKET}/scripts/health-check.sh" ./health-check.sh
     sudo aws s3 cp "s3://${S3_BUCKET}/scripts/health-check-server.py" ./health-check-server.py
+    sudo aws s3 cp "s3://${S3_BUCKET}/scripts/health_check/" ./scripts/health_check/ --recursive
     
     log_message "INFO" "Downloading maintenance script..."
     sudo aws s3 cp "s3://${S3_BUCKET}/scripts/maintenance.sh" ./maintenance.sh
     
     # Set proper permissions
     sudo chown -R ec2-user:ec2-user "$APP_DIR"
-    sudo chmod 644 docker-compose.yml nginx.conf .env.template health-check-server.py
+    sudo chmod 644 docker-compose.yml nginx.conf .env.template health-check-server.py scripts/health_check/*.py
     sudo chmod 755 health-check.sh maintenance.sh
     
     log_message "INFO" "✅ Fresh configuration downloaded from S3"
@@ -0,0 +1,83 @@
+"""
+Shared fixtures for tests that run the real health-check-server.py
+"""
+
+import http.client
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+from health_check.bench import SERVER_SCRIPT, StubService, _free_port
+from health_check.fakes import FakeDockerDaemon
+
+
+class ServerTestCase(unittest.TestCase):
+    """Starts health-check-server.py once per class against a stub backend and a FakeDockerDaemon"""
+
+    @classmethod
+    def server_env(cls):
+        """Extra HEALTH_CHECK_* settings; the stand-ins are already running when this is called"""
+        return {}
+
+    @classmethod
+    def setUpClass(cls):
+        workdir = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(workdir.cleanup)
+        cls.workdir = workdir.name
+        logs_dir = os.path.join(workdir.name, "logs")
+        os.makedirs(logs_dir)
+        cls.backend = StubService().start()
+        cls.addClassCleanup(cls.backend.stop)
+        cls.docker = FakeDockerDaemon(os.path.join(workdir.name, "docker.sock")).start()
+        cls.addClassCleanup(cls.docker.stop)
+
+        cls.port = _free_port()
+        env = {
+            **os.environ,
+            "HEALTH_CHECK_PORT": str(cls.port),
+            "HEALTH_CHECK_BIND": "127.0.0.1",
+            "HEALTH_CHECK_BACKEND_URL": f"{cls.backend.url}/health",
+            "HEALTH_CHECK_FRONTEND_URL": cls.backend.url,
+            "HEALTH_CHECK_DOCKER_SOCKET": cls.docker.socket_path,
+            "HEALTH_CHECK_LOGS_DIR": logs_dir,
+            "HEALTH_CHECK_HISTORY_FILE": "",
+            "HEALTH_CHECK_SNAPSHOT_FILE": "",
+            **cls.server_env()
+        }
+        server_log = open(os.path.join(workdir.name, "server.log"), "wb")
+        cls.addClassCleanup(server_log.close)
+        cls.server = subprocess.Popen([sys.executable, SERVER_SCRIPT], env=env, stdout=server_log, stderr=subprocess.STDOUT)
+        cls.addClassCleanup(cls.stop_server)
+
+        deadline = time.monotonic() + 20
+        while True:
+            try:
+                cls.get("/status")
+                return
+            except OSError:
+                if cls.server.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("health-check-server.py did not start")
+                time.sleep(0.05)
+
+    @classmethod
+    def stop_server(cls):
+        cls.server.terminate()
+        try:
+            cls.server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            cls.server.kill()
+
+    @classmethod
+    def get(cls, path, timeout=10):
+        """(status, decoded JSON body) of one GET on a fresh connection"""
+        conn = http.client.HTTPConnection("127.0.0.1", cls.port, timeout=timeout)
+        try:
+            conn.request("GET", path)
+            response = conn.getresponse()
+            return response.status, json.loads(response.read())
+        finally:
+            conn.close()
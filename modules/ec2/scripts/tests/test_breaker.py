@@ -0,0 +1,172 @@
+"""
+Circuit breaker states, backoff and half-open trials
+"""
+
+import threading
+import unittest
+from unittest import mock
+
+from health_check.breaker import CLOSED, HALF_OPEN, OPEN, BreakerRegistry, CircuitBreaker, CircuitOpenError
+
+
+class BreakerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        # A clock the test moves by hand
+        self.now = 1000.0
+        patcher = mock.patch("health_check.breaker.time.monotonic", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_breaker(self, **settings):
+        settings = {"failure_threshold": 3, "base_backoff": 10.0, "max_backoff": 80.0, "jitter": 0.0,
+                    "recovery_successes": 2, **settings}
+        return CircuitBreaker("backend", **settings)
+
+    def fail(self, breaker, times=1, error="HTTP 500"):
+        for _ in range(times):
+            self.assertTrue(breaker.allow())
+            breaker.record(False, error)
+
+    def reopen(self, breaker):
+        """Wait out the backoff and fail the half-open trial"""
+        self.now = breaker.open_until
+        self.fail(breaker)
+
+
+class CircuitBreakerTest(BreakerTestCase):
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = self.make_breaker()
+
+        self.fail(breaker, 2)
+        breaker.record(True)
+        self.fail(breaker, 2)
+        self.assertEqual(breaker.state, CLOSED)
+
+        self.fail(breaker)
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.allow())
+        self.assertTrue(breaker.is_open())
+        self.assertEqual(breaker.retry_in(), 10.0)
+        self.assertEqual(breaker.last_error, "HTTP 500")
+
+    def test_half_open_lets_one_trial_through(self):
+        breaker = self.make_breaker()
+        self.fail(breaker, 3)
+
+        self.now += 9.9
+        self.assertFalse(breaker.allow())
+        self.now += 0.1
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, HALF_OPEN)
+        # The trial is still running: everyone else is turned away
+        self.assertFalse(breaker.allow())
+        self.assertFalse(breaker.allow())
+
+        breaker.record(True)
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertTrue(breaker.allow())
+        breaker.record(True)
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertEqual(breaker.open_count, 0)
+        self.assertIsNone(breaker.retry_in())
+
+    def test_concurrent_callers_get_a_single_trial(self):
+        breaker = self.make_breaker()
+        self.fail(breaker, 3)
+        self.now = breaker.open_until
+        allowed = []
+        barrier = threading.Barrier(16)
+
+        def attempt():
+            barrier.wait()
+            allowed.append(breaker.allow())
+
+        threads = [threading.Thread(target=attempt) for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(allowed.count(True), 1)
+
+    def test_failed_trial_reopens_with_a_doubled_backoff(self):
+        breaker = self.make_breaker()
+        self.fail(breaker, 3)
+
+        backoffs = []
+        for _ in range(5):
+            self.reopen(breaker)
+            self.assertEqual(breaker.state, OPEN)
+            backoffs.append(breaker.open_until - self.now)
+
+        self.assertEqual(backoffs, [20.0, 40.0, 80.0, 80.0, 80.0])
+
+    def test_backoff_jitter_stays_in_bounds(self):
+        breaker = self.make_breaker(jitter=0.2)
+        self.fail(breaker, 3)
+        backoffs = [breaker.open_until - self.now]
+        for _ in range(200):
+            self.reopen(breaker)
+            backoffs.append(breaker.open_until - self.now)
+
+        self.assertTrue(8.0 <= backoffs[0] <= 12.0)
+        capped = backoffs[3:]
+        self.assertGreaterEqual(min(capped), 80.0 * 0.8)
+        self.assertLessEqual(max(capped), 80.0 * 1.2)
+        # Jitter actually spreads the retries
+        self.assertGreater(max(capped) - min(capped), 10.0)
+
+    def test_recovery_resets_the_backoff(self):
+        breaker = self.make_breaker(recovery_successes=1)
+        self.fail(breaker, 3)
+        self.reopen(breaker)
+        self.now = breaker.open_until
+        self.assertTrue(breaker.allow())
+        breaker.record(True)
+        self.assertEqual(breaker.state, CLOSED)
+
+        self.fail(breaker, 3)
+
+        self.assertEqual(breaker.open_until - self.now, 10.0)
+
+    def test_call_raises_while_open(self):
+        breaker = self.make_breaker(failure_threshold=1)
+        calls = []
+
+        def probe():
+            calls.append(1)
+            raise OSError("connection refused")
+
+        with self.assertRaises(OSError):
+            breaker.call(probe)
+        with self.assertRaises(CircuitOpenError) as caught:
+            breaker.call(probe)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(
+            str(caught.exception),
+            "Circuit open for backend after 1 consecutive failures, next probe in 10s (last error: connection refused)"
+        )
+
+
+class BreakerRegistryTest(BreakerTestCase):
+
+    def test_probes_sooner_while_a_breaker_recovers(self):
+        registry = BreakerRegistry(failure_threshold=1, base_backoff=10.0, jitter=0.0, recovery_interval=2.0)
+        self.assertIs(registry.get("backend"), registry.get("backend"))
+        self.assertEqual(registry.next_probe_delay(30), 30)
+
+        breaker = registry.get("backend")
+        self.fail(breaker)
+        self.assertEqual(registry.next_probe_delay(30), 10.0)
+
+        self.now = breaker.open_until
+        breaker.allow()
+        self.assertEqual(registry.next_probe_delay(30), 2.0)
+        self.assertEqual(registry.describe()["backend"]["state"], HALF_OPEN)
+
+
+if __name__ == "__main__":
+    unittest.main()
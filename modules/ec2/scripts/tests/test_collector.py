@@ -0,0 +1,110 @@
+"""
+Log collector: time bounds and archives built against FakeDockerDaemon
+"""
+
+import gzip
+import http.client
+import io
+import json
+import os
+import tarfile
+import tempfile
+import unittest
+
+from health_check.collector import build_sources, parse_duration, parse_time_bound, write_archive
+from health_check.docker_api import DockerClient
+from health_check.fakes import FakeDockerDaemon
+from helpers import ServerTestCase
+
+NOW = 1_750_000_000
+
+
+class ParseTimeBoundTest(unittest.TestCase):
+
+    def test_durations_docker_accepts(self):
+        for value, seconds in (("4h", 14400), ("30m", 1800), ("2h30m", 9000), ("1h30m15s", 5415), ("1.5h", 5400),
+                               ("500ms", 0.5), ("90s", 90), ("2d", 172800), (" 45m ", 2700), (".5m", 30)):
+            with self.subTest(value=value):
+                self.assertAlmostEqual(parse_duration(value), seconds)
+                self.assertAlmostEqual(parse_time_bound(value, now=NOW), NOW - seconds)
+
+    def test_absolute_times(self):
+        self.assertEqual(parse_time_bound(str(NOW), now=0), NOW)
+        self.assertEqual(parse_time_bound("2025-06-15T15:06:40Z", now=0), NOW)
+
+    def test_invalid(self):
+        for value in ("", "h", "4", "4x", "2h30", "h30m", "2h 30m", "-4h", "4h-"):
+            with self.subTest(value=value):
+                self.assertIsNone(parse_duration(value))
+        for value in ("h", "2h30", "4x"):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                parse_time_bound(value)
+
+
+class CollectorTest(unittest.TestCase):
+
+    def setUp(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.logs_dir = os.path.join(workdir.name, "logs")
+        os.mkdir(self.logs_dir)
+        with open(os.path.join(self.logs_dir, "ai_processor.log"), "wb") as f:
+            f.write(b"2025-06-15 15:06:40,000 - INFO - started\n")
+        daemon = FakeDockerDaemon(os.path.join(workdir.name, "docker.sock"), containers={"sms_backend": "running"})
+        daemon.start()
+        self.addCleanup(daemon.stop)
+        self.client = DockerClient(daemon.socket_path, timeout=2)
+        self.addCleanup(self.client.close)
+
+    def collect(self, **kwargs):
+        sources, listing = build_sources(self.client, self.logs_dir, **kwargs)
+        out = io.BytesIO()
+        manifest = write_archive(out, sources, {"containers.json": json.dumps(listing).encode()}, prefix="logs")
+        with tarfile.open(fileobj=gzip.GzipFile(fileobj=io.BytesIO(out.getvalue()))) as tar:
+            members = {member.name: tar.extractfile(member).read() for member in tar.getmembers()}
+        return members, manifest
+
+    def test_archive(self):
+        members, manifest = self.collect()
+
+        self.assertEqual(sorted(members), [
+            "logs/containers.json", "logs/docker/sms_backend.log", "logs/files/ai_processor.log", "logs/manifest.json"
+        ])
+        self.assertEqual(members["logs/docker/sms_backend.log"].count(b"\n"), 5)
+        self.assertEqual(members["logs/files/ai_processor.log"], b"2025-06-15 15:06:40,000 - INFO - started\n")
+        self.assertFalse(any("error" in entry for entry in manifest["sources"].values()))
+
+    def test_tail_keeps_the_last_lines_of_each_docker_log(self):
+        members, _ = self.collect(tail=2, files=False)
+
+        lines = members["logs/docker/sms_backend.log"].splitlines()
+        self.assertEqual([line.split(b" ", 1)[1] for line in lines], [b"sms_backend INFO line 1", b"sms_backend INFO line 0"])
+        self.assertNotIn("logs/files/ai_processor.log", members)
+
+
+class LogsArchiveEndpointTest(ServerTestCase):
+    """/logs-archive on a running health-check-server.py"""
+
+    def test_compound_since_and_tail(self):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=10)
+        self.addCleanup(conn.close)
+        conn.request("GET", "/logs-archive?since=2h30m&tail=1&files=0")
+        response = conn.getresponse()
+
+        self.assertEqual(response.status, 200)
+        with tarfile.open(fileobj=gzip.GzipFile(fileobj=io.BytesIO(response.read()))) as tar:
+            logs = [tar.extractfile(member).read() for member in tar.getmembers() if "/docker/" in member.name]
+        self.assertTrue(logs)
+        self.assertTrue(all(log.count(b"\n") == 1 for log in logs))
+
+    def test_invalid_parameters(self):
+        for query, error in (("since=2h30", "since/until"), ("tail=-1", "tail"), ("tail=x", "tail")):
+            with self.subTest(query=query):
+                status, data = self.get(f"/logs-archive?{query}")
+
+                self.assertEqual(status, 400)
+                self.assertTrue(data["error"].startswith(error))
+
+
+if __name__ == "__main__":
+    unittest.main()
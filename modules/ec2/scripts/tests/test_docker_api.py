@@ -0,0 +1,138 @@
+"""
+DockerClient against FakeDockerDaemon
+"""
+
+import os
+import socket
+import tempfile
+import unittest
+
+from health_check.docker_api import DockerAPIError, DockerClient, demux_stream
+from health_check.fakes import FakeDockerDaemon, frame
+from health_check.services import collect_background_status, parse_status_output
+
+
+class DockerClientTest(unittest.TestCase):
+
+    def setUp(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.socket_path = os.path.join(workdir.name, "docker.sock")
+
+    def start_daemon(self, **kwargs):
+        daemon = FakeDockerDaemon(self.socket_path, **kwargs).start()
+        self.addCleanup(daemon.stop)
+        return daemon
+
+    def make_client(self, socket_path=None):
+        client = DockerClient(socket_path or self.socket_path, timeout=2)
+        self.addCleanup(client.close)
+        return client
+
+    def test_container_states(self):
+        self.start_daemon(containers={"sms_backend": "running", "sms_frontend": "exited"})
+
+        states = self.make_client().container_states()
+
+        self.assertEqual(states, {"sms_backend": "running", "sms_frontend": "exited"})
+
+    def test_exec_run_demultiplexes_stdout_and_stderr(self):
+        calls = []
+
+        def exec_handler(container, cmd):
+            calls.append((container, cmd))
+            return 3, "out line\n", "err line\n"
+
+        self.start_daemon(exec_handler=exec_handler)
+
+        result = self.make_client().exec_run("sms_backend", ["sh", "-c", "true"])
+
+        self.assertEqual(calls, [("sms_backend", ["sh", "-c", "true"])])
+        self.assertEqual(result.exit_code, 3)
+        self.assertEqual(result.stdout, "out line\n")
+        self.assertEqual(result.stderr, "err line\n")
+
+    def test_exec_run_in_a_stopped_container(self):
+        self.start_daemon(containers={"sms_backend": "exited"})
+
+        with self.assertRaises(DockerAPIError) as caught:
+            self.make_client().exec_run("sms_backend", ["true"])
+
+        self.assertEqual(caught.exception.status, 409)
+        self.assertIn("is not running", str(caught.exception))
+
+    def test_collect_background_status(self):
+        self.start_daemon(background={
+            "scheduled-messages": {"PROCESS": "running", "PID": "101", "RECENT": "a|b"},
+            "ai-processor": {"PROCESS": "stopped"}
+        })
+
+        statuses = collect_background_status(self.make_client())
+
+        self.assertEqual(statuses["scheduled-messages"]["PROCESS"], "running")
+        self.assertEqual(statuses["scheduled-messages"]["PID"], "101")
+        self.assertEqual(statuses["scheduled-messages"]["RECENT"], "a|b")
+        self.assertEqual(statuses["ai-processor"]["PROCESS"], "stopped")
+
+    def test_retries_once_on_a_stale_pooled_socket(self):
+        daemon = self.start_daemon()
+        client = self.make_client()
+        self.assertTrue(client.ping())
+
+        # The daemon closed the idle keep-alive connection while it sat in the pool
+        conn = client._checkout(1.0)
+        conn.sock.shutdown(socket.SHUT_RDWR)
+        client._checkin(conn)
+
+        self.assertEqual(client.container_states()["sms_backend"], "running")
+        self.assertEqual(daemon.connections, 2)
+
+    def test_missing_socket(self):
+        client = self.make_client(os.path.join(os.path.dirname(self.socket_path), "missing.sock"))
+
+        with self.assertRaises(DockerAPIError) as caught:
+            client.container_states()
+
+        self.assertIn("GET /containers/json", str(caught.exception))
+        self.assertIsInstance(caught.exception.__cause__, FileNotFoundError)
+        self.assertIsNone(caught.exception.status)
+
+
+class ParseTest(unittest.TestCase):
+
+    def test_demux_stream(self):
+        data = frame(1, b"out 1\n") + frame(2, b"err\n") + frame(1, b"out 2\n")
+
+        self.assertEqual(demux_stream(data), (b"out 1\nout 2\n", b"err\n"))
+
+    def test_demux_stream_drops_a_truncated_header(self):
+        self.assertEqual(demux_stream(frame(1, b"out\n") + b"\x01\x00"), (b"out\n", b""))
+
+    def test_parse_status_output(self):
+        output = (
+            "sh: cannot set terminal process group\n"
+            "SERVICE:scheduled-messages|PROCESS:running|PID:101|LOG_EXISTS:true|LOG_SIZE:2048"
+            "|LOG_MODIFIED:2026-10-17 03:00:00|RECENT:03:00:01 INFO sent|03:00:02 ERROR failed: timeout\n"
+            "SERVICE:ai-processor|PROCESS:not_started|PID:|LOG_EXISTS:false|LOG_SIZE:0|LOG_MODIFIED:unknown|RECENT:\n"
+        )
+
+        statuses = parse_status_output(output)
+
+        self.assertEqual(list(statuses), ["scheduled-messages", "ai-processor"])
+        self.assertEqual(statuses["scheduled-messages"], {
+            "PROCESS": "running",
+            "PID": "101",
+            "LOG_EXISTS": "true",
+            "LOG_SIZE": "2048",
+            "LOG_MODIFIED": "2026-10-17 03:00:00",
+            "RECENT": "03:00:01 INFO sent|03:00:02 ERROR failed: timeout"
+        })
+        self.assertEqual(statuses["ai-processor"]["PID"], "")
+        self.assertEqual(statuses["ai-processor"]["RECENT"], "")
+
+    def test_parse_status_output_without_services(self):
+        self.assertEqual(parse_status_output(""), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
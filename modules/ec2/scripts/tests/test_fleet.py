@@ -0,0 +1,147 @@
+"""
+Fleet aggregation against fake peers, and /fleet on the real server
+"""
+
+import threading
+import time
+import unittest
+
+from health_check.fakes import FakePeer
+from health_check.fleet import FleetAggregator
+from helpers import ServerTestCase
+
+
+class FleetAggregatorTest(unittest.TestCase):
+
+    def start_peer(self, **kwargs):
+        peer = FakePeer(**kwargs).start()
+        self.addCleanup(peer.stop)
+        return peer
+
+    def make_aggregator(self, peers, timeout=2.0, deadline=3.0, ttl=0):
+        aggregator = FleetAggregator(peers.items(), timeout=timeout, deadline=deadline, ttl=ttl)
+        self.addCleanup(aggregator.close)
+        return aggregator
+
+    def test_slow_peer_is_cut_off_at_its_deadline(self):
+        fast = self.start_peer()
+        slow = self.start_peer(latency=2.0)
+        aggregator = self.make_aggregator({"fast": fast.url, "slow": slow.url}, timeout=5, deadline=0.4)
+
+        started = time.monotonic()
+        view = aggregator.view()
+        elapsed = time.monotonic() - started
+
+        self.assertLess(elapsed, 1.5)
+        self.assertEqual(view["status"], "degraded")
+        self.assertTrue(view["instances"]["fast"]["ok"])
+        self.assertEqual(view["instances"]["fast"]["containers"]["sms_backend"], "running")
+        self.assertEqual(view["instances"]["slow"]["status"], "unreachable")
+        self.assertIn("/health-check", view["instances"]["slow"]["error"])
+        self.assertEqual(view["summary"]["unreachable"], 1)
+
+    def test_unchanged_services_are_revalidated_with_a_304(self):
+        peer = self.start_peer()
+        aggregator = self.make_aggregator({"web-a": peer.url})
+        aggregator.collect()
+        state = aggregator.peers()[0]
+        health = state.answers["/health-check"]
+        services = state.answers["/services"]
+
+        aggregator.collect()
+
+        # /services came back as a 304 and kept its body; /health-check is always fetched in full
+        self.assertIs(state.answers["/services"], services)
+        self.assertGreater(services.validated_at, services.received_at)
+        self.assertIsNot(state.answers["/health-check"], health)
+        self.assertEqual(peer.requests, {"/health-check": 2, "/services": 2})
+        self.assertEqual(peer.connections, 2)
+
+        peer.containers["sms_frontend"] = "exited"
+        view = aggregator.view()
+
+        self.assertIsNot(state.answers["/services"], services)
+        self.assertEqual(view["containers"]["sms_frontend"], {"running": 0, "instances": {"web-a": "exited"}})
+
+    def test_unreachable_peer_keeps_its_last_answer(self):
+        peer = self.start_peer(status="unhealthy")
+        aggregator = self.make_aggregator({"web-a": peer.url}, timeout=0.5, deadline=1.0)
+        aggregator.collect()
+        peer.stop()
+        time.sleep(0.05)
+
+        entry = aggregator.view()["instances"]["web-a"]
+
+        self.assertEqual(entry["status"], "unreachable")
+        self.assertEqual(entry["last_status"], "unhealthy")
+        self.assertFalse(entry["ok"])
+        self.assertIsNotNone(entry["error"])
+        self.assertGreaterEqual(entry["age_seconds"], 0.05)
+        self.assertEqual(entry["containers"]["sms_backend"], "running")
+        self.assertEqual(entry["checked_at"], peer.checked_at)
+
+    def test_view_is_cached_and_shared(self):
+        peer = self.start_peer(latency=0.1)
+        aggregator = self.make_aggregator({"web-a": peer.url}, ttl=0.5)
+        views = []
+        threads = [threading.Thread(target=lambda: views.append(aggregator.view(timeout=5))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(views), 8)
+        self.assertEqual(peer.requests["/health-check"], 1)
+        aggregator.view()
+        self.assertEqual(peer.requests["/health-check"], 1)
+
+        time.sleep(0.6)
+        aggregator.view()
+        self.assertEqual(peer.requests["/health-check"], 2)
+
+    def test_instance(self):
+        peer = self.start_peer()
+        aggregator = self.make_aggregator({"web-a": peer.url})
+
+        detail = aggregator.instance("web-a")
+
+        self.assertEqual(detail["status"], "healthy")
+        self.assertEqual(detail["health"]["checked_at"], peer.checked_at)
+        self.assertEqual(detail["services"]["background_services"]["ai-processor"], {"status": "running"})
+        self.assertIsNone(aggregator.instance("web-b"))
+
+
+class FleetEndpointTest(ServerTestCase):
+    """/fleet routes on a running health-check-server.py"""
+
+    @classmethod
+    def server_env(cls):
+        peer = FakePeer().start()
+        cls.addClassCleanup(peer.stop)
+        return {"HEALTH_CHECK_FLEET_PEERS": f"web-a={peer.url}"}
+
+    def test_fleet(self):
+        status, data = self.get("/fleet")
+
+        self.assertEqual(status, 200)
+        self.assertEqual(list(data["instances"]), ["web-a"])
+
+    def test_instance(self):
+        for path in ("/fleet/web-a", "/fleet?instance=web-a"):
+            with self.subTest(path=path):
+                status, data = self.get(path)
+
+                self.assertEqual(status, 200)
+                self.assertEqual(data["status"], "healthy")
+                self.assertIn("health", data)
+
+    def test_unknown_instance(self):
+        status, data = self.get("/fleet/web-b")
+
+        self.assertEqual(status, 404)
+        self.assertEqual(data["error"], "Unknown instance: web-b")
+        self.assertEqual(data["instances"], ["web-a"])
+
+
+if __name__ == "__main__":
+    unittest.main()
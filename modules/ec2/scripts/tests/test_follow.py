@@ -0,0 +1,207 @@
+"""
+Shared log tailers: resume, rotation, truncation and the subscriber cap
+"""
+
+import os
+import socket
+import tempfile
+import time
+import unittest
+
+from health_check.follow import FollowHub, LogTailer, Subscriber
+from helpers import ServerTestCase
+
+
+def read_available(sock, timeout=0.5):
+    """Everything the tailer has written to the client end so far"""
+    sock.settimeout(timeout)
+    data = b""
+    try:
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+            sock.settimeout(0.05)
+    except socket.timeout:
+        pass
+    return data
+
+
+class LogTailerTest(unittest.TestCase):
+
+    def setUp(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.path = os.path.join(workdir.name, "service.log")
+        self.write(b"one\ntwo\n", "wb")
+        # Driven tick by tick from the test instead of its own thread
+        self.tailer = LogTailer(self.path, poll_interval=1, heartbeat_interval=60, idle_timeout=60)
+        self.addCleanup(lambda: self.tailer._file and self.tailer._file.close())
+
+    def write(self, data, mode="ab"):
+        with open(self.path, mode) as f:
+            f.write(data)
+
+    def subscribe(self, fmt="sse", offset=None):
+        server_end, client_end = socket.socketpair()
+        self.addCleanup(client_end.close)
+        subscriber = Subscriber(server_end, fmt, offset)
+        self.addCleanup(subscriber.close)
+        self.tailer.subscribe(subscriber)
+        return subscriber, client_end
+
+    def test_live_subscriber_gets_only_appended_lines(self):
+        self.tailer.tick()
+        _, client = self.subscribe()
+
+        self.write(b"three\nfour\n")
+        self.tailer.tick()
+
+        self.assertEqual(read_available(client), b"id: 19\nevent: log\ndata: three\ndata: four\n\n")
+
+    def test_resume_from_an_offset(self):
+        self.tailer.tick()
+        _, client = self.subscribe(offset=4)
+
+        self.tailer.tick()
+
+        # The SSE id is the offset to resume from, so Last-Event-ID picks up right after it
+        self.assertEqual(read_available(client), b"id: 8\nevent: log\ndata: two\n\n")
+
+    def test_partial_line_waits_for_its_newline(self):
+        self.tailer.tick()
+        _, client = self.subscribe(fmt="raw")
+
+        self.write(b"thr")
+        self.tailer.tick()
+        self.assertEqual(read_available(client, timeout=0.1), b"")
+
+        self.write(b"ee\n")
+        self.tailer.tick()
+        self.assertEqual(read_available(client), b"6\r\nthree\n\r\n")
+
+    def test_rotation(self):
+        self.tailer.tick()
+        _, client = self.subscribe()
+
+        # Lines written just before the rename are still read from the old file
+        self.write(b"last\n")
+        os.rename(self.path, self.path + ".1")
+        self.write(b"new\n", "wb")
+        self.tailer.tick()
+
+        self.assertEqual(read_available(client), (
+            b"id: 13\nevent: log\ndata: last\n\n"
+            b'event: rotated\ndata: {"offset": 0}\n\n'
+            b"id: 4\nevent: log\ndata: new\n\n"
+        ))
+
+    def test_truncation(self):
+        self.tailer.tick()
+        _, client = self.subscribe()
+
+        self.write(b"x\n", "wb")
+        self.tailer.tick()
+
+        self.assertEqual(read_available(client), b'event: truncated\ndata: {"offset": 0}\n\nid: 2\nevent: log\ndata: x\n\n')
+
+    def test_offset_past_the_end_restarts_from_the_beginning(self):
+        self.tailer.tick()
+        # e.g. a Last-Event-ID from before the log was rotated
+        _, client = self.subscribe(offset=1000)
+
+        self.tailer.tick()
+
+        self.assertEqual(read_available(client), b'event: reset\ndata: {"offset": 0}\n\nid: 8\nevent: log\ndata: one\ndata: two\n\n')
+
+    def test_disconnected_subscriber_is_dropped(self):
+        self.tailer.tick()
+        _, client = self.subscribe()
+        client.close()
+
+        self.write(b"three\n")
+        self.tailer.tick()
+        self.tailer.tick()
+
+        self.assertEqual(self.tailer.subscriber_count, 0)
+
+
+class FollowHubTest(unittest.TestCase):
+
+    def test_subscriber_cap(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        paths = [os.path.join(workdir.name, f"{name}.log") for name in ("a", "b")]
+        for path in paths:
+            open(path, "wb").close()
+        hub = FollowHub(poll_interval=0.05, heartbeat_interval=60, idle_timeout=0.1, max_subscribers=2)
+
+        accepted = []
+        for path in (paths[0], paths[1], paths[0]):
+            server_end, client_end = socket.socketpair()
+            self.addCleanup(client_end.close)
+            self.addCleanup(server_end.close)
+            accepted.append(hub.subscribe(path, server_end, "sse", None))
+
+        self.assertEqual(accepted, [True, True, False])
+        self.assertEqual(hub.subscriber_count, 2)
+        # One shared tailer per file
+        self.assertEqual(sorted(hub.tailers()), paths)
+        for tailer in hub.tailers().values():
+            tailer.stop()
+            tailer.join(timeout=2)
+
+
+class FollowEndpointTest(ServerTestCase):
+    """/logs/<service>/follow on a running health-check-server.py"""
+
+    def setUp(self):
+        with open(os.path.join(self.workdir, "logs", "worker.log"), "wb") as f:
+            f.write(b"one\ntwo\nthree\n")
+
+    def follow(self, path, headers=None):
+        sock = socket.create_connection(("127.0.0.1", self.port), timeout=5)
+        self.addCleanup(sock.close)
+        request = f"GET {path} HTTP/1.1\r\nHost: test\r\n"
+        for name, value in (headers or {}).items():
+            request += f"{name}: {value}\r\n"
+        sock.sendall((request + "\r\n").encode())
+        data = b""
+        deadline = time.monotonic() + 5
+        while b"\r\n\r\n" not in data and time.monotonic() < deadline:
+            data += sock.recv(65536)
+        head, _, body = data.partition(b"\r\n\r\n")
+        return head.split(b"\r\n")[0], body, sock
+
+    def test_resume_with_last_event_id(self):
+        status, body, sock = self.follow("/logs/worker/follow", {"Last-Event-ID": "4"})
+
+        self.assertEqual(status, b"HTTP/1.1 200 OK")
+        body += read_available(sock, timeout=2)
+        self.assertEqual(body, b"id: 14\nevent: log\ndata: two\ndata: three\n\n")
+
+    def test_resume_from_the_last_lines(self):
+        _, body, sock = self.follow("/logs/worker/follow?tail=1")
+
+        body += read_available(sock, timeout=2)
+        self.assertEqual(body, b"id: 14\nevent: log\ndata: three\n\n")
+
+    def test_offset_and_tail_must_be_non_negative_integers(self):
+        for query in ("offset=-1", "offset=x", "tail=-1", "tail=x", "offset=0&tail=-1"):
+            with self.subTest(query=query):
+                status, _ = self.get(f"/logs/worker/follow?{query}")
+
+                self.assertEqual(status, 400)
+
+    def test_tail_is_validated_like_logs(self):
+        for path in ("/logs/worker?tail=-1", "/logs/worker/follow?tail=-1"):
+            with self.subTest(path=path):
+                status, data = self.get(path)
+
+                self.assertEqual(status, 400)
+                self.assertIn("non-negative integer", data["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
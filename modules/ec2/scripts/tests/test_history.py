@@ -0,0 +1,123 @@
+"""
+HealthHistory rings and windowed queries
+"""
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from health_check.history import HealthHistory
+
+RESOLUTION = 5
+RETENTION = 3600
+# A slot boundary, so the expected buckets are easy to count
+NOW = 1_800_000_000
+
+
+class HealthHistoryTest(unittest.TestCase):
+
+    def make_history(self, slots=RETENTION // RESOLUTION):
+        """A history whose last `slots` slots alternate up, up, down with latencies 10, 20, 30"""
+        history = HealthHistory(RESOLUTION, RETENTION)
+        for slot in range(slots):
+            at = NOW - (slots - slot) * RESOLUTION
+            history.record("backend", slot % 3 != 2, 10.0 * (slot % 3 + 1), at)
+        return history
+
+    def test_buckets_match_the_recorded_slots(self):
+        history = self.make_history()
+
+        result = history.query(["backend"], NOW - 300, NOW, step=60)
+
+        points = result["probes"]["backend"]["points"]
+        self.assertEqual(result["step_seconds"], 60)
+        self.assertEqual(len(points), 5)
+        # 12 slots per bucket, every third one down
+        for point in points:
+            self.assertEqual(point["samples"], 12)
+            self.assertEqual(point["down_ratio"], round(4 / 12, 4))
+            self.assertEqual(point["latency_ms"], {"min": 10.0, "max": 30.0, "avg": 20.0})
+        self.assertEqual(result["probes"]["backend"]["summary"]["samples"], 60)
+
+    def test_window_is_cut_to_the_retained_slots(self):
+        history = self.make_history(slots=100)
+
+        result = history.query(["backend"], NOW - 10 * RETENTION, NOW + 10 * RETENTION)
+
+        summary = result["probes"]["backend"]["summary"]
+        self.assertEqual(summary["samples"], 100)
+        self.assertEqual(sum(point["samples"] for point in result["probes"]["backend"]["points"]), 100)
+
+    def test_extreme_window_is_bounded_by_retention(self):
+        history = self.make_history()
+
+        started = time.monotonic()
+        result = history.query(["backend"], -1e12, 1e12, max_points=1000)
+        elapsed = time.monotonic() - started
+
+        self.assertLess(elapsed, 0.5)
+        self.assertLessEqual(len(result["probes"]["backend"]["points"]), 1001)
+        self.assertEqual(result["probes"]["backend"]["summary"]["samples"], RETENTION // RESOLUTION)
+
+    def test_extreme_step_is_capped_at_the_retention(self):
+        history = self.make_history()
+
+        started = time.monotonic()
+        result = history.query(["backend"], NOW - 600, NOW, step=1e12)
+        elapsed = time.monotonic() - started
+
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual(result["step_seconds"], RETENTION)
+        self.assertEqual(sum(point["samples"] for point in result["probes"]["backend"]["points"]), 120)
+
+    def test_recording_is_not_held_up_by_wide_queries(self):
+        history = self.make_history()
+        querying = threading.Thread(target=lambda: [history.query(["backend"], -1e12, 1e12) for _ in range(20)])
+        querying.start()
+        self.addCleanup(querying.join)
+
+        slowest = 0.0
+        while querying.is_alive():
+            started = time.monotonic()
+            history.record("backend", True, 5.0, NOW)
+            slowest = max(slowest, time.monotonic() - started)
+
+        self.assertLess(slowest, 0.1)
+
+    def test_non_finite_bounds(self):
+        history = self.make_history(slots=10)
+
+        for since, until, step in ((float("nan"), NOW, None), (NOW - 60, float("inf"), None), (NOW - 60, NOW, float("inf"))):
+            with self.subTest(since=since, until=until, step=step):
+                with self.assertRaises(ValueError):
+                    history.query(["backend"], since, until, step)
+
+    def test_empty_history(self):
+        history = HealthHistory(RESOLUTION, RETENTION)
+
+        result = history.query(["backend"], -1e12, 1e12)
+
+        self.assertEqual(result["probes"]["backend"], {
+            "summary": {"samples": 0, "up_ratio": None, "down_ratio": None, "latency_ms": None},
+            "points": []
+        })
+
+    def test_save_and_load(self):
+        history = self.make_history(slots=50)
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, "history.bin")
+            history.save(path)
+            restored = HealthHistory(RESOLUTION, RETENTION)
+
+            self.assertTrue(restored.load(path))
+
+        self.assertEqual(
+            restored.query(["backend"], NOW - RETENTION, NOW, step=60),
+            history.query(["backend"], NOW - RETENTION, NOW, step=60)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+"""
+Sparse log index against a brute-force scan, persistence and rebuilds
+"""
+
+import os
+import random
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from health_check import log_index
+from health_check.log_index import LogIndex, LogIndexRegistry, iter_lines, parse_line_timestamp
+
+START = 1_750_000_000
+STRIDE = 4096
+
+
+def log_line(epoch, message):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(epoch)).encode() + b",000 - INFO - " + message + b"\n"
+
+
+def write_log(path, seconds, seed=7, mode="wb", start=START):
+    """A log with a few lines per second and the occasional multi-line traceback"""
+    rng = random.Random(seed)
+    with open(path, mode) as f:
+        for second in range(seconds):
+            for number in range(rng.randint(1, 4)):
+                f.write(log_line(start + second, b"message %d/%d %s" % (second, number, b"x" * rng.randint(0, 120))))
+            if rng.random() < 0.05:
+                f.write(b"Traceback (most recent call last):\n" + b'  File "runner.py", line 1, in run\n' * rng.randint(1, 40))
+
+
+def brute_force(path, since=None, until=None, grep=None):
+    """Every matching line by reading the whole file, continuation lines inheriting the last timestamp"""
+    matches = []
+    timestamp = None
+    with open(path, "rb") as f:
+        for _, line in iter_lines(f, 0, os.fstat(f.fileno()).st_size):
+            timestamp = parse_line_timestamp(line) or timestamp
+            if timestamp is None or (since is not None and timestamp < since) or (until is not None and timestamp > until):
+                continue
+            if grep is None or grep.encode() in line:
+                matches.append(line)
+    return matches
+
+
+class LogIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.workdir = workdir.name
+        self.path = os.path.join(workdir.name, "service.log")
+
+    def make_index(self):
+        index = LogIndex(self.path, self.path + ".idx", STRIDE)
+        index.update()
+        return index
+
+    def query(self, index, since=None, until=None, grep=None):
+        with open(self.path, "rb") as f:
+            return list(index.query(f, os.fstat(f.fileno()).st_size, since, until, grep))
+
+    def assert_matches_brute_force(self, index, windows):
+        for since, until, grep in windows:
+            with self.subTest(since=since, until=until, grep=grep):
+                self.assertEqual(self.query(index, since, until, grep), brute_force(self.path, since, until, grep))
+
+    def test_queries_match_a_brute_force_scan(self):
+        write_log(self.path, 3000)
+        index = self.make_index()
+        rng = random.Random(1)
+        windows = [(None, None, None), (START - 100, START + 10, None), (START + 2990, START + 4000, None),
+                   (START + 500, START + 500, None), (START + 100, START + 900, "message 42")]
+        for _ in range(40):
+            since = START + rng.randint(-50, 3050)
+            windows.append((since, since + rng.randint(0, 400), None))
+
+        self.assertGreater(len(index.offsets), 20)
+        self.assert_matches_brute_force(index, windows)
+
+    def test_scan_range_is_bounded(self):
+        write_log(self.path, 3000)
+        index = self.make_index()
+
+        start, end = index.byte_range(START + 1500, START + 1510, os.path.getsize(self.path))
+
+        self.assertLess(end - start, 3 * STRIDE + 4096)
+
+    def test_persisted_index_is_reused(self):
+        write_log(self.path, 1000)
+        index = self.make_index()
+        index.save()
+
+        restored = LogIndex(self.path, self.path + ".idx", STRIDE)
+        self.assertTrue(restored.load())
+        self.assertEqual(restored.offsets, index.offsets)
+        self.assertEqual(restored.timestamps, index.timestamps)
+
+        # Only the appended bytes are sampled after a restart
+        size = os.path.getsize(self.path)
+        write_log(self.path, 500, seed=8, mode="ab", start=START + 1000)
+        with mock.patch.object(restored, "_sample", wraps=restored._sample) as sample:
+            restored.update()
+        self.assertTrue(sample.called)
+        self.assertGreaterEqual(min(call.args[1] for call in sample.call_args_list), size)
+        self.assert_matches_brute_force(restored, [(START + 900, START + 1100, None), (START + 1400, None, None)])
+
+    def test_truncation_rebuilds(self):
+        write_log(self.path, 1000)
+        index = self.make_index()
+
+        write_log(self.path, 100, seed=9, start=START + 5000)
+        index.update()
+
+        self.assertEqual(index.timestamps[0], START + 5000)
+        self.assert_matches_brute_force(index, [(START, START + 6000, None), (START + 5050, START + 5060, None)])
+
+    def test_rotation_rebuilds(self):
+        write_log(self.path, 1000)
+        index = self.make_index()
+
+        os.rename(self.path, self.path + ".1")
+        # Larger than before, so only the new inode gives the rotation away
+        write_log(self.path, 1500, seed=10, start=START + 5000)
+        index.update()
+
+        self.assertEqual(index.timestamps[0], START + 5000)
+        self.assert_matches_brute_force(index, [(START, START + 1000, None), (START + 5100, START + 5200, None)])
+
+    def test_untimestamped_stretch_is_not_rescanned(self):
+        with open(self.path, "wb") as f:
+            f.write(log_line(START, b"start"))
+            # Stdout-only output: 4 MB without a single timestamp
+            f.write(b"plain output line without a timestamp\n" * (4 * 1024 * 1024 // 38))
+        with mock.patch.object(log_index, "parse_line_timestamp", wraps=parse_line_timestamp) as parse:
+            index = self.make_index()
+            built = parse.call_count
+            index.update()
+
+        # Each stride looks at no more than SAMPLE_SCAN bytes, and an update with nothing new looks at none
+        strides = os.path.getsize(self.path) // STRIDE + 1
+        self.assertLess(built, strides * (log_index.SAMPLE_SCAN // 38 + 2))
+        self.assertEqual(parse.call_count, built)
+        self.assertGreaterEqual(index.next_sample, os.path.getsize(self.path))
+
+        with open(self.path, "ab") as f:
+            f.write(log_line(START + 60, b"back"))
+        index.update()
+        self.assertEqual(index.timestamps[-1], START + 60)
+        self.assertEqual(self.query(index, START + 30), [log_line(START + 60, b"back")])
+
+    def test_registry_skips_a_fresh_index(self):
+        write_log(self.path, 200)
+        registry = LogIndexRegistry(self.workdir, None, STRIDE, max_age=60)
+        index = registry.get(self.path)
+        size = index.size
+
+        write_log(self.path, 200, seed=11, mode="ab", start=START + 200)
+        registry.get(self.path)
+        self.assertEqual(index.size, size)
+        # The refresher always updates
+        registry.refresh_all()
+        self.assertEqual(index.size, os.path.getsize(self.path))
+        self.assertTrue(os.path.exists(self.path + ".idx"))
+
+        # Truncation is noticed even on a fresh index
+        write_log(self.path, 10, seed=12, start=START + 9000)
+        registry.get(self.path)
+        self.assertEqual(index.timestamps[0], START + 9000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+"""
+Incremental log analytics: cursor resume, rotation, truncation and persistence
+"""
+
+import os
+import tempfile
+import time
+import unittest
+
+from health_check.log_stats import LogStatsRegistry, LogTracker
+
+START = 1_750_000_020
+SERVICES = {"ai-processor": {"log_file": "logs/ai_processor.log"}}
+
+
+def log_line(epoch, message, level="INFO"):
+    stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(int(epoch))).encode()
+    return stamp + b",%03d - %s - %s\n" % (round(epoch % 1 * 1000), level.encode(), message)
+
+
+def batch(epoch, items, seconds):
+    """One ai-processor batch: the start line with its item count, then the completion line"""
+    return (log_line(epoch, b"Found %d inbound messages to process" % items)
+            + log_line(epoch + seconds, b"AI inbound message processing completed"))
+
+
+class LogStatsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.workdir = workdir.name
+        self.path = os.path.join(workdir.name, "ai_processor.log")
+        self.state_path = os.path.join(workdir.name, "log-stats.json")
+
+    def write(self, data, mode="ab"):
+        with open(self.path, mode) as f:
+            f.write(data)
+
+    def make_tracker(self, backfill=1024 * 1024, max_read=16 * 1024 * 1024):
+        return LogTracker("ai-processor", self.path, backfill, max_read, window_minutes=60)
+
+    def make_registry(self):
+        return LogStatsRegistry(self.workdir, SERVICES, self.state_path, 1024 * 1024, 16 * 1024 * 1024, 60)
+
+
+class LogTrackerTest(LogStatsTestCase):
+
+    def test_reads_only_what_was_appended(self):
+        self.write(batch(START, 3, 1.5) + log_line(START + 2, b"Failed to send reply", "ERROR"), "wb")
+        tracker = self.make_tracker()
+
+        self.assertEqual(tracker.update(), os.path.getsize(self.path))
+        self.assertEqual(tracker.update(), 0)
+
+        self.write(batch(START + 10, 2, 0.5) + b"2025-06-15 15:07:15,000 - INFO - half a li")
+        tracker.update()
+
+        self.assertEqual(tracker.totals["inbound"], 5)
+        self.assertEqual(tracker.totals["processed"], 5)
+        self.assertEqual(tracker.totals["errors"], 1)
+        self.assertEqual(tracker.last_latency_ms, 500.0)
+        # The partial last line waits for its newline
+        self.assertEqual(tracker.totals["lines"], 5)
+        self.assertEqual(os.path.getsize(self.path) - tracker.offset, len(b"2025-06-15 15:07:15,000 - INFO - half a li"))
+        self.write(b"ne\n")
+        tracker.update()
+        self.assertEqual(tracker.totals["lines"], 6)
+        self.assertEqual(tracker.offset, os.path.getsize(self.path))
+
+    def test_first_read_starts_at_the_backfill(self):
+        self.write(b"".join(log_line(START + second, b"tick %03d" % second) for second in range(100)), "wb")
+        tracker = self.make_tracker(backfill=500)
+
+        consumed = tracker.update()
+
+        # Only whole lines from within the last 500 bytes
+        self.assertLessEqual(consumed, 500)
+        self.assertEqual(tracker.totals["lines"], consumed // len(log_line(START, b"tick 000")))
+        self.assertEqual(tracker.last_line_at, START + 99)
+
+    def test_resumes_from_the_start_of_a_rotated_log(self):
+        self.write(batch(START, 3, 1.0), "wb")
+        tracker = self.make_tracker()
+        tracker.update()
+        offset = tracker.offset
+
+        # A batch was in progress when the log rotated; the new file is longer than the old offset
+        self.write(log_line(START + 5, b"Found 4 inbound messages to process"))
+        tracker.update()
+        os.rename(self.path, self.path + ".1")
+        self.write(b"".join(batch(START + 60 + second, 1, 0.25) for second in range(0, 20, 2)), "wb")
+        self.assertGreater(os.path.getsize(self.path), offset)
+        tracker.update()
+
+        self.assertEqual(tracker.offset, os.path.getsize(self.path))
+        self.assertEqual(tracker.totals["inbound"], 3 + 4 + 10)
+        # The batch cut off by the rotation is not completed by the new file's first completion line
+        self.assertEqual(tracker.totals["processed"], 3 + 10)
+        self.assertEqual(tracker.last_latency_ms, 250.0)
+
+    def test_resumes_from_the_start_of_a_truncated_log(self):
+        self.write(b"".join(log_line(START + second, b"tick") for second in range(20)), "wb")
+        tracker = self.make_tracker()
+        tracker.update()
+
+        self.write(log_line(START + 100, b"Failed to send reply", "ERROR"), "wb")
+        tracker.update()
+
+        self.assertEqual(tracker.totals["lines"], 21)
+        self.assertEqual(tracker.totals["errors"], 1)
+        self.assertEqual(tracker.offset, os.path.getsize(self.path))
+
+    def test_rates_over_complete_minutes(self):
+        minute = START - START % 60
+        self.write(b"".join(batch(minute + second, 2, 1.0) for second in range(0, 60, 10)), "wb")
+        tracker = self.make_tracker()
+        tracker.update()
+
+        stats = tracker.describe(now=minute + 90)
+
+        self.assertEqual(stats["per_minute"]["1m"]["inbound"], 12)
+        self.assertEqual(stats["per_minute"]["5m"]["inbound"], 2.4)
+        self.assertEqual(stats["ai_latency_ms"]["1m"], {"samples": 6, "avg": 1000.0, "max": 1000.0})
+        # The current minute is not complete yet
+        self.assertEqual(tracker.describe(now=minute + 30)["per_minute"]["1m"]["inbound"], 0)
+        self.assertNotIn("offset", tracker.describe(cursor=False))
+
+
+class LogStatsRegistryTest(LogStatsTestCase):
+
+    def test_restart_resumes_at_the_saved_offset(self):
+        self.write(batch(START, 3, 1.0), "wb")
+        registry = self.make_registry()
+        registry.update_all()
+        registry.save()
+
+        self.write(batch(START + 10, 2, 1.0))
+        restarted = self.make_registry()
+        self.assertTrue(restarted.load())
+        restarted.update_all()
+
+        tracker = restarted.trackers["ai-processor"]
+        self.assertEqual(tracker.totals["inbound"], 5)
+        self.assertEqual(tracker.totals["lines"], 4)
+        self.assertEqual(tracker.offset, os.path.getsize(self.path))
+
+    def test_rotation_while_stopped(self):
+        self.write(b"".join(log_line(START + second, b"tick") for second in range(50)), "wb")
+        registry = self.make_registry()
+        registry.update_all()
+        registry.save()
+
+        os.rename(self.path, self.path + ".1")
+        self.write(b"".join(log_line(START + 100 + second, b"tock") for second in range(80)), "wb")
+        restarted = self.make_registry()
+        restarted.load()
+        restarted.update_all()
+
+        tracker = restarted.trackers["ai-processor"]
+        self.assertEqual(tracker.totals["lines"], 50 + 80)
+        self.assertEqual(tracker.offset, os.path.getsize(self.path))
+
+    def test_unreadable_state_starts_fresh(self):
+        with open(self.state_path, "w") as f:
+            f.write("{not json")
+
+        with self.assertLogs("health_check.log_stats", "WARNING"):
+            self.assertFalse(self.make_registry().load())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+"""
+Probe engine against stub services
+
+    cd modules/ec2/scripts
+    python3 -m unittest discover -s tests
+"""
+
+import socket
+import time
+import unittest
+
+from health_check.bench import StubService
+from health_check.probes import HttpProbe, ProbeEngine, ProbeResult
+
+
+class _SleepingProbe:
+    """A probe that ignores its deadline, like one stuck in a blocking call"""
+
+    def __init__(self, name, seconds):
+        self.name = name
+        self.display_name = name
+        self.seconds = seconds
+        self.critical = True
+
+    def run(self, deadline):
+        time.sleep(self.seconds)
+        return ProbeResult(self.name, True, attempts=1)
+
+    def close(self):
+        pass
+
+
+class ProbeTestCase(unittest.TestCase):
+
+    def start_stub(self, **kwargs):
+        stub = StubService(**kwargs).start()
+        self.addCleanup(stub.stop)
+        return stub
+
+    def make_probe(self, stub, name="backend", timeout=2.0, retries=2):
+        probe = HttpProbe(name, name, f"{stub.url}/health", timeout, retries=retries)
+        self.addCleanup(probe.close)
+        return probe
+
+    def make_engine(self, probes, deadline_seconds):
+        engine = ProbeEngine(probes, deadline_seconds)
+        self.addCleanup(engine.close)
+        return engine
+
+
+class ProbeEngineTest(ProbeTestCase):
+
+    def test_probes_run_in_parallel(self):
+        stubs = [self.start_stub(latency=0.4) for _ in range(3)]
+        probes = [self.make_probe(stub, name=f"svc{i}") for i, stub in enumerate(stubs)]
+        engine = self.make_engine(probes, deadline_seconds=5)
+
+        started = time.monotonic()
+        results = engine.run_all()
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(list(results), ["svc0", "svc1", "svc2"])
+        self.assertTrue(all(result.ok for result in results.values()))
+        # Run one after another this would take 1.2 s
+        self.assertLess(elapsed, 0.9)
+
+    def test_per_probe_timeout(self):
+        slow = self.start_stub(latency=1.5)
+        fast = self.start_stub()
+        engine = self.make_engine([
+            self.make_probe(slow, name="slow", timeout=0.2, retries=1),
+            self.make_probe(fast, name="fast", timeout=0.2, retries=1)
+        ], deadline_seconds=5)
+
+        started = time.monotonic()
+        results = engine.run_all()
+        elapsed = time.monotonic() - started
+
+        self.assertFalse(results["slow"].ok)
+        self.assertIn("timed out", results["slow"].error)
+        self.assertEqual(results["slow"].attempts, 1)
+        self.assertTrue(results["fast"].ok)
+        self.assertLess(elapsed, 1.0)
+
+    def test_probe_stops_at_the_deadline(self):
+        slow = self.start_stub(latency=1.5)
+        probe = self.make_probe(slow, timeout=5, retries=3)
+
+        started = time.monotonic()
+        result = probe.run(started + 0.3)
+        elapsed = time.monotonic() - started
+
+        self.assertFalse(result.ok)
+        self.assertLess(elapsed, 1.0)
+
+    def test_overall_deadline(self):
+        engine = self.make_engine([_SleepingProbe("stuck", 1.5), _SleepingProbe("quick", 0)], deadline_seconds=0.3)
+
+        started = time.monotonic()
+        results = engine.run_all()
+        elapsed = time.monotonic() - started
+
+        self.assertFalse(results["stuck"].ok)
+        self.assertEqual(results["stuck"].error, "Overall deadline of 0.3s exceeded")
+        self.assertTrue(results["quick"].ok)
+        self.assertLess(elapsed, 1.0)
+
+
+class HttpProbeTest(ProbeTestCase):
+
+    def test_retries_a_failing_service(self):
+        stub = self.start_stub(failure_rate=1.0)
+        probe = self.make_probe(stub, retries=3)
+
+        result = probe.run(time.monotonic() + 5)
+
+        self.assertFalse(result.ok)
+        self.assertEqual(result.status_code, 500)
+        self.assertEqual(result.error, "HTTP 500")
+        self.assertEqual(result.attempts, 3)
+        self.assertEqual(stub.requests, 3)
+
+    def test_retry_recovers_from_a_dropped_connection(self):
+        stub = self.start_stub()
+        probe = self.make_probe(stub)
+        self.assertTrue(probe.run(time.monotonic() + 5).ok)
+
+        # The pooled keep-alive socket is shut down between cycles, as after an idle close by the service
+        conn = probe.pool.checkout(1.0)
+        conn.sock.shutdown(socket.SHUT_RDWR)
+        probe.pool.checkin(conn)
+
+        result = probe.run(time.monotonic() + 5)
+
+        self.assertTrue(result.ok)
+        self.assertEqual(result.attempts, 2)
+        self.assertEqual(stub.connections, 2)
+
+    def test_connections_are_reused_across_cycles(self):
+        stub = self.start_stub()
+        probe = self.make_probe(stub)
+        engine = self.make_engine([probe], deadline_seconds=5)
+
+        for _ in range(5):
+            self.assertTrue(engine.run_all()["backend"].ok)
+
+        self.assertEqual(stub.requests, 5)
+        self.assertEqual(stub.connections, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+"""
+Worker pool behaviour of the real server under load
+"""
+
+import threading
+import time
+import unittest
+
+from helpers import ServerTestCase
+
+EXEC_LATENCY = 3.0
+
+
+class HeavyRequestFloodTest(ServerTestCase):
+    """Diagnostic requests beyond the heavy slots must not hold the health-check workers"""
+
+    @classmethod
+    def server_env(cls):
+        default_handler = cls.docker.exec_handler
+
+        def slow_exec(container, cmd):
+            time.sleep(EXEC_LATENCY)
+            return default_handler(container, cmd)
+
+        cls.docker.exec_handler = slow_exec
+        return {"HEALTH_CHECK_WORKERS": "16", "HEALTH_CHECK_HEAVY_SLOTS": "4"}
+
+    def test_health_check_stays_fast_during_a_flood(self):
+        results = []
+        lock = threading.Lock()
+
+        def fetch_services():
+            started = time.monotonic()
+            status, _ = self.get("/services", timeout=15)
+            with lock:
+                results.append((status, time.monotonic() - started))
+
+        flood = [threading.Thread(target=fetch_services) for _ in range(40)]
+        for thread in flood:
+            thread.start()
+        time.sleep(0.3)
+
+        latencies = []
+        for _ in range(5):
+            started = time.monotonic()
+            status, _ = self.get("/health-check")
+            latencies.append(time.monotonic() - started)
+            self.assertIn(status, (200, 503))
+        for thread in flood:
+            thread.join()
+
+        self.assertLess(max(latencies), 0.5)
+        rejected = [elapsed for status, elapsed in results if status == 503]
+        self.assertGreaterEqual(len(rejected), 40 - 4)
+        # Turned away at once instead of waiting for a slot
+        self.assertLess(max(rejected), 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
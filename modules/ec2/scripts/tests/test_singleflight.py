@@ -0,0 +1,152 @@
+"""
+Single-flight coalescing: shared executions, caller timeouts, error fan-out and the TTL
+"""
+
+import threading
+import unittest
+from unittest import mock
+
+from health_check.singleflight import SingleFlight
+
+
+class BlockingCall:
+    """A call that runs until released, counting its executions"""
+
+    def __init__(self, result="result", error=None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlightTest(unittest.TestCase):
+
+    def setUp(self):
+        # A clock the test moves by hand, for the TTL only
+        self.now = 1000.0
+        patcher = mock.patch("health_check.singleflight.time.monotonic", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def concurrently(self, flight, key, fn, callers=10, timeout=5):
+        """Start `callers` threads on flight.do(); returns the list their results or errors land in"""
+        outcomes = []
+        lock = threading.Lock()
+
+        def call():
+            try:
+                outcome = flight.do(key, fn, timeout)
+            except Exception as e:
+                outcome = e
+            with lock:
+                outcomes.append(outcome)
+
+        threads = [threading.Thread(target=call) for _ in range(callers)]
+        for thread in threads:
+            thread.start()
+        self.addCleanup(lambda: [thread.join(5) for thread in threads])
+        return outcomes, threads
+
+    def test_concurrent_callers_share_one_execution(self):
+        flight = SingleFlight(ttl=10)
+        fn = BlockingCall()
+
+        outcomes, threads = self.concurrently(flight, "services", fn)
+        self.assertTrue(fn.started.wait(5))
+        fn.release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(outcomes, ["result"] * 10)
+        self.assertEqual(fn.calls, 1)
+
+    def test_timeout_does_not_cancel_the_shared_call(self):
+        flight = SingleFlight(ttl=10)
+        fn = BlockingCall()
+
+        with self.assertRaises(TimeoutError):
+            flight.do("services", fn, timeout=0.1)
+        # Callers arriving later join the same execution rather than starting another
+        outcomes, threads = self.concurrently(flight, "services", fn, callers=3)
+        fn.release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(outcomes, ["result"] * 3)
+        self.assertEqual(flight.do("services", fn, timeout=1), "result")
+        self.assertEqual(fn.calls, 1)
+
+    def test_every_waiting_caller_gets_the_error(self):
+        flight = SingleFlight(ttl=10)
+        error = ConnectionRefusedError("docker.sock")
+        fn = BlockingCall(error=error)
+
+        outcomes, threads = self.concurrently(flight, "services", fn)
+        self.assertTrue(fn.started.wait(5))
+        fn.release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(outcomes), 10)
+        self.assertTrue(all(outcome is error for outcome in outcomes))
+        # The failure is shared for the TTL, so a down dependency isn't retried by every caller
+        with self.assertRaises(ConnectionRefusedError):
+            flight.do("services", fn, timeout=1)
+        self.assertEqual(fn.calls, 1)
+
+        self.now += 11
+        fn.error = None
+        self.assertEqual(flight.do("services", fn, timeout=1), "result")
+        self.assertEqual(fn.calls, 2)
+
+    def test_result_is_reused_for_the_ttl(self):
+        flight = SingleFlight(ttl=10)
+        fn = BlockingCall()
+        fn.release.set()
+
+        flight.do("services", fn, timeout=1)
+        self.now += 10
+        flight.do("services", fn, timeout=1)
+        self.assertEqual(fn.calls, 1)
+
+        self.now += 0.1
+        flight.do("services", fn, timeout=1)
+        self.assertEqual(fn.calls, 2)
+
+    def test_zero_ttl_only_shares_in_flight_calls(self):
+        flight = SingleFlight(ttl=0)
+        fn = BlockingCall()
+        fn.release.set()
+
+        flight.do("services", fn, timeout=1)
+        flight.do("services", fn, timeout=1)
+
+        self.assertEqual(fn.calls, 2)
+
+    def test_keys_are_independent(self):
+        flight = SingleFlight(ttl=10)
+        slow = BlockingCall()
+        fast = BlockingCall(result="fast")
+        fast.release.set()
+
+        outcomes, threads = self.concurrently(flight, "slow", slow, callers=1)
+        self.assertTrue(slow.started.wait(5))
+
+        self.assertEqual(flight.do("fast", fast, timeout=1), "fast")
+        slow.release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(outcomes, ["result"])
+
+
+if __name__ == "__main__":
+    unittest.main()
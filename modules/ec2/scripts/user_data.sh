@@ -184,6 +184,7 @@ setup_docker_compose() {
     sudo aws s3 cp s3://${S3_BUCKET}/nginx/nginx.conf ./nginx.conf
     sudo aws s3 cp s3://${S3_BUCKET}/scripts/health-check.sh ./health-check.sh
     sudo aws s3 cp s3://${S3_BUCKET}/scripts/health-check-server.py ./health-check-server.py
+    sudo aws s3 cp s3://${S3_BUCKET}/scripts/health_check/ ./scripts/health_check/ --recursive
     
     # Export environment variables for envsubst
     export BACKEND_IMAGE="${BACKEND_IMAGE}"
@@ -232,6 +233,7 @@ setup_docker_compose() {
     sudo chmod 644 nginx.conf
     sudo chmod 755 health-check.sh
     sudo chmod 644 health-check-server.py
+    sudo chmod 644 scripts/health_check/*.py
     
     log_to_cloudwatch "INFO" "Docker Compose configuration setup completed"
 }
@@ -34,6 +34,15 @@ resource "aws_security_group" "ec2_sg" {
     description     = "Port 8905 from ALB for direct API access"
   }
 
+  # Health server from the other instances in this group, for the fleet view (/fleet)
+  ingress {
+    from_port   = 8888
+    to_port     = 8888
+    protocol    = "tcp"
+    self        = true
+    description = "Health server from peer instances"
+  }
+
   # SSH from your office IP
   ingress {
     from_port   = 22
@@ -21,6 +21,7 @@ SSH_USER="your-username"
 SSH_KEY_PATH="$HOME/.ssh/your-key.pem"  # Optional: path to SSH key
 REMOTE_APP_DIR="/app/sms-seller-connect"  # Path where docker-compose.yml is located
 LOCAL_LOGS_DIR="./ssh-docker-logs"
+COLLECTOR_CONTAINER="health_check_service"  # Container that runs python3 -m health_check.collector
 
 echo -e "${BOLD}${BLUE}========================================${NC}"
 echo -e "${BOLD}${BLUE}  Docker Compose Logs Puller${NC}"
@@ -47,7 +48,7 @@ show_usage() {
     echo "  --tail N          Show last N lines (default: 100)"
     echo "  --since TIME      Show logs since timestamp (e.g., '2h', '2023-01-01')"
     echo "  --all             Get logs from all services"
-    echo "  --save            Save logs to local files"
+    echo "  --save            Save logs to one local .tar.gz (--tail applies to container logs)"
     echo "  --help, -h        Show this help"
     echo ""
     echo -e "${CYAN}Examples:${NC}"
@@ -136,41 +137,26 @@ if [[ "$ALL_SERVICES" == false && -n "$SERVICE_NAME" ]]; then
     DOCKER_CMD="$DOCKER_CMD $SERVICE_NAME"
 fi
 
-# Function to get service list
-get_services() {
-    log_message "Getting list of services..."
-    $SSH_CMD "cd $REMOTE_APP_DIR && sudo docker-compose ps --services" 2>/dev/null || echo "sms_backend sms_frontend nginx health_check"
-}
-
-# Function to save logs to files
+# Function to save logs to an archive
 save_logs_to_files() {
-    log_message "Saving logs to local files..."
+    log_message "Saving logs to a local archive..."
     
-    local services
-    if [[ "$ALL_SERVICES" == true ]]; then
-        services=$(get_services)
-    else
-        services="$SERVICE_NAME"
+    local archive="$LOCAL_LOGS_DIR/docker-logs_$(date +%Y%m%d_%H%M%S).tar.gz"
+    local cmd="sudo docker exec -w /app $COLLECTOR_CONTAINER python3 -m health_check.collector"
+    if [[ -n "$TAIL_LINES" ]]; then
+        cmd="$cmd --tail $TAIL_LINES"
+    fi
+    if [[ -n "$SINCE_TIME" ]]; then
+        cmd="$cmd --since $SINCE_TIME"
+    fi
+    if [[ "$ALL_SERVICES" == false && -n "$SERVICE_NAME" ]]; then
+        cmd="$cmd --containers $SERVICE_NAME --no-files"
     fi
     
-    for service in $services; do
-        if [[ -n "$service" ]]; then
-            local log_file="$LOCAL_LOGS_DIR/${service}_$(date +%Y%m%d_%H%M%S).log"
-            log_message "Saving $service logs to $log_file"
-            
-            local cmd="cd $REMOTE_APP_DIR && sudo docker-compose logs"
-            if [[ -n "$TAIL_LINES" ]]; then
-                cmd="$cmd --tail $TAIL_LINES"
-            fi
-            if [[ -n "$SINCE_TIME" ]]; then
-                cmd="$cmd --since $SINCE_TIME"
-            fi
-            cmd="$cmd $service"
-            
-            $SSH_CMD "$cmd" > "$log_file" 2>&1
-            echo -e "${GREEN}✓ Saved $service logs to $log_file${NC}"
-        fi
-    done
+    # One SSH session; the collector reads every log in parallel and streams the archive back
+    $SSH_CMD "$cmd" > "$archive"
+    echo -e "${GREEN}✓ Saved logs to $archive${NC}"
+    tar -tzf "$archive" | sed 's/^/  /'
 }
 
 # Main execution